@@ -0,0 +1,155 @@
+# accounts.py
+import argparse
+import hashlib
+import os
+import secrets
+import threading
+import time
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import models
+import changes
+from database import SessionLocal
+
+# =======================
+# CONFIG
+# =======================
+# Without AUTH_REQUIRED, requests that carry no token act as the default
+# user, so a single-team deployment keeps working with no setup.
+AUTH_REQUIRED = os.getenv("AUTH_REQUIRED", "false").lower() in ("1", "true", "yes")
+DEFAULT_USER = "default"
+TOKEN_CACHE_TTL = float(os.getenv("AUTH_TOKEN_CACHE_TTL", "60"))
+
+# Set by ensure_default_user()
+default_owner_id = None
+
+
+class AuthError(Exception):
+    pass
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+# =======================
+# USERS
+# =======================
+def create_user(db: Session, name: str, quota: int = None) -> tuple:
+    """Create a user and return (user, api_token); only the token's hash is stored."""
+    token = secrets.token_urlsafe(32)
+    user = models.User(name=name, token_hash=hash_token(token), todo_quota=quota)
+    db.add(user)
+    db.flush()
+    changes.ensure_counter(db, user.id)
+    db.commit()
+    return user, token
+
+
+def ensure_default_user(db: Session) -> int:
+    """Create the default user if needed and hand it rows from before owner_id existed."""
+    try:
+        return _ensure_default_user(db)
+    except IntegrityError:
+        # Another worker process starting at the same moment got there first
+        db.rollback()
+        return _ensure_default_user(db)
+
+
+def _ensure_default_user(db: Session) -> int:
+    global default_owner_id
+    user = db.execute(select(models.User).where(models.User.name == DEFAULT_USER)).scalar_one_or_none()
+    if user is None:
+        user = models.User(name=DEFAULT_USER)
+        db.add(user)
+        db.flush()
+    # Continue the old single-tenant version counter, so clients that saved a
+    # version before the upgrade can keep resuming the change feed from it
+    changes.ensure_counter(db, user.id, start=changes.legacy_version(db))
+    for model in (models.Todo, models.TodoTombstone, models.ChatSession, models.Job):
+        db.execute(
+            update(model)
+            .where(model.owner_id.is_(None))
+            .values(owner_id=user.id)
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+    default_owner_id = user.id
+    return user.id
+
+
+# =======================
+# REQUEST AUTH
+# =======================
+# token hash -> (owner id, expiry). Lets most requests skip the users lookup.
+_token_cache = {}
+_token_lock = threading.Lock()
+
+
+def _cached(token_hash: str):
+    with _token_lock:
+        cached = _token_cache.get(token_hash)
+    if cached is not None and cached[1] > time.monotonic():
+        return cached[0]
+    return None
+
+
+def _lookup(token_hash: str):
+    now = time.monotonic()
+    with SessionLocal() as db:
+        owner_id = db.execute(
+            select(models.User.id).where(models.User.token_hash == token_hash)
+        ).scalar_one_or_none()
+    if owner_id is not None:
+        with _token_lock:
+            if len(_token_cache) > 10000:
+                _token_cache.clear()
+            _token_cache[token_hash] = (owner_id, now + TOKEN_CACHE_TTL)
+    return owner_id
+
+
+def resolve_owner(authorization: str = None, cached_only: bool = False) -> int:
+    """Owner id for an Authorization header value; raises AuthError.
+
+    With cached_only, a token-cache miss returns None instead of querying
+    the users table, so async callers can resolve most requests inline.
+    """
+    if not authorization:
+        if AUTH_REQUIRED or default_owner_id is None:
+            raise AuthError("Missing bearer token")
+        return default_owner_id
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        raise AuthError("Expected 'Authorization: Bearer <token>'")
+    token_hash = hash_token(token.strip())
+    owner_id = _cached(token_hash)
+    if owner_id is None:
+        if cached_only:
+            return None
+        owner_id = _lookup(token_hash)
+    if owner_id is None:
+        raise AuthError("Invalid token")
+    return owner_id
+
+
+# =======================
+# CLI
+# =======================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage API users")
+    sub = parser.add_subparsers(dest="command", required=True)
+    add = sub.add_parser("add-user", help="create a user and print its API token")
+    add.add_argument("name")
+    add.add_argument("--quota", type=int, default=None, help="max todos (default: TODO_QUOTA)")
+    args = parser.parse_args()
+
+    import migrations
+    from database import engine
+    migrations.upgrade(engine)
+    with SessionLocal() as db:
+        user, token = create_user(db, args.name, args.quota)
+        print(f"Created user {args.name} (id {user.id})")
+        print(f"API token (shown once): {token}")
@@ -0,0 +1,105 @@
+# batch.py
+from typing import List
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+import models
+import schemas
+import changes
+import todo_counts
+import serialization
+
+# =======================
+# BATCH WRITES
+# =======================
+# Each function issues bulk statements and leaves the commit to the caller,
+# so a whole batch lands in one transaction. Ids owned by someone else are
+# reported as not_found, exactly like ids that don't exist.
+
+def _returning(db: Session, feature: str) -> bool:
+    return getattr(db.get_bind().dialect, feature, False)
+
+
+# Only the response columns are read or returned, never whole ORM objects
+COLUMNS = serialization.todo_columns()
+
+
+def _item(todo_id: int, status: str, row=None) -> dict:
+    return {"id": todo_id, "status": status, "todo": serialization.todo_dict(row) if row is not None else None}
+
+
+def _load(db: Session, owner_id: int, ids: List[int]) -> dict:
+    if not ids:
+        return {}
+    rows = db.execute(
+        select(*COLUMNS).where(models.Todo.owner_id == owner_id, models.Todo.id.in_(ids))
+    )
+    return {row.id: row for row in rows}
+
+
+def create_many(db: Session, owner_id: int, items: List[schemas.TodoCreate]) -> List[dict]:
+    """Results are {"id", "status", "todo"} dicts; see serialization.batch_response."""
+    if not items:
+        return []
+    todo_counts.check_quota(db, owner_id, len(items))
+    version = changes.next_version(db, owner_id)
+    values = [
+        {"owner_id": owner_id, "title": item.title, "description": item.description,
+         "completed": False, "version": version}
+        for item in items
+    ]
+    if _returning(db, "insert_executemany_returning"):
+        # Multi-row INSERT .. RETURNING instead of a refresh SELECT per row.
+        # RETURNING order isn't guaranteed by the database; SQLAlchemy
+        # correlates the rows back to the request items for us.
+        todos = db.execute(
+            insert(models.Todo).returning(*COLUMNS, sort_by_parameter_order=True), values
+        ).all()
+    else:
+        todos = [models.Todo(**v) for v in values]
+        db.add_all(todos)
+        db.flush()
+    return [_item(todo.id, "created", todo) for todo in todos]
+
+
+def update_many(db: Session, owner_id: int, items: List[schemas.TodoBatchUpdateItem]) -> List[dict]:
+    if not items:
+        return []
+    existing = _load(db, owner_id, [item.id for item in items])
+    version = changes.next_version(db, owner_id)
+    params = []
+    for item in items:
+        fields = item.model_dump(exclude_none=True)
+        if item.id in existing and len(fields) > 1:
+            params.append({**fields, "version": version})
+    if params:
+        # ORM bulk UPDATE by primary key: executemany, no per-row flush
+        db.execute(update(models.Todo), params)
+
+    refreshed = _load(db, owner_id, list(existing)) if params else existing
+    return [
+        _item(item.id, "updated", refreshed[item.id]) if item.id in refreshed else _item(item.id, "not_found")
+        for item in items
+    ]
+
+
+def set_completed(db: Session, owner_id: int, ids: List[int], completed: bool) -> List[dict]:
+    if not ids:
+        return []
+    stmt = (
+        update(models.Todo)
+        .where(models.Todo.owner_id == owner_id, models.Todo.id.in_(ids))
+        .values(completed=completed, version=changes.next_version(db, owner_id))
+        .execution_options(synchronize_session=False)
+    )
+    # SQLite's RETURNING can't see completed_at, which an AFTER trigger stamps
+    if _returning(db, "update_returning") and db.get_bind().dialect.name != "sqlite":
+        todos = {todo.id: todo for todo in db.execute(stmt.returning(*COLUMNS))}
+    else:
+        db.execute(stmt)
+        todos = _load(db, owner_id, ids)
+    return [
+        _item(todo_id, "updated", todos[todo_id]) if todo_id in todos else _item(todo_id, "not_found")
+        for todo_id in ids
+    ]
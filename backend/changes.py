@@ -0,0 +1,146 @@
+# changes.py
+import hashlib
+from typing import List
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session
+
+import models
+
+# =======================
+# CHANGE VERSIONS
+# =======================
+# One counter row per owner, bumped inside the writing transaction. Rows
+# carry the version of their last write and deletes leave a tombstone, so
+# "what changed since N" is two indexed range scans over (owner_id, version).
+# Another owner's writes never move your version or ETags.
+LEGACY_COUNTER = "todos"
+
+
+def counter_name(owner_id: int) -> str:
+    return f"todos:{owner_id}"
+
+
+def legacy_version(db: Session) -> int:
+    # The single global counter used before todos had owners
+    return db.execute(
+        select(models.ChangeCounter.value).where(models.ChangeCounter.name == LEGACY_COUNTER)
+    ).scalar() or 0
+
+
+def ensure_counter(db: Session, owner_id: int, start: int = 0):
+    if db.get(models.ChangeCounter, counter_name(owner_id)) is None:
+        db.add(models.ChangeCounter(name=counter_name(owner_id), value=start))
+        db.flush()
+
+
+def current_version(db: Session, owner_id: int) -> int:
+    return db.execute(
+        select(models.ChangeCounter.value).where(models.ChangeCounter.name == counter_name(owner_id))
+    ).scalar() or 0
+
+
+def next_version(db: Session, owner_id: int) -> int:
+    stmt = (
+        update(models.ChangeCounter)
+        .where(models.ChangeCounter.name == counter_name(owner_id))
+        .values(value=models.ChangeCounter.value + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if db.get_bind().dialect.update_returning:
+        return db.execute(stmt.returning(models.ChangeCounter.value)).scalar_one()
+    db.execute(stmt)
+    return current_version(db, owner_id)
+
+
+def record_deletes(db: Session, owner_id: int, ids: List[int], version: int):
+    if not ids:
+        return
+    db.execute(delete(models.TodoTombstone).where(models.TodoTombstone.todo_id.in_(ids)))
+    db.execute(
+        insert(models.TodoTombstone),
+        [{"todo_id": i, "owner_id": owner_id, "version": version} for i in ids],
+    )
+
+
+def delete_ids(db: Session, owner_id: int, ids: List[int]) -> int:
+    """Bulk delete of the owner's rows, leaving tombstones for the ones that existed."""
+    if not ids:
+        return 0
+    owned = (models.Todo.owner_id == owner_id, models.Todo.id.in_(ids))
+    stmt = delete(models.Todo).where(*owned).execution_options(synchronize_session=False)
+    if db.get_bind().dialect.delete_returning:
+        deleted = db.execute(stmt.returning(models.Todo.id)).scalars().all()
+    else:
+        deleted = db.execute(select(models.Todo.id).where(*owned)).scalars().all()
+        db.execute(stmt)
+    if deleted:
+        record_deletes(db, owner_id, deleted, next_version(db, owner_id))
+    return len(deleted)
+
+
+def _events(db: Session, owner_id: int, row_filter, tombstone_filter, limit=None):
+    rows = (
+        select(models.Todo)
+        .where(models.Todo.owner_id == owner_id, row_filter)
+        .order_by(models.Todo.version, models.Todo.id)
+    )
+    tombstones = (
+        select(models.TodoTombstone)
+        .where(models.TodoTombstone.owner_id == owner_id, tombstone_filter)
+        .order_by(models.TodoTombstone.version, models.TodoTombstone.todo_id)
+    )
+    if limit is not None:
+        rows = rows.limit(limit)
+        tombstones = tombstones.limit(limit)
+    return sorted(
+        [(todo.version, 0, todo) for todo in db.execute(rows).scalars()]
+        + [(t.version, 1, t) for t in db.execute(tombstones).scalars()],
+        key=lambda e: (e[0], e[1]),
+    )
+
+
+def changes_since(db: Session, owner_id: int, since: int, limit: int) -> dict:
+    """Rows written and ids deleted after `since`, at most `limit` events.
+
+    Todo ids are never reused (see models.Todo), so an id is never in both
+    lists. Clients apply `deleted` before `changed`.
+    """
+    version = current_version(db, owner_id)
+    events = _events(db, owner_id, models.Todo.version > since, models.TodoTombstone.version > since, limit + 1)
+
+    # Cut the page on a version boundary so resuming from the returned
+    # version never skips part of a write
+    has_more = len(events) > limit
+    if has_more:
+        cutoff = events[limit][0]
+        events = [e for e in events if e[0] < cutoff]
+        if not events:
+            # A single write touched more rows than a page holds; send all of it
+            events = _events(db, owner_id, models.Todo.version == cutoff, models.TodoTombstone.version == cutoff)
+        version = events[-1][0]
+
+    return {
+        "version": version,
+        "changed": [e[2] for e in events if e[1] == 0],
+        "deleted": [e[2].todo_id for e in events if e[1] == 1],
+        "has_more": has_more,
+    }
+
+
+def list_etag(owner_id: int, version: int, query_string: str) -> str:
+    # Versions are per owner and all start at 0, so the owner is part of the tag
+    digest = hashlib.sha1(query_string.encode("utf-8")).hexdigest()[:12]
+    return f'W/"{owner_id}-{version}-{digest}"'
+
+
+def version_headers(etag: str, version: int) -> dict:
+    # The body depends on whose token sent the request
+    return {"ETag": etag, "X-Change-Version": str(version), "Vary": "Authorization"}
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
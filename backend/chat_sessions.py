@@ -0,0 +1,136 @@
+# chat_sessions.py
+import os
+import uuid
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+import models
+from embeddings import estimate_tokens
+
+# =======================
+# CONFIG
+# =======================
+# Recent turns are sent verbatim up to HISTORY_TOKEN_BUDGET; when the
+# unsummarized tail grows past it, the oldest turns are folded into the
+# session summary until the tail is back under half the budget. Prompt size
+# per turn is therefore bounded by budget + summary, however long the chat.
+HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "1200"))
+SUMMARY_MAX_TOKENS = int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", "200"))
+
+SUMMARY_PROMPT = (
+    "Summarize this conversation between a user and a todo-app assistant for the "
+    "assistant's own memory. Keep names, task titles, ids, decisions and open "
+    f"questions; drop pleasantries. At most {SUMMARY_MAX_TOKENS} tokens."
+)
+
+
+class SessionNotFound(Exception):
+    pass
+
+
+# =======================
+# STORE
+# =======================
+def create_session(db: Session, owner_id: int) -> str:
+    session = models.ChatSession(id=uuid.uuid4().hex, owner_id=owner_id, summarized_through=0)
+    db.add(session)
+    db.commit()
+    return session.id
+
+
+def get_session(db: Session, owner_id: int, session_id: str) -> models.ChatSession:
+    session = db.get(models.ChatSession, session_id)
+    # Someone else's session looks exactly like a missing one
+    if session is None or session.owner_id != owner_id:
+        raise SessionNotFound(session_id)
+    return session
+
+
+def delete_session(db: Session, owner_id: int, session_id: str):
+    get_session(db, owner_id, session_id)
+    db.execute(delete(models.ChatMessage).where(models.ChatMessage.session_id == session_id))
+    db.execute(delete(models.ChatSession).where(models.ChatSession.id == session_id))
+    db.commit()
+
+
+def session_messages(db: Session, session_id: str, after: int = 0) -> list:
+    stmt = (
+        select(models.ChatMessage)
+        .where(models.ChatMessage.session_id == session_id, models.ChatMessage.id > after)
+        .order_by(models.ChatMessage.id)
+    )
+    return list(db.execute(stmt).scalars())
+
+
+def append_turn(db: Session, session_id: str, user_message: str, reply: str):
+    db.add_all([
+        models.ChatMessage(session_id=session_id, role="user", content=user_message,
+                           tokens=estimate_tokens(user_message)),
+        models.ChatMessage(session_id=session_id, role="assistant", content=reply,
+                           tokens=estimate_tokens(reply)),
+    ])
+    db.commit()
+
+
+# =======================
+# HISTORY UNDER A BUDGET
+# =======================
+def _transcript(messages) -> str:
+    return "\n".join(f"{m.role}: {m.content}" for m in messages)
+
+
+def _fallback_summary(previous: str, messages) -> str:
+    # Used when the LLM can't summarize: keep the newest text that fits
+    text = "\n".join(filter(None, [previous, _transcript(messages)]))
+    limit = SUMMARY_MAX_TOKENS * 4
+    return text if len(text) <= limit else "…" + text[-limit:]
+
+
+def compact(db: Session, session: models.ChatSession, summarize=None) -> list:
+    """Fold old turns into the summary if needed; returns the verbatim tail.
+
+    summarize(messages) -> str is given the summary request as chat messages
+    and returns the new summary. Failures fall back to truncation, so a
+    provider outage never blocks the chat.
+    """
+    tail = session_messages(db, session.id, session.summarized_through)
+    total = sum(m.tokens for m in tail)
+    if total <= HISTORY_TOKEN_BUDGET:
+        return tail
+
+    # Fold whole user/assistant pairs, oldest first, until the rest fits in half
+    folded = 0
+    while folded < len(tail) and total > HISTORY_TOKEN_BUDGET // 2:
+        total -= tail[folded].tokens
+        folded += 1
+    if folded % 2 and folded < len(tail):
+        total -= tail[folded].tokens
+        folded += 1
+    old, tail = tail[:folded], tail[folded:]
+
+    summary = None
+    if summarize is not None:
+        previous = f"Summary so far:\n{session.summary}\n\n" if session.summary else ""
+        try:
+            summary = summarize([
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {"role": "user", "content": previous + "New messages:\n" + _transcript(old)},
+            ])
+        except Exception as e:
+            print(f"Chat summary failed, truncating instead: {e}")
+    session.summary = summary or _fallback_summary(session.summary, old)
+    session.summarized_through = old[-1].id
+    db.commit()
+    return tail
+
+
+def history_messages(db: Session, owner_id: int, session_id: str, summarize=None) -> list:
+    """Chat-completion messages for the session: summary first, then recent turns."""
+    session = get_session(db, owner_id, session_id)
+    tail = compact(db, session, summarize)
+    messages = []
+    if session.summary:
+        messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{session.summary}"})
+    messages.extend({"role": m.role, "content": m.content} for m in tail)
+    return messages
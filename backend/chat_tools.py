@@ -0,0 +1,290 @@
+# chat_tools.py
+import json
+import os
+from types import SimpleNamespace
+
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import models
+import schemas
+import batch
+import changes
+import search
+import todo_counts
+
+# =======================
+# TOOL DEFINITIONS
+# =======================
+# OpenAI function-calling specs. Every tool takes arrays so the model can
+# act on many todos with one call ("mark all my shopping tasks done").
+CHAT_TOOLS_ENABLED = os.getenv("CHAT_TOOLS_ENABLED", "true").lower() not in ("0", "false", "no")
+MAX_TOOL_ROUNDS = int(os.getenv("CHAT_MAX_TOOL_ROUNDS", "4"))
+MAX_RESULT_CHARS = 4000
+
+_ID_LIST = {"type": "array", "items": {"type": "integer"}}
+
+TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "list_todos",
+            "description": "List the user's todos, optionally only pending or only completed ones.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "completed": {"type": "boolean", "description": "true = completed only, false = pending only"},
+                    "limit": {"type": "integer", "description": "Max todos to return (default 50)"},
+                },
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "search_todos",
+            "description": "Full-text search over todo titles and descriptions. Use it to find ids before changing todos.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string"},
+                    "limit": {"type": "integer", "description": "Max hits (default 20)"},
+                },
+                "required": ["query"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "create_todos",
+            "description": "Create one or more todos.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "items": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "title": {"type": "string"},
+                                "description": {"type": "string"},
+                            },
+                            "required": ["title"],
+                        },
+                    },
+                },
+                "required": ["items"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "update_todos",
+            "description": "Change the title, description or completed flag of existing todos by id.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "items": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "id": {"type": "integer"},
+                                "title": {"type": "string"},
+                                "description": {"type": "string"},
+                                "completed": {"type": "boolean"},
+                            },
+                            "required": ["id"],
+                        },
+                    },
+                },
+                "required": ["items"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "complete_todos",
+            "description": "Mark todos as completed (or pending again with completed=false).",
+            "parameters": {
+                "type": "object",
+                "properties": {"ids": _ID_LIST, "completed": {"type": "boolean"}},
+                "required": ["ids"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "delete_todos",
+            "description": "Delete todos by id.",
+            "parameters": {
+                "type": "object",
+                "properties": {"ids": _ID_LIST},
+                "required": ["ids"],
+            },
+        },
+    },
+]
+
+
+# =======================
+# TOOL HANDLERS
+# =======================
+# Handlers only flush; run_tool_calls commits once for the whole model turn.
+# Every handler is scoped to the owner the chat request was authenticated as.
+def _brief(todo) -> dict:
+    return {"id": todo.id, "title": todo.title, "completed": bool(todo.completed)}
+
+
+def _results(results) -> list:
+    return [
+        {"id": r["id"], "status": r["status"], **({"title": r["todo"]["title"], "completed": r["todo"]["completed"]} if r["todo"] else {})}
+        for r in results
+    ]
+
+
+def list_todos(db: Session, owner_id: int, completed: bool = None, limit: int = 50):
+    stmt = (
+        select(models.Todo)
+        .where(models.Todo.owner_id == owner_id)
+        .order_by(models.Todo.id)
+        .limit(min(max(limit, 1), 200))
+    )
+    if completed is not None:
+        stmt = stmt.where(models.Todo.completed == completed)
+    return [_brief(todo) for todo in db.execute(stmt).scalars()]
+
+
+def search_todos(db: Session, owner_id: int, query: str, limit: int = 20):
+    hits = search.search_todos(db, owner_id, query, min(max(limit, 1), 100), 0)
+    return [{"id": h["id"], "title": h["title"], "completed": h["completed"]} for h in hits]
+
+
+def create_todos(db: Session, owner_id: int, items: list):
+    todos = schemas.TodoBatchCreate(items=items)
+    return _results(batch.create_many(db, owner_id, todos.items))
+
+
+def update_todos(db: Session, owner_id: int, items: list):
+    todos = schemas.TodoBatchUpdate(items=items)
+    return _results(batch.update_many(db, owner_id, todos.items))
+
+
+def complete_todos(db: Session, owner_id: int, ids: list, completed: bool = True):
+    todos = schemas.TodoBatchComplete(ids=ids, completed=completed)
+    return _results(batch.set_completed(db, owner_id, todos.ids, todos.completed))
+
+
+def delete_todos(db: Session, owner_id: int, ids: list):
+    todos = schemas.TodoDelete(ids=ids)
+    return {"deleted": changes.delete_ids(db, owner_id, todos.ids)}
+
+
+HANDLERS = {
+    "list_todos": (list_todos, False),
+    "search_todos": (search_todos, False),
+    "create_todos": (create_todos, True),
+    "update_todos": (update_todos, True),
+    "complete_todos": (complete_todos, True),
+    "delete_todos": (delete_todos, True),
+}
+
+
+def _dump(result) -> str:
+    text = json.dumps(result, default=str)
+    if len(text) > MAX_RESULT_CHARS:
+        text = text[:MAX_RESULT_CHARS] + "…(truncated)"
+    return text
+
+
+def run_tool_calls(db: Session, owner_id: int, tool_calls) -> tuple:
+    """Execute one model turn's tool calls in a single transaction.
+
+    Returns the tool messages to send back to the model and a list of
+    {"tool", "arguments", "result"} actions for the API response. If any
+    mutating call fails the whole turn is rolled back: the changes made
+    before it are reported as rolled back and later ones are skipped.
+    """
+    actions = []
+    applied = []  # indexes of mutating calls that succeeded
+    failure = None
+    try:
+        for call in tool_calls:
+            name = call.function.name
+            mutates = name in HANDLERS and HANDLERS[name][1]
+            arguments = call.function.arguments
+            if mutates and failure:
+                result = {"error": f"Skipped: {failure}"}
+            else:
+                try:
+                    arguments = json.loads(call.function.arguments or "{}")
+                    handler, _ = HANDLERS[name]
+                    result = handler(db, owner_id, **arguments)
+                    if mutates:
+                        applied.append(len(actions))
+                except (KeyError, TypeError, ValueError, ValidationError, todo_counts.QuotaExceeded) as e:
+                    # Bad arguments from the model: report back so it can retry
+                    result = {"error": f"{type(e).__name__}: {e}"}
+                    arguments = call.function.arguments
+                    if mutates:
+                        db.rollback()
+                        failure = f"{name} failed, so this turn's changes were rolled back"
+                        for index in applied:
+                            actions[index]["result"] = {"error": f"Rolled back: {failure}"}
+                        applied.clear()
+            actions.append({"tool": name, "arguments": arguments, "result": result})
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    messages = [
+        {"role": "tool", "tool_call_id": call.id, "content": _dump(action["result"])}
+        for call, action in zip(tool_calls, actions)
+    ]
+    return messages, actions
+
+
+class StreamedToolCalls:
+    """Assembles a streamed model turn's tool calls from their chunk deltas."""
+
+    def __init__(self):
+        self._calls = {}
+
+    def add(self, deltas):
+        for delta in deltas:
+            call = self._calls.setdefault(
+                delta.index, SimpleNamespace(id=None, function=SimpleNamespace(name="", arguments=""))
+            )
+            if delta.id:
+                call.id = delta.id
+            if delta.function is not None:
+                call.function.name += delta.function.name or ""
+                call.function.arguments += delta.function.arguments or ""
+
+    def __bool__(self):
+        return bool(self._calls)
+
+    def message(self, content: str):
+        # Shaped like a non-streamed message, for run_tool_calls and assistant_message
+        return SimpleNamespace(content=content, tool_calls=[self._calls[i] for i in sorted(self._calls)])
+
+
+def assistant_message(message) -> dict:
+    # Echo the model's tool-call turn back in the request-message format
+    return {
+        "role": "assistant",
+        "content": message.content or "",
+        "tool_calls": [
+            {
+                "id": call.id,
+                "type": "function",
+                "function": {"name": call.function.name, "arguments": call.function.arguments},
+            }
+            for call in message.tool_calls
+        ],
+    }
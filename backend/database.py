@@ -1,23 +1,254 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
+import threading
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-# Use SQLite for local development to avoid connection issues
-DATABASE_URL = "sqlite:///./todos_local.db"
+# Falls back to a local SQLite file when no DATABASE_URL is configured
+DEFAULT_DATABASE_URL = "sqlite:///./todos_local.db"
 
-if DATABASE_URL.startswith("postgresql"):
-    # PostgreSQL connection
-    engine = create_engine(DATABASE_URL)
-else:
-    # SQLite connection for fallback/testing
-    engine = create_engine(
-        DATABASE_URL, connect_args={"check_same_thread": False}
-    )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, default))
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes")
+
+
+def normalize_url(url: str) -> str:
+    # Heroku/Neon style URLs use the scheme SQLAlchemy dropped in 1.4, and a
+    # bare postgresql:// should use the psycopg2 driver from requirements.txt
+    for scheme in ("postgres://", "postgresql://"):
+        if url.startswith(scheme):
+            return "postgresql+psycopg2://" + url[len(scheme):]
+    return url
+
+
+def pool_settings() -> dict:
+    return {
+        "pool_size": _env_int("DB_POOL_SIZE", 5),
+        "max_overflow": _env_int("DB_MAX_OVERFLOW", 10),
+        "pool_timeout": _env_int("DB_POOL_TIMEOUT", 30),
+        "pool_recycle": _env_int("DB_POOL_RECYCLE", 1800),
+        "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),
+    }
+
+
+def sqlite_pragmas() -> dict:
+    return {
+        "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+        "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+        "busy_timeout": _env_int("SQLITE_BUSY_TIMEOUT_MS", 5000),
+        "mmap_size": _env_int("SQLITE_MMAP_SIZE", 256 * 1024 * 1024),
+        # Negative values are KiB rather than pages
+        "cache_size": _env_int("SQLITE_CACHE_SIZE", -64000),
+        "foreign_keys": "ON",
+    }
+
+
+def _install_sqlite_pragmas(engine):
+    # SQLite pragmas are per connection so apply them on connect
+    pragmas = sqlite_pragmas()
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def create_db_engine(url: str = None):
+    url = normalize_url(url or os.getenv("DATABASE_URL") or DEFAULT_DATABASE_URL)
+
+    if not url.startswith("sqlite"):
+        # PostgreSQL connection
+        return create_engine(url, **pool_settings())
+
+    # SQLite connection
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+    _install_sqlite_pragmas(engine)
+    return engine
+
+
+def async_url(url: str) -> str:
+    # Same database, async drivers: aiosqlite locally, asyncpg for Postgres
+    url = normalize_url(url)
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    if url.startswith("postgresql+psycopg2://"):
+        # asyncpg spells libpq's sslmode as ssl
+        url = url.replace("sslmode=", "ssl=")
+        return "postgresql+asyncpg://" + url[len("postgresql+psycopg2://"):]
+    return url
+
+
+def create_async_db_engine(url: str = None):
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = async_url(url or os.getenv("DATABASE_URL") or DEFAULT_DATABASE_URL)
+
+    if not url.startswith("sqlite"):
+        return create_async_engine(url, **pool_settings())
+
+    engine = create_async_engine(url)
+    _install_sqlite_pragmas(engine.sync_engine)
+    return engine
+
+
+def describe_engine(engine) -> dict:
+    """Effective settings, read back from the live engine/connection."""
+    report = {
+        "url": engine.url.render_as_string(hide_password=True),
+        "dialect": engine.dialect.name,
+        "pool": type(engine.pool).__name__,
+    }
+    if engine.dialect.name == "sqlite":
+        with engine.connect() as conn:
+            for name in sqlite_pragmas():
+                report[name] = conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+    else:
+        pool = engine.pool
+        report.update(
+            pool_size=pool.size(),
+            max_overflow=getattr(pool, "_max_overflow", None),
+            pool_timeout=getattr(pool, "_timeout", None),
+            pool_recycle=pool._recycle,
+            pool_pre_ping=pool._pre_ping,
+        )
+    return report
+
+
+def add_missing_columns(engine, table):
+    # create_all never alters existing tables, so add columns introduced
+    # since the database was created (they all carry a server default)
+    existing = {column["name"] for column in inspect(engine).get_columns(table.name)}
+    with engine.begin() as conn:
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"
+            if column.server_default is not None:
+                ddl += f" DEFAULT {column.server_default.arg}"
+            if not column.nullable:
+                ddl += " NOT NULL"
+            conn.execute(text(ddl))
+
+
+
+def _pg_index_valid(conn, name: str):
+    # None if the index doesn't exist; False if a failed CONCURRENTLY build left it behind
+    return conn.exec_driver_sql(
+        "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = %(name)s",
+        {"name": name},
+    ).scalar()
+
+
+def create_index_online(engine, name: str, table: str, definition: str):
+    """CREATE INDEX without blocking writes where the database allows it.
+
+    definition is everything after the table name, e.g. "(owner_id, completed)"
+    or "USING GIN (...)". Postgres builds it CONCURRENTLY, which can't run in a
+    transaction; SQLite has no online build, but WAL keeps readers going.
+    """
+    if engine.dialect.name != "postgresql":
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {name} ON {table} {definition}")
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if _pg_index_valid(conn, name) is False:
+            conn.exec_driver_sql(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+        conn.exec_driver_sql(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} {definition}")
+
+
+def drop_index_online(engine, name: str):
+    if engine.dialect.name != "postgresql":
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+# =======================
+# LAZY ENGINES
+# =======================
+# Nothing connects, or even picks a driver, at import: the engines are built
+# by the first session (or get_engine() in the app's startup), so importing
+# models, CLIs and tests stays cheap.
+# "sync" serves CRUD routes from the threadpool with SessionLocal, "async"
+# serves them as coroutines on AsyncSessionLocal
+DB_MODE = os.getenv("DB_MODE", "sync").lower()
+
+_engine = None
+_async_engine = None
+_engine_lock = threading.Lock()
+
+
+class _LazySessionmaker(sessionmaker):
+    def __call__(self, **local_kw):
+        get_engine()
+        return super().__call__(**local_kw)
+
+
+SessionLocal = _LazySessionmaker(autocommit=False, autoflush=False)
 Base = declarative_base()
+
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_db_engine()
+                SessionLocal.configure(bind=_engine)
+    return _engine
+
+
+def get_async_engine():
+    """The async engine in DB_MODE=async, else None."""
+    global _async_engine
+    if DB_MODE != "async":
+        return None
+    if _async_engine is None:
+        with _engine_lock:
+            if _async_engine is None:
+                _async_engine = create_async_db_engine()
+                AsyncSessionLocal.configure(bind=_async_engine)
+    return _async_engine
+
+
+AsyncSessionLocal = None
+if DB_MODE == "async":
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    class _LazyAsyncSessionmaker(async_sessionmaker):
+        def __call__(self, **local_kw):
+            get_async_engine()
+            return super().__call__(**local_kw)
+
+    AsyncSessionLocal = _LazyAsyncSessionmaker(autoflush=False, expire_on_commit=False)
+
+
+async def dispose_engines():
+    """Close pooled connections; the next session builds fresh engines."""
+    global _engine, _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+    if _engine is not None:
+        _engine.dispose()
+        _engine = None
+
+
+def __getattr__(name):
+    # `from database import engine` still works, it just builds the engine then
+    if name == "engine":
+        return get_engine()
+    if name == "async_engine":
+        return get_async_engine()
+    raise AttributeError(f"module 'database' has no attribute '{name}'")
@@ -0,0 +1,215 @@
+# embeddings.py
+import hashlib
+import math
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import models
+import changes
+
+# =======================
+# HASHED TF-IDF VECTORS
+# =======================
+# CPU-only and dependency-free beyond NumPy: tokens (and adjacent-word
+# bigrams) are hashed into a fixed number of signed buckets. Rows keep raw
+# sublinear term frequencies; IDF is applied at query time so adding or
+# removing a todo never requires re-weighting the rest of the matrix.
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+_STOPWORDS = frozenset(
+    "a an and are as at be by do for from have how i in is it me my of on or "
+    "the to what which with you your all any can should".split()
+)
+
+
+def _features(text: str):
+    words = [w for w in _TOKEN.findall(text.lower()) if w not in _STOPWORDS]
+    # Crude suffix stripping so "groceries"/"grocery" and "shopping"/"shop" meet
+    words = [re.sub(r"(ies|ing|es|s)$", "", w) if len(w) > 4 else w for w in words]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def _bucket(feature: str, dim: int):
+    digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+    value = int.from_bytes(digest, "little")
+    return value % dim, 1.0 if (value >> 63) & 1 else -1.0
+
+
+def vectorize(text: str, dim: int) -> np.ndarray:
+    counts = {}
+    for feature in _features(text):
+        index, sign = _bucket(feature, dim)
+        counts[(index, sign)] = counts.get((index, sign), 0) + 1
+    vector = np.zeros(dim, dtype=np.float32)
+    for (index, sign), count in counts.items():
+        vector[index] += sign * (1.0 + math.log(count))
+    return vector
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class TodoEmbeddingIndex:
+    """In-memory (N x dim) float32 matrix of one owner's todo vectors, synced via their change feed."""
+
+    def __init__(self, owner_id: int, dim: int = 512):
+        self.owner_id = owner_id
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._matrix = np.zeros((0, dim), dtype=np.float32)
+        self._size = 0
+        self._ids = []
+        self._rows = {}
+        self._docs = {}
+        self._df = np.zeros(dim, dtype=np.float32)
+        self.version = None
+
+    def __len__(self):
+        return self._size
+
+    # ---- incremental maintenance ----
+    def _grow(self):
+        capacity = max(64, self._matrix.shape[0] * 2)
+        grown = np.zeros((capacity, self.dim), dtype=np.float32)
+        grown[: self._size] = self._matrix[: self._size]
+        self._matrix = grown
+
+    def _remove(self, todo_id: int):
+        row = self._rows.pop(todo_id, None)
+        if row is None:
+            return
+        self._df -= self._matrix[row] != 0
+        self._docs.pop(todo_id, None)
+        last = self._size - 1
+        if row != last:
+            # Swap the last row into the hole to keep the matrix dense
+            self._matrix[row] = self._matrix[last]
+            moved = self._ids[last]
+            self._ids[row] = moved
+            self._rows[moved] = row
+        self._matrix[last] = 0
+        self._ids.pop()
+        self._size -= 1
+
+    def _upsert(self, todo):
+        self._remove(todo.id)
+        text = f"{todo.title} {todo.description or ''}"
+        vector = vectorize(text, self.dim)
+        if self._size == self._matrix.shape[0]:
+            self._grow()
+        row = self._size
+        self._matrix[row] = vector
+        self._df += vector != 0
+        self._ids.append(todo.id)
+        self._rows[todo.id] = row
+        self._docs[todo.id] = (todo.title, todo.description, bool(todo.completed))
+        self._size += 1
+
+    def sync(self, db: Session, batch_size: int = 1000):
+        """Full load on first use, then apply only rows changed since the last sync."""
+        with self._lock:
+            if self.version is None:
+                version = changes.current_version(db, self.owner_id)
+                stmt = (
+                    select(models.Todo)
+                    .where(models.Todo.owner_id == self.owner_id)
+                    .execution_options(yield_per=batch_size)
+                )
+                for todo in db.execute(stmt).scalars():
+                    self._upsert(todo)
+                self.version = version
+                return
+
+            since = self.version
+            while True:
+                feed = changes.changes_since(db, self.owner_id, since, batch_size)
+                # Deletes first: anything in `changed` exists now
+                for todo_id in feed["deleted"]:
+                    self._remove(todo_id)
+                for todo in feed["changed"]:
+                    self._upsert(todo)
+                since = feed["version"]
+                if not feed["has_more"]:
+                    break
+            self.version = since
+
+    # ---- retrieval ----
+    def search(self, query: str, top_k: int = 8, token_budget: int = 300, min_score: float = 0.05):
+        """Best matching todos, most similar first, until top_k or the token budget runs out."""
+        with self._lock:
+            if not self._size:
+                return []
+            idf = np.log((1.0 + self._size) / (1.0 + self._df)) + 1.0
+            q = vectorize(query, self.dim) * idf
+            q_norm = np.linalg.norm(q)
+            if not q_norm:
+                return []
+            docs = self._matrix[: self._size] * idf
+            norms = np.linalg.norm(docs, axis=1)
+            norms[norms == 0] = 1.0
+            scores = docs @ q / (norms * q_norm)
+
+            k = min(top_k, self._size)
+            candidates = np.argpartition(-scores, k - 1)[:k]
+            ranked = candidates[np.argsort(-scores[candidates])]
+
+            hits = []
+            used = 0
+            for row in ranked:
+                score = float(scores[row])
+                if score < min_score:
+                    break
+                todo_id = self._ids[row]
+                title, description, completed = self._docs[todo_id]
+                cost = estimate_tokens(f"{title} {description or ''}") + 4
+                if used + cost > token_budget:
+                    break
+                used += cost
+                hits.append({
+                    "id": todo_id,
+                    "title": title,
+                    "description": description,
+                    "completed": completed,
+                    "score": round(score, 4),
+                })
+            return hits
+
+
+# =======================
+# CONFIG
+# =======================
+RAG_ENABLED = os.getenv("RAG_ENABLED", "true").lower() not in ("0", "false", "no")
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "8"))
+RAG_TOKEN_BUDGET = int(os.getenv("RAG_TOKEN_BUDGET", "300"))
+RAG_EMBED_DIM = int(os.getenv("RAG_EMBED_DIM", "512"))
+# Indexes of the most recently chatting owners; the rest are rebuilt on demand
+RAG_MAX_INDEXES = int(os.getenv("RAG_MAX_INDEXES", "256"))
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def owner_index(owner_id: int) -> TodoEmbeddingIndex:
+    with _indexes_lock:
+        index = _indexes.get(owner_id)
+        if index is None:
+            index = _indexes[owner_id] = TodoEmbeddingIndex(owner_id, RAG_EMBED_DIM)
+            while len(_indexes) > RAG_MAX_INDEXES:
+                _indexes.popitem(last=False)
+        else:
+            _indexes.move_to_end(owner_id)
+        return index
+
+
+def relevant_todos(db: Session, owner_id: int, message: str) -> list:
+    if not RAG_ENABLED:
+        return []
+    index = owner_index(owner_id)
+    index.sync(db)
+    return index.search(message, RAG_TOP_K, RAG_TOKEN_BUDGET)
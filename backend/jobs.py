@@ -0,0 +1,240 @@
+# jobs.py
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+import models
+from database import SessionLocal
+
+# =======================
+# CONFIG
+# =======================
+# Jobs are rows in the app database, executed by an in-process thread pool.
+# The row is the source of truth: pollers and SSE streams read it. Several
+# server processes may share the table, so a worker claims a job by moving
+# it from queued to running in one conditional UPDATE, and keeps its running
+# jobs' updated_at fresh; a running job whose heartbeat stops for
+# JOB_LEASE_SECONDS belonged to a process that died and is queued again.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "24"))
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "15"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+PROGRESS_INTERVAL = 0.5  # seconds between progress writes
+FINISHED = ("succeeded", "failed")
+
+# kind -> (handler, payload schema); see register()
+HANDLERS = {}
+_executor = None
+_heartbeat = None
+_stopping = threading.Event()
+# Ids of the jobs this process is running right now
+_running = set()
+_running_lock = threading.Lock()
+
+
+class UnknownJobKind(Exception):
+    pass
+
+
+def register(kind: str, schema):
+    """Decorator: handler(db, owner_id, payload, report) -> JSON-serializable result.
+
+    payload is an instance of `schema`; report(done, total) records progress.
+    """
+    def wrap(handler):
+        HANDLERS[kind] = (handler, schema)
+        return handler
+    return wrap
+
+
+# =======================
+# SUBMIT / READ
+# =======================
+def submit(db: Session, owner_id: int, kind: str, payload: dict) -> models.Job:
+    """Validate, persist and enqueue; raises UnknownJobKind or pydantic ValidationError."""
+    if kind not in HANDLERS:
+        raise UnknownJobKind(kind)
+    _, schema = HANDLERS[kind]
+    payload = schema(**payload).model_dump()
+    job = models.Job(
+        id=uuid.uuid4().hex, owner_id=owner_id, kind=kind, status="queued",
+        payload=json.dumps(payload), progress=0.0,
+    )
+    db.add(job)
+    db.commit()
+    _enqueue(job.id)
+    return job
+
+
+def get_job(db: Session, owner_id: int, job_id: str):
+    job = db.get(models.Job, job_id)
+    return job if job is not None and job.owner_id == owner_id else None
+
+
+def job_state(job: models.Job) -> dict:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "progress": job.progress,
+        "result": json.loads(job.result) if job.result is not None else None,
+        "error": job.error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+    }
+
+
+# =======================
+# WORKERS
+# =======================
+def _enqueue(job_id: str):
+    if _executor is None:
+        start()
+    _executor.submit(_run, job_id)
+
+
+def _set(db: Session, job_id: str, **values):
+    db.execute(update(models.Job).where(models.Job.id == job_id).values(**values))
+    db.commit()
+
+
+def _claim(db: Session, job_id: str) -> bool:
+    # Only one process wins a queued job, however many have it in their pool
+    claimed = db.execute(
+        update(models.Job).where(models.Job.id == job_id, models.Job.status == "queued").values(status="running")
+    ).rowcount
+    db.commit()
+    return claimed == 1
+
+
+def _run(job_id: str):
+    with SessionLocal() as db:
+        job = db.get(models.Job, job_id)
+        if job is None or job.status != "queued":
+            return
+        if job.kind not in HANDLERS:
+            _set(db, job_id, status="failed", error=f"Unknown job kind: {job.kind}")
+            return
+        if not _claim(db, job_id):
+            return
+        handler, schema = HANDLERS[job.kind]
+        payload = schema(**json.loads(job.payload))
+        with _running_lock:
+            _running.add(job_id)
+        try:
+            _execute(db, job, handler, payload)
+        finally:
+            with _running_lock:
+                _running.discard(job_id)
+
+
+def _execute(db: Session, job: models.Job, handler, payload):
+    job_id = job.id
+    last_write = 0.0
+
+    def report(done: int, total: int):
+        # Progress lives in its own short transaction; throttled so a
+        # chatty handler doesn't turn into a write per item
+        nonlocal last_write
+        now = time.monotonic()
+        if now - last_write >= PROGRESS_INTERVAL or done >= total:
+            last_write = now
+            with SessionLocal() as progress_db:
+                _set(progress_db, job_id, progress=round(done / total, 4) if total else 1.0)
+
+    try:
+        result = handler(db, job.owner_id, payload, report)
+    except Exception as e:
+        db.rollback()
+        _set(db, job_id, status="failed", error=str(getattr(e, "detail", None) or e)[:2000] or type(e).__name__)
+        return
+    _set(db, job_id, status="succeeded", progress=1.0, result=json.dumps(result, default=str))
+
+
+def _before(db: Session, seconds: float):
+    """SQL for CURRENT_TIMESTAMP minus `seconds`.
+
+    updated_at is stamped by the database clock, which on Postgres is in
+    the session's time zone, so staleness is computed there too rather
+    than against Python's UTC time.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        return func.datetime("now", f"-{seconds} seconds")
+    return func.now() - timedelta(seconds=seconds)
+
+
+def _requeue_abandoned(db: Session) -> list:
+    """Queue again the running jobs whose owner process stopped heartbeating; returns their ids."""
+    cutoff = _before(db, JOB_LEASE_SECONDS)
+    stale = db.execute(
+        select(models.Job.id).where(models.Job.status == "running", models.Job.updated_at < cutoff)
+    ).scalars().all()
+    requeued = []
+    for job_id in stale:
+        # Conditional, so two processes sweeping at once requeue it only once
+        if db.execute(
+            update(models.Job)
+            .where(models.Job.id == job_id, models.Job.status == "running", models.Job.updated_at < cutoff)
+            .values(status="queued")
+        ).rowcount:
+            requeued.append(job_id)
+    db.commit()
+    return requeued
+
+
+def _heartbeat_loop():
+    while not _stopping.wait(JOB_HEARTBEAT_SECONDS):
+        try:
+            with _running_lock:
+                running = list(_running)
+            with SessionLocal() as db:
+                if running:
+                    db.execute(
+                        update(models.Job)
+                        .where(models.Job.id.in_(running), models.Job.status == "running")
+                        .values(updated_at=func.now())
+                    )
+                    db.commit()
+                for job_id in _requeue_abandoned(db):
+                    _executor.submit(_run, job_id)
+        except Exception as e:
+            print(f"Job heartbeat failed: {e}")
+
+
+def start(workers: int = None):
+    """Start the worker pool and heartbeat, resume abandoned jobs and prune old finished ones."""
+    global _executor, _heartbeat
+    if _executor is not None:
+        return
+    _executor = ThreadPoolExecutor(max_workers=workers or JOB_WORKERS, thread_name_prefix="job")
+    with SessionLocal() as db:
+        cutoff = _before(db, JOB_RETENTION_HOURS * 3600)
+        db.execute(delete(models.Job).where(models.Job.status.in_(FINISHED), models.Job.updated_at < cutoff))
+        db.commit()
+        _requeue_abandoned(db)
+        # Other processes may hold these in their pools too; _claim picks one
+        pending = db.execute(
+            select(models.Job.id).where(models.Job.status == "queued").order_by(models.Job.created_at)
+        ).scalars().all()
+    for job_id in pending:
+        _executor.submit(_run, job_id)
+    _stopping.clear()
+    _heartbeat = threading.Thread(target=_heartbeat_loop, daemon=True, name="job-heartbeat")
+    _heartbeat.start()
+
+
+def shutdown(wait: bool = True):
+    global _executor, _heartbeat
+    if _executor is not None:
+        _stopping.set()
+        _heartbeat.join(timeout=5)
+        _heartbeat = None
+        _executor.shutdown(wait=wait)
+        _executor = None
@@ -0,0 +1,236 @@
+# llm_cache.py
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional
+
+import shared_state
+
+# =======================
+# KEYING
+# =======================
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_message(message: str) -> str:
+    # "What's pending?" and "  what's PENDING " should share one entry
+    return _WHITESPACE.sub(" ", message).strip().lower().rstrip("?!. ")
+
+
+def make_key(model: str, temperature: float, system_message: str, message: str, scope: str = "") -> str:
+    """`scope` keeps entries apart that must never be shared, e.g. owner and change version."""
+    system_hash = hashlib.sha256(system_message.encode("utf-8")).hexdigest()
+    raw = json.dumps([scope, model, temperature, system_hash, normalize_message(message)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# =======================
+# CACHE TIERS
+# =======================
+class MemoryTier:
+    """In-process LRU with a per-entry TTL."""
+
+    def __init__(self, max_entries: int = 256, ttl: float = 300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: dict):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteTier:
+    """On-disk tier so cached replies survive restarts.
+
+    Keys carry the owner's change version, so most entries are never read
+    again. Every PURGE_EVERY writes, expired rows are deleted and then the
+    soonest-expiring ones past max_entries, so the file stays bounded
+    (give or take PURGE_EVERY rows).
+    """
+
+    PURGE_EVERY = 100
+
+    def __init__(self, path: str, ttl: float = 3600, max_entries: int = 10000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.evictions = 0
+        self.expirations = 0
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_expires_at ON llm_cache (expires_at)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < time.time():
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self.expirations += 1
+                return None
+            return json.loads(row[0])
+
+    def set(self, key: str, value: dict):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + self.ttl),
+            )
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                self._purge(conn)
+
+    def _purge(self, conn):
+        self.expirations += conn.execute("DELETE FROM llm_cache WHERE expires_at < ?", (time.time(),)).rowcount
+        self.evictions += conn.execute(
+            "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY expires_at "
+            "LIMIT max(0, (SELECT COUNT(*) FROM llm_cache) - ?))",
+            (self.max_entries,),
+        ).rowcount
+
+    def __len__(self):
+        with self._lock, self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+
+class SharedTier:
+    """Replies in the shared-state backend, so every worker can hit what one filled.
+
+    Keys carry the owner's change version (see make_key), so entries from
+    before a write are never read again and simply expire, swept by the
+    shared-state backend.
+    """
+
+    PREFIX = "llm_cache:"
+
+    def __init__(self, state, ttl: float = 300):
+        self.state = state
+        self.ttl = ttl
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[dict]:
+        value = self.state.get(self.PREFIX + key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key: str, value: dict):
+        self.state.set(self.PREFIX + key, json.dumps(value), self.ttl)
+
+    def __len__(self):
+        return self.state.count(self.PREFIX)
+
+
+# =======================
+# RESPONSE CACHE
+# =======================
+class LLMResponseCache:
+    """Looks up tiers in order and back-fills the faster ones on a hit."""
+
+    def __init__(self, tiers):
+        self.tiers = list(tiers)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.fills = 0
+        self.miss_latency_total = 0.0
+        self.tokens_saved = 0
+
+    def get(self, key: str) -> Optional[str]:
+        for i, tier in enumerate(self.tiers):
+            value = tier.get(key)
+            if value is not None:
+                for faster in self.tiers[:i]:
+                    faster.set(key, value)
+                with self._lock:
+                    self.hits += 1
+                    self.tokens_saved += value.get("tokens", 0)
+                return value["reply"]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, reply: str, latency: float = 0.0, tokens: int = 0):
+        value = {"reply": reply, "tokens": tokens}
+        for tier in self.tiers:
+            tier.set(key, value)
+        with self._lock:
+            self.fills += 1
+            self.miss_latency_total += latency
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        avg_miss_latency = self.miss_latency_total / self.fills if self.fills else 0.0
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": sum(tier.evictions for tier in self.tiers),
+            "expirations": sum(tier.expirations for tier in self.tiers),
+            "avg_miss_latency_ms": round(avg_miss_latency * 1000, 2),
+            "estimated_latency_saved_ms": round(self.hits * avg_miss_latency * 1000, 2),
+            "tokens_saved": self.tokens_saved,
+            "tiers": [
+                {"type": type(tier).__name__, "entries": len(tier)} for tier in self.tiers
+            ],
+        }
+
+
+def cache_from_env() -> Optional[LLMResponseCache]:
+    if os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    ttl = float(os.getenv("LLM_CACHE_TTL", "300"))
+    tiers = [MemoryTier(int(os.getenv("LLM_CACHE_SIZE", "256")), ttl)]
+    state = shared_state.get_state()
+    if state.shared:
+        tiers.append(SharedTier(state, ttl))
+    path = os.getenv("LLM_CACHE_PATH")
+    if path:
+        tiers.append(SQLiteTier(path, ttl, int(os.getenv("LLM_CACHE_PATH_SIZE", "10000"))))
+    return LLMResponseCache(tiers)
@@ -0,0 +1,370 @@
+# llm_gateway.py
+import asyncio
+import email.utils
+import os
+import random
+import threading
+import time
+
+import httpx
+import openai
+from openai import OpenAI, AsyncOpenAI
+
+import metrics
+import shared_state
+
+# =======================
+# ERRORS
+# =======================
+class LLMUnavailable(Exception):
+    """Raised without calling the provider; the caller answers with a fallback reply."""
+
+
+class CircuitOpenError(LLMUnavailable):
+    def __init__(self, retry_in: float):
+        super().__init__(f"circuit open, retry in {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+
+class LLMOverloaded(LLMUnavailable):
+    def __init__(self, limit: int):
+        super().__init__(f"all {limit} LLM slots busy")
+
+
+class LLMRateLimited(LLMUnavailable):
+    def __init__(self, limit: int):
+        super().__init__(f"LLM rate limit of {limit} requests/minute reached")
+
+
+def is_retryable(e: Exception) -> bool:
+    # 408/409/429 and 5xx are transient; other 4xx (auth, bad model) are not
+    if isinstance(e, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    if isinstance(e, openai.APIStatusError):
+        return e.status_code in (408, 409, 429) or e.status_code >= 500
+    return False
+
+
+def retry_after(e: Exception):
+    """Seconds from a Retry-After / retry-after-ms header, or None."""
+    response = getattr(e, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            # HTTP-date form
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+# =======================
+# CIRCUIT BREAKER
+# =======================
+class CircuitBreaker:
+    """Opens after `threshold` consecutive transient failures; one probe after `cooldown`."""
+
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> bool:
+        """Raises CircuitOpenError when refusing; True if this call is the half-open probe."""
+        with self._lock:
+            if self.opened_at is None:
+                return False
+            waited = time.monotonic() - self.opened_at
+            if waited < self.cooldown or self._probing:
+                raise CircuitOpenError(max(0.0, self.cooldown - waited))
+            # Half-open: let exactly one request through to test the provider
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.threshold:
+                if self.opened_at is None or self._probing:
+                    metrics.llm_circuit_opened.inc()
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+    def release_probe(self):
+        # A probe that ended without a verdict (a 400, a disconnect) must not
+        # leave the breaker stuck half-open. Only the probing call may release
+        # it, or an ordinary call finishing would let a second probe through.
+        with self._lock:
+            self._probing = False
+
+
+# =======================
+# RATE LIMIT
+# =======================
+class SharedRateLimit:
+    """Caps LLM calls per minute across every worker sharing one API key.
+
+    Fixed one-minute windows counted in shared state; the concurrency cap
+    in LLMGateway stays per worker.
+    """
+
+    def __init__(self, state, per_minute: int):
+        self.state = state
+        self.per_minute = per_minute
+
+    def acquire(self):
+        window = int(time.time() // 60)
+        if self.state.incr(f"llm_rate:{window}", ttl=120) > self.per_minute:
+            raise LLMRateLimited(self.per_minute)
+
+
+# =======================
+# GATEWAY
+# =======================
+class LLMGateway:
+    """Shared OpenAI clients behind one retry policy, concurrency cap and circuit breaker.
+
+    Both the sync and async clients reuse pooled keep-alive connections. Retries
+    use full-jitter exponential backoff, or the provider's Retry-After when it
+    sends one, and never run past the per-call deadline. The concurrency cap
+    applies to sync (/chat) and async (/chat/stream) callers separately.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str,
+        timeout: float = 20.0,
+        connect_timeout: float = 5.0,
+        deadline: float = 45.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 8.0,
+        max_concurrency: int = 16,
+        queue_timeout: float = 5.0,
+        max_connections: int = 32,
+        breaker: CircuitBreaker = None,
+        rate_limit: SharedRateLimit = None,
+    ):
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.rate_limit = rate_limit
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._async_slots = None
+
+        http_timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=60.0,
+        )
+        # SDK retries are off: this class owns the retry policy
+        self.client = OpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            max_retries=0,
+            timeout=http_timeout,
+            http_client=httpx.Client(timeout=http_timeout, limits=limits),
+        )
+        self.async_client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            max_retries=0,
+            timeout=http_timeout,
+            http_client=httpx.AsyncClient(timeout=http_timeout, limits=limits),
+        )
+
+    def _admit(self, model: str) -> bool:
+        # Rate limit first: a refused call must not take the half-open probe.
+        # Returns whether this call is the probe.
+        if self.rate_limit is not None:
+            try:
+                self.rate_limit.acquire()
+            except LLMRateLimited:
+                metrics.llm_requests.inc(model=model, outcome="rate_limited")
+                raise
+        try:
+            return self.breaker.before_call()
+        except CircuitOpenError:
+            metrics.llm_requests.inc(model=model, outcome="circuit_open")
+            raise
+
+    def _attempt_timeout(self, give_up_at: float) -> httpx.Timeout:
+        # Each attempt gets the normal timeout, cut short by the overall deadline
+        remaining = max(0.1, give_up_at - time.monotonic())
+        return httpx.Timeout(min(self.timeout, remaining), connect=min(self.connect_timeout, remaining))
+
+    def _backoff(self, attempt: int, e: Exception, remaining: float):
+        """Seconds to wait before the next attempt, or None to give up."""
+        if attempt >= self.max_retries or not is_retryable(e):
+            return None
+        delay = retry_after(e)
+        if delay is None:
+            delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+        if delay >= remaining:
+            return None
+        return delay
+
+    def _finish(self, model: str, started: float, e: Exception = None, usage=None):
+        elapsed = time.perf_counter() - started
+        if e is None:
+            self.breaker.record_success()
+            metrics.record_llm_call(model, elapsed, usage)
+        else:
+            # Only provider trouble counts against the breaker, not bad requests
+            if is_retryable(e):
+                self.breaker.record_failure()
+            metrics.record_llm_call(model, elapsed, outcome="error")
+
+    # ---- sync ----
+    def complete(self, **kwargs):
+        """chat.completions.create with retries; raises LLMUnavailable when shedding load."""
+        model = kwargs.get("model", "")
+        probe = self._admit(model)
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            if probe:
+                self.breaker.release_probe()
+            metrics.llm_requests.inc(model=model, outcome="overloaded")
+            raise LLMOverloaded(self.max_concurrency)
+        try:
+            give_up_at = time.monotonic() + self.deadline
+            attempt = 0
+            while True:
+                started = time.perf_counter()
+                try:
+                    response = self.client.chat.completions.create(
+                        timeout=self._attempt_timeout(give_up_at), **kwargs
+                    )
+                except Exception as e:
+                    delay = self._backoff(attempt, e, give_up_at - time.monotonic())
+                    if delay is None:
+                        self._finish(model, started, e)
+                        raise
+                    metrics.llm_retries.inc(model=model)
+                    attempt += 1
+                    time.sleep(delay)
+                    continue
+                self._finish(model, started, usage=getattr(response, "usage", None))
+                return response
+        finally:
+            self._slots.release()
+            if probe:
+                self.breaker.release_probe()
+
+    # ---- async ----
+    async def _acquire_async(self, model: str, probe: bool):
+        if self._async_slots is None:
+            self._async_slots = asyncio.Semaphore(self.max_concurrency)
+        try:
+            await asyncio.wait_for(self._async_slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if probe:
+                self.breaker.release_probe()
+            metrics.llm_requests.inc(model=model, outcome="overloaded")
+            raise LLMOverloaded(self.max_concurrency) from None
+
+    async def stream(self, **kwargs):
+        """Async generator of completion chunks.
+
+        Retries cover opening the stream only; once the first chunk has been
+        yielded a failure is raised to the caller, which already sent text.
+        """
+        model = kwargs.get("model", "")
+        # The shared rate limit is a blocking sqlite3 call, keep it off the event loop
+        probe = await asyncio.to_thread(self._admit, model)
+        await self._acquire_async(model, probe)
+        try:
+            give_up_at = time.monotonic() + self.deadline
+            attempt = 0
+            while True:
+                started = time.perf_counter()
+                try:
+                    stream = await self.async_client.chat.completions.create(
+                        timeout=self._attempt_timeout(give_up_at), stream=True, **kwargs
+                    )
+                    break
+                except Exception as e:
+                    delay = self._backoff(attempt, e, give_up_at - time.monotonic())
+                    if delay is None:
+                        self._finish(model, started, e)
+                        raise
+                    metrics.llm_retries.inc(model=model)
+                    attempt += 1
+                    await asyncio.sleep(delay)
+            try:
+                async for chunk in stream:
+                    yield chunk
+            except Exception as e:
+                self._finish(model, started, e)
+                raise
+            self._finish(model, started)
+        finally:
+            # Also runs when the client disconnects mid-stream
+            self._async_slots.release()
+            if probe:
+                self.breaker.release_probe()
+
+    async def aclose(self):
+        # Closes both pools; called from the app's shutdown
+        self.client.close()
+        await self.async_client.close()
+
+    def stats(self) -> dict:
+        return {
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "max_concurrency": self.max_concurrency,
+            "rate_limit_per_minute": self.rate_limit.per_minute if self.rate_limit else None,
+        }
+
+
+def gateway_from_env(api_key: str, base_url: str) -> LLMGateway:
+    per_minute = int(os.getenv("LLM_RATE_LIMIT_RPM", "0"))
+    return LLMGateway(
+        api_key=api_key,
+        base_url=base_url,
+        timeout=float(os.getenv("LLM_TIMEOUT", "20")),
+        connect_timeout=float(os.getenv("LLM_CONNECT_TIMEOUT", "5")),
+        deadline=float(os.getenv("LLM_DEADLINE", "45")),
+        max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+        max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "16")),
+        queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT", "5")),
+        max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "32")),
+        breaker=CircuitBreaker(
+            threshold=int(os.getenv("LLM_BREAKER_THRESHOLD", "5")),
+            cooldown=float(os.getenv("LLM_BREAKER_COOLDOWN", "30")),
+        ),
+        rate_limit=SharedRateLimit(shared_state.get_state(), per_minute) if per_minute else None,
+    )
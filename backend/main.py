@@ -1,60 +1,127 @@
 # main.py
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import APIRouter, FastAPI, HTTPException, Depends, Header, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Literal, Optional
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 import os
+import asyncio
+import threading
+import json
+import time
 from urllib.parse import urlparse
 
 import models
 import schemas
-from database import SessionLocal, engine
-
-from openai import OpenAI
+import task_context
+import llm_cache
+import pagination
+import batch
+import metrics
+import changes
+import search
+import chat_tools
+import chat_sessions
+import jobs
+import accounts
+import todo_counts
+import migrations
+import serialization
+import stats
+import transfer
+from database import SessionLocal, get_engine, get_async_engine, dispose_engines, describe_engine, DB_MODE
 
 # =======================
-# ENV + GROQ CLIENT
+# ENV
 # =======================
 load_dotenv()
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-DATABASE_URL = os.getenv("DATABASE_URL")
+# Any OpenAI-compatible endpoint works, e.g. the local stub in benchmarks/
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://api.groq.com/openai/v1")
 
-print(f"GROQ_API_KEY loaded: {'Yes' if GROQ_API_KEY else 'No'}")
-print(f"DATABASE_URL loaded: {'Yes' if DATABASE_URL else 'No'}")
+# =======================
+# LLM CLIENT
+# =======================
+# Groq clients behind timeouts, retries, a concurrency cap and a circuit
+# breaker; the async client keeps streaming generations off the threadpool.
+# Built on first use: openai/httpx are the slowest imports in the app, and
+# without GROQ_API_KEY the CRUD API runs with the assistant switched off.
+_llm = None
+_llm_lock = threading.Lock()
 
-if not GROQ_API_KEY:
-    raise RuntimeError("❌ GROQ_API_KEY not found in .env file")
-if not DATABASE_URL:
-    raise RuntimeError("❌ DATABASE_URL not found in .env file")
+def get_llm():
+    """The shared LLMGateway, or None when no API key is configured."""
+    global _llm
+    if _llm is None and GROQ_API_KEY:
+        with _llm_lock:
+            if _llm is None:
+                import llm_gateway
+                _llm = llm_gateway.gateway_from_env(GROQ_API_KEY, LLM_BASE_URL)
+    return _llm
 
-# Initialize Groq client
-client = OpenAI(
-    api_key=GROQ_API_KEY,
-    base_url="https://api.groq.com/openai/v1"
-)
+# Reply cache for repeated questions; set up at startup. Keys are scoped to
+# the owner's change version (see reply_scope), so a write retires them.
+response_cache = None
 
 # =======================
-# DB INIT
+# STARTUP / SHUTDOWN
 # =======================
-models.Base.metadata.create_all(bind=engine)
+_ready_engine = None
 
-# =======================
-# FASTAPI APP
-# =======================
-app = FastAPI(title="Todo App with AI Chat", version="1.0.0")
+def init_db():
+    """Migrate (or check) the schema and load per-database state; once per engine."""
+    global _ready_engine
+    engine = get_engine()
+    if _ready_engine is engine:
+        return
+    # Schema changes are versioned revisions in migrations.py; when the
+    # database is up to date this costs one query
+    if migrations.AUTO_MIGRATE:
+        migrations.upgrade(engine)
+    elif migrations.pending(engine):
+        raise RuntimeError("❌ Database schema is out of date: run `python migrations.py upgrade`")
+    search.detect_search_index(engine)
+    todo_counts.detect_count_triggers(engine)
+    stats.detect_stats_triggers(engine)
+    with SessionLocal() as db:
+        accounts.ensure_default_user(db)
 
-# =======================
-# CORS
-# =======================
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # dev only
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+    metrics.instrument_engine(engine)
+    async_engine = get_async_engine()
+    if async_engine is not None:
+        metrics.instrument_engine(async_engine.sync_engine)
+
+    print(f"Database engine settings (DB_MODE={DB_MODE}):")
+    for key, value in describe_engine(engine).items():
+        print(f"  {key}: {value}")
+    _ready_engine = engine
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global response_cache, _llm, _ready_engine
+    print(f"GROQ_API_KEY loaded: {'Yes' if GROQ_API_KEY else 'No (AI chat disabled)'}")
+    if not os.getenv("DATABASE_URL"):
+        print("DATABASE_URL not set, using the local SQLite database")
+    await run_in_threadpool(init_db)
+    if response_cache is None:
+        response_cache = llm_cache.cache_from_env()
+    # Workers start once the schema is ready (interrupted jobs resume)
+    await run_in_threadpool(jobs.start)
+    yield
+    await run_in_threadpool(jobs.shutdown)
+    if _llm is not None:
+        await _llm.aclose()
+        _llm = None
+    await dispose_engines()
+    _ready_engine = None
+
+# Routes are declared on a router and attached to an app by create_app()
+router = APIRouter()
 
 # =======================
 # DB DEPENDENCY
@@ -66,42 +133,220 @@ def get_db():
     finally:
         db.close()
 
+# =======================
+# AUTH DEPENDENCY
+# =======================
+# FastAPI caches dependencies per request, so the owner is resolved once
+# (usually from the token cache) and every query below is scoped to it
+def current_owner(authorization: Optional[str] = Header(None)) -> int:
+    try:
+        return accounts.resolve_owner(authorization)
+    except accounts.AuthError as e:
+        raise HTTPException(status_code=401, detail=str(e), headers={"WWW-Authenticate": "Bearer"})
+
+def quota_error(e: todo_counts.QuotaExceeded) -> HTTPException:
+    return HTTPException(status_code=403, detail=str(e))
+
+def requested_fields(fields: Optional[str]) -> tuple:
+    try:
+        return serialization.parse_fields(fields)
+    except serialization.InvalidFields as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 # =======================
 # TEST ROUTE
 # =======================
-@app.get("/test")
+@router.get("/test")
 def test():
     return {"message": "Backend is working ✅"}
 
+@router.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render_metrics(), media_type="text/plain; version=0.0.4")
+
 # =======================
 # TODO CRUD ROUTES
 # =======================
-@app.post("/todos/", response_model=schemas.Todo)
-def create_todo(todo: schemas.TodoCreate, db: Session = Depends(get_db)):
+@router.post("/todos/", response_model=schemas.Todo)
+def create_todo(todo: schemas.TodoCreate, db: Session = Depends(get_db), owner_id: int = Depends(current_owner)):
     try:
-        db_todo = models.Todo(title=todo.title, description=todo.description)
+        todo_counts.check_quota(db, owner_id, 1)
+        version = changes.next_version(db, owner_id)
+        db_todo = models.Todo(owner_id=owner_id, title=todo.title, description=todo.description, version=version)
         db.add(db_todo)
         db.commit()
         db.refresh(db_todo)
-        return schemas.Todo.from_orm(db_todo)
+        return schemas.Todo.model_validate(db_todo)
+    except todo_counts.QuotaExceeded as e:
+        raise quota_error(e)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+# =======================
+# BATCH ROUTES
+# =======================
+# Registered before /todos/{todo_id}; each call is a single transaction
+def run_batch(db: Session, fields: Optional[str], write, *args):
+    projection = requested_fields(fields)
+    try:
+        results = write(db, *args)
+        db.commit()
+    except todo_counts.QuotaExceeded as e:
+        db.rollback()
+        raise quota_error(e)
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
+    return serialization.batch_response(results, projection)
+
+@router.post("/todos/batch/create", response_model=schemas.BatchResult)
+def batch_create(todos: schemas.TodoBatchCreate, fields: Optional[str] = None, db: Session = Depends(get_db), owner_id: int = Depends(current_owner)):
+    return run_batch(db, fields, batch.create_many, owner_id, todos.items)
 
-@app.get("/todos/", response_model=List[schemas.Todo])
-def read_todos(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return db.query(models.Todo).offset(skip).limit(limit).all()
+@router.post("/todos/batch/update", response_model=schemas.BatchResult)
+def batch_update(todos: schemas.TodoBatchUpdate, fields: Optional[str] = None, db: Session = Depends(get_db), owner_id: int = Depends(current_owner)):
+    return run_batch(db, fields, batch.update_many, owner_id, todos.items)
 
-@app.get("/todos/{todo_id}", response_model=schemas.Todo)
-def read_todo(todo_id: int, db: Session = Depends(get_db)):
-    todo = db.query(models.Todo).filter(models.Todo.id == todo_id).first()
+@router.post("/todos/batch/complete", response_model=schemas.BatchResult)
+def batch_complete(todos: schemas.TodoBatchComplete, fields: Optional[str] = None, db: Session = Depends(get_db), owner_id: int = Depends(current_owner)):
+    return run_batch(db, fields, batch.set_completed, owner_id, todos.ids, todos.completed)
+
+@router.get("/todos/counts", response_model=schemas.TodoCounts)
+def read_counts(request: Request, db: Session = Depends(get_db), owner_id: int = Depends(current_owner)):
+    # Per-tab counts for the UI: a primary-key read of the trigger-maintained
+    # todo_counts row, with the same version ETag as the list
+    version = changes.current_version(db, owner_id)
+    etag = changes.list_etag(owner_id, version, "counts")
+    headers = changes.version_headers(etag, version)
+    if changes.etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    total, completed = todo_counts.get_counts(db, owner_id)
+    return serialization.json_response({"total": total, "completed": completed, "pending": total - completed}, headers)
+
+@router.get("/todos/stats", response_model=schemas.TodoStats)
+def read_stats(
+    request: Request,
+    days: int = Query(stats.STATS_DAYS, ge=1, le=365),
+    db: Session = Depends(get_db),
+    owner_id: int = Depends(current_owner),
+):
+    # Dashboard numbers from the trigger-maintained counts and daily rollups:
+    # a key lookup plus a range scan of at most one row per day
+    version = changes.current_version(db, owner_id)
+    # The day is part of the ETag: the series moves on at midnight without a write
+    etag = changes.list_etag(owner_id, version, f"stats:{days}:{stats.today()}")
+    headers = changes.version_headers(etag, version)
+    if changes.etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return serialization.json_response(stats.get_stats(db, owner_id, days), headers)
+
+@router.get("/todos/changes", response_model=schemas.TodoChanges)
+def read_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=10000),
+    db: Session = Depends(get_db),
+    owner_id: int = Depends(current_owner),
+):
+    # Rows written and ids deleted after `since`; resume from the returned version
+    return changes.changes_since(db, owner_id, since, limit)
+
+@router.get("/todos/search", response_model=schemas.SearchResults)
+def search_todos(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+    owner_id: int = Depends(current_owner),
+):
+    # Ranked full-text hits with <mark>-highlighted title and description snippet
+    hits = search.search_todos(db, owner_id, q, limit + 1, offset)
+    next_offset = offset + limit if len(hits) > limit else None
+    return {"query": q, "hits": hits[:limit], "next_offset": next_offset}
+
+@router.get("/todos/export")
+def export_todos(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    completed: Optional[bool] = None,
+    owner_id: int = Depends(current_owner),
+):
+    # Chunked response straight off a streaming cursor; never the whole list in memory
+    return StreamingResponse(
+        transfer.export_chunks(owner_id, format, completed),
+        media_type=transfer.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="todos.{format}"'},
+    )
+
+@router.post("/todos/import", status_code=202, response_model=schemas.JobStatus)
+async def import_todos(
+    request: Request,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    db: Session = Depends(get_db),
+    owner_id: int = Depends(current_owner),
+):
+    # The raw body is spooled to disk as it arrives, then an "import" job
+    # inserts it in batches; poll /jobs/{id} or its /events for progress
+    try:
+        upload = await transfer.save_upload(request.stream(), owner_id, format)
+    except transfer.UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    job = await run_in_threadpool(jobs.submit, db, owner_id, "import", {"upload": upload, "format": format})
+    return jobs.job_state(job)
+
+@router.get("/todos/", response_model=List[schemas.Todo])
+def read_todos(
+    request: Request,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    completed: Optional[bool] = None,
+    title_prefix: Optional[str] = None,
+    order_by: Literal["id", "-id", "title", "-title"] = "id",
+    fields: Optional[str] = Query(None, description="comma-separated subset of id,title,description,completed,created_at,completed_at"),
+    db: Session = Depends(get_db),
+    owner_id: int = Depends(current_owner),
+):
+    projection = requested_fields(fields)
+    # Any write by this owner bumps their version, so (version, query) identifies the body
+    version = changes.current_version(db, owner_id)
+    etag = changes.list_etag(owner_id, version, str(request.query_params))
+    headers = changes.version_headers(etag, version)
+    if changes.etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    # Pass the X-Next-Cursor header back as ?cursor= to fetch the next page
+    query = db.query(*serialization.list_columns(projection, order_by)).filter(models.Todo.owner_id == owner_id)
+    if completed is not None:
+        query = query.filter(models.Todo.completed == completed)
+    if title_prefix:
+        query = query.filter(pagination.prefix_filter(models.Todo.title, title_prefix, db.get_bind().dialect.name))
+    try:
+        query = pagination.apply_keyset(query, order_by, cursor)
+    except pagination.InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if skip and not cursor:
+        # Legacy offset paging, kept for existing clients
+        query = query.offset(skip)
+
+    todos = query.limit(limit + 1).all()
+    if len(todos) > limit:
+        todos = todos[:limit]
+        headers["X-Next-Cursor"] = pagination.encode_cursor(order_by, todos[-1])
+    return serialization.todo_list_response(todos, projection, headers)
+
+def owned_todo(db: Session, owner_id: int, todo_id: int):
+    return db.query(models.Todo).filter(models.Todo.id == todo_id, models.Todo.owner_id == owner_id).first()
+
+@router.get("/todos/{todo_id}", response_model=schemas.Todo)
+def read_todo(todo_id: int, db: Session = Depends(get_db), owner_id: int = Depends(current_owner)):
+    todo = owned_todo(db, owner_id, todo_id)
     if not todo:
         raise HTTPException(status_code=404, detail="Todo not found")
     return todo
 
-@app.put("/todos/{todo_id}", response_model=schemas.Todo)
-def update_todo(todo_id: int, todo: schemas.TodoUpdate, db: Session = Depends(get_db)):
-    db_todo = db.query(models.Todo).filter(models.Todo.id == todo_id).first()
+@router.put("/todos/{todo_id}", response_model=schemas.Todo)
+def update_todo(todo_id: int, todo: schemas.TodoUpdate, db: Session = Depends(get_db), owner_id: int = Depends(current_owner)):
+    db_todo = owned_todo(db, owner_id, todo_id)
     if not db_todo:
         raise HTTPException(status_code=404, detail="Todo not found")
     if todo.title is not None:
@@ -110,110 +355,429 @@ def update_todo(todo_id: int, todo: schemas.TodoUpdate, db: Session = Depends(ge
         db_todo.description = todo.description
     if todo.completed is not None:
         db_todo.completed = todo.completed
+    db_todo.version = changes.next_version(db, owner_id)
     db.commit()
     db.refresh(db_todo)
     return db_todo
 
-@app.delete("/todos/{todo_id}", response_model=schemas.Todo)
-def delete_todo(todo_id: int, db: Session = Depends(get_db)):
-    db_todo = db.query(models.Todo).filter(models.Todo.id == todo_id).first()
+@router.delete("/todos/{todo_id}", response_model=schemas.Todo)
+def delete_todo(todo_id: int, db: Session = Depends(get_db), owner_id: int = Depends(current_owner)):
+    db_todo = owned_todo(db, owner_id, todo_id)
     if not db_todo:
         raise HTTPException(status_code=404, detail="Todo not found")
     db.delete(db_todo)
+    changes.record_deletes(db, owner_id, [db_todo.id], changes.next_version(db, owner_id))
     db.commit()
     return db_todo
 
-@app.post("/todos/delete")
-def bulk_delete(todo_delete: schemas.TodoDelete, db: Session = Depends(get_db)):
-    num_deleted = (
-        db.query(models.Todo)
-        .filter(models.Todo.id.in_(todo_delete.ids))
-        .delete(synchronize_session=False)
-    )
+@router.post("/todos/delete")
+def bulk_delete(todo_delete: schemas.TodoDelete, db: Session = Depends(get_db), owner_id: int = Depends(current_owner)):
+    num_deleted = changes.delete_ids(db, owner_id, todo_delete.ids)
     db.commit()
     return {"message": f"{num_deleted} todos deleted successfully"}
 
 # =======================
-# AI CHAT ROUTE (GROQ)
+# AI CHAT HELPERS
 # =======================
-@app.post("/chat")
-def chat_with_ai(request: schemas.ChatRequest, db: Session = Depends(get_db)):
-    if not GROQ_API_KEY:
-        # Return a helpful message if no API key is configured
-        return {"reply": "AI assistant is not configured. Please add a valid GROQ API key to the .env file."}
+CHAT_MODEL = "llama3-8b-8192"  # Updated to use a reliable Groq model
+CHAT_TEMPERATURE = 0.7
+CHAT_MAX_TOKENS = 500
 
-    try:
-        # Get all todos to provide context to the AI
-        all_todos = db.query(models.Todo).all()
-
-        # Format todos for AI context
-        todos_context = ""
-        if all_todos:
-            pending_todos = [t for t in all_todos if not t.completed]
-            completed_todos = [t for t in all_todos if t.completed]
-
-            todos_context += f"\n\nUSER'S CURRENT TASKS:\n"
-            todos_context += f"- Total tasks: {len(all_todos)}\n"
-            todos_context += f"- Pending tasks: {len(pending_todos)}\n"
-            todos_context += f"- Completed tasks: {len(completed_todos)}\n"
-
-            if pending_todos:
-                todos_context += "\nPENDING TASKS:\n"
-                for i, todo in enumerate(pending_todos[:5], 1):  # Limit to first 5 pending tasks
-                    todos_context += f"  {i}. {todo.title}\n"
-
-            if completed_todos:
-                todos_context += "\nCOMPLETED TASKS:\n"
-                for i, todo in enumerate(completed_todos[:5], 1):  # Limit to first 5 completed tasks
-                    todos_context += f"  {i}. {todo.title}\n"
-        else:
-            todos_context += "\n\nUSER HAS NO TASKS YET."
-
-        # Enhanced system message with context
-        system_message = f"""You are a helpful and friendly AI assistant for a todo application.
+def build_system_message(todos_context: str, tools: bool = False) -> str:
+    if tools:
+        changes_hint = ("If the user wants to add/update/complete/delete tasks, do it with the provided tools. "
+                        "Find ids with search_todos or list_todos first, and change many tasks in one call.")
+    else:
+        changes_hint = "If the user wants to add/update/delete tasks, guide them to use the app interface."
+    # Enhanced system message with context
+    return f"""You are a helpful and friendly AI assistant for a todo application.
         Your name is ProTo-Do AI Assistant.
         You can help users manage their tasks, suggest productivity tips, and answer questions about their todo list.
         {todos_context}
 
         Be concise, helpful, and friendly in your responses.
         If asked about specific tasks, refer to the task list provided above.
-        If the user wants to add/update/delete tasks, guide them to use the app interface."""
-
-        response = client.chat.completions.create(
-            model="llama3-8b-8192",  # Updated to use a reliable Groq model
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": request.message}
-            ],
-            temperature=0.7,
-            max_tokens=500
-        )
-
-        # Safely return content
-        reply = response.choices[0].message.content if response.choices else "I couldn't generate a response. Please try again."
-        return {"reply": reply}
+        {changes_hint}"""
 
-    except Exception as e:
+def complete_chat(messages, **kwargs):
+    return get_llm().complete(
+        model=CHAT_MODEL,
+        messages=messages,
+        temperature=CHAT_TEMPERATURE,
+        max_tokens=CHAT_MAX_TOKENS,
+        **kwargs
+    )
+
+def fallback_reply(e: Exception) -> str:
+    # Only reached after an LLM call was attempted, so these are loaded by now
+    import openai
+    import llm_gateway
+
+    if isinstance(e, llm_gateway.LLMUnavailable):
+        # Shed before reaching the provider, no traceback worth printing
+        print(f"AI Service skipped: {e}")
+    else:
         import traceback
         error_details = traceback.format_exc()
         print(f"AI Service Error: {str(e)}")
         print(f"Full traceback: {error_details}")
-        
-        # Return a helpful fallback response instead of throwing an exception
-        fallback_responses = {
-            "auth_error": "⚠️ AI service authentication failed. Please check your API key in the .env file.",
-            "network_error": "📡 Unable to connect to AI service. Please check your internet connection.",
-            "rate_limit": "⏳ Rate limit exceeded. Please try again later.",
-            "model_error": "🔧 Model not found. Please check the model name in the backend configuration.",
-            "general_error": f"🤖 AI service temporarily unavailable: {str(e)[:100]}..."
-        }
-        
-        error_msg = str(e).lower()
-        if "invalid_api_key" in error_msg or "authentication" in error_msg or "401" in error_msg:
-            return {"reply": fallback_responses["auth_error"]}
-        elif "rate_limit" in error_msg or "429" in error_msg:
-            return {"reply": fallback_responses["rate_limit"]}
-        elif "not found" in error_msg or "does not exist" in error_msg:
-            return {"reply": fallback_responses["model_error"]}
-        else:
-            return {"reply": fallback_responses["general_error"]}
+
+    # Return a helpful fallback response instead of throwing an exception
+    fallback_responses = {
+        "auth_error": "⚠️ AI service authentication failed. Please check your API key in the .env file.",
+        "network_error": "📡 Unable to connect to AI service. Please check your internet connection.",
+        "rate_limit": "⏳ Rate limit exceeded. Please try again later.",
+        "model_error": "🔧 Model not found. Please check the model name in the backend configuration.",
+        "busy": "⏳ The AI assistant is busy right now. Please try again in a moment.",
+        "general_error": f"🤖 AI service temporarily unavailable: {str(e)[:100]}..."
+    }
+
+    if isinstance(e, llm_gateway.LLMOverloaded):
+        return fallback_responses["busy"]
+    elif isinstance(e, llm_gateway.LLMRateLimited):
+        return fallback_responses["rate_limit"]
+    elif isinstance(e, llm_gateway.CircuitOpenError):
+        return f"🤖 AI service temporarily unavailable. Please try again in {max(1, round(e.retry_in))}s."
+    elif isinstance(e, openai.AuthenticationError):
+        return fallback_responses["auth_error"]
+    elif isinstance(e, openai.RateLimitError):
+        return fallback_responses["rate_limit"]
+    elif isinstance(e, openai.NotFoundError):
+        return fallback_responses["model_error"]
+    elif isinstance(e, (openai.APIConnectionError, openai.APITimeoutError)):
+        return fallback_responses["network_error"]
+    else:
+        return fallback_responses["general_error"]
+
+def summarize_history(messages) -> str:
+    # Cheap, deterministic call used to compact long chat sessions
+    response = get_llm().complete(
+        model=CHAT_MODEL,
+        messages=messages,
+        temperature=0.2,
+        max_tokens=chat_sessions.SUMMARY_MAX_TOKENS
+    )
+    return response.choices[0].message.content if response.choices else None
+
+def load_history(db: Session, owner_id: int, session_id: Optional[str]) -> list:
+    if not session_id:
+        return []
+    try:
+        return chat_sessions.history_messages(db, owner_id, session_id, summarize_history)
+    except chat_sessions.SessionNotFound:
+        raise HTTPException(status_code=404, detail="Chat session not found")
+
+def sse_event(data) -> str:
+    return f"data: {json.dumps(data)}\n\n"
+
+def reply_scope(db: Session, owner_id: int) -> str:
+    # Cached replies are per owner and stop matching after any write of theirs
+    return f"{owner_id}:{changes.current_version(db, owner_id)}"
+
+# =======================
+# AI CHAT ROUTE (GROQ)
+# =======================
+@router.post("/chat")
+def chat_with_ai(request: schemas.ChatRequest, db: Session = Depends(get_db), owner_id: int = Depends(current_owner)):
+    if get_llm() is None:
+        # Return a helpful message if no API key is configured
+        return {"reply": "AI assistant is not configured. Please add a valid GROQ API key to the .env file.", "actions": []}
+
+    # Summary + recent turns of the session, bounded by the history budget
+    history = load_history(db, owner_id, request.session_id)
+
+    def remember(reply):
+        if request.session_id and reply:
+            chat_sessions.append_turn(db, request.session_id, request.message, reply)
+
+    # Every response carries `actions`, the todo changes the assistant made
+    actions = []
+    try:
+        # Counts come from cached aggregate queries; tasks are the ones most
+        # similar to the message, retrieved from the local embedding index
+        todos_context = task_context.build_chat_context(db, owner_id, request.message)
+        use_tools = chat_tools.CHAT_TOOLS_ENABLED
+        system_message = build_system_message(todos_context, tools=use_tools)
+
+        # A reply only depends on the prompt when there is no history before it
+        cache_key = None
+        if response_cache is not None and not history:
+            cache_key = llm_cache.make_key(
+                CHAT_MODEL, CHAT_TEMPERATURE, system_message, request.message, reply_scope(db, owner_id)
+            )
+            cached_reply = response_cache.get(cache_key)
+            if cached_reply is not None:
+                remember(cached_reply)
+                return {"reply": cached_reply, "actions": actions}
+
+        messages = [
+            {"role": "system", "content": system_message},
+            *history,
+            {"role": "user", "content": request.message}
+        ]
+        started = time.perf_counter()
+        tokens = 0
+        for round_no in range(chat_tools.MAX_TOOL_ROUNDS + 1):
+            # Out of rounds: the last call gets no tools, forcing a plain answer
+            tool_kwargs = {"tools": chat_tools.TOOLS} if use_tools and round_no < chat_tools.MAX_TOOL_ROUNDS else {}
+            response = complete_chat(messages, **tool_kwargs)
+            usage = getattr(response, "usage", None)
+            tokens += usage.total_tokens if usage else 0
+
+            # Safely return content
+            if not response.choices:
+                return {"reply": "I couldn't generate a response. Please try again.", "actions": actions}
+            message = response.choices[0].message
+            if not getattr(message, "tool_calls", None):
+                break
+            # All tool calls of this model turn share one DB transaction
+            tool_messages, turn_actions = chat_tools.run_tool_calls(db, owner_id, message.tool_calls)
+            messages.append(chat_tools.assistant_message(message))
+            messages.extend(tool_messages)
+            actions.extend(turn_actions)
+
+        reply = message.content
+        # Turns that changed data are not replayable, only cache pure answers
+        if cache_key is not None and reply and not actions:
+            response_cache.set(cache_key, reply, time.perf_counter() - started, tokens)
+        remember(reply)
+        return {"reply": reply, "actions": actions}
+
+    except Exception as e:
+        return {"reply": fallback_reply(e), "actions": actions}
+
+@router.post("/chat/stream")
+async def chat_stream(request: schemas.ChatRequest, db: Session = Depends(get_db), owner_id: int = Depends(current_owner)):
+    # Streams the reply as Server-Sent Events: {"delta": ...} chunks, an
+    # {"actions": [...]} event after each round of tool calls, then [DONE]
+    llm = get_llm()
+    if llm is None:
+        async def not_configured():
+            yield sse_event({"delta": "AI assistant is not configured. Please add a valid GROQ API key to the .env file."})
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(not_configured(), media_type="text/event-stream")
+
+    # The context builder is sync SQLAlchemy, keep it off the event loop
+    history = await run_in_threadpool(load_history, db, owner_id, request.session_id)
+    todos_context = await run_in_threadpool(task_context.build_chat_context, db, owner_id, request.message)
+    use_tools = chat_tools.CHAT_TOOLS_ENABLED
+    system_message = build_system_message(todos_context, tools=use_tools)
+
+    # These run after the response started, so they can't share the request's session
+    def remember(reply):
+        if request.session_id and reply:
+            with SessionLocal() as session_db:
+                chat_sessions.append_turn(session_db, request.session_id, request.message, reply)
+
+    def run_tools(tool_calls):
+        with SessionLocal() as session_db:
+            return chat_tools.run_tool_calls(session_db, owner_id, tool_calls)
+
+    cache_key = None
+    if response_cache is not None and not history:
+        scope = await run_in_threadpool(reply_scope, db, owner_id)
+        cache_key = llm_cache.make_key(CHAT_MODEL, CHAT_TEMPERATURE, system_message, request.message, scope)
+        # The disk and shared tiers are blocking sqlite3 calls too
+        cached_reply = await run_in_threadpool(response_cache.get, cache_key)
+        if cached_reply is not None:
+            await run_in_threadpool(remember, cached_reply)
+
+            async def cached_stream():
+                yield sse_event({"delta": cached_reply})
+                yield "data: [DONE]\n\n"
+            return StreamingResponse(cached_stream(), media_type="text/event-stream")
+
+    async def event_stream():
+        # Same tool rounds as /chat, each one streamed: text deltas go out as
+        # they arrive, tool calls are run and their {"actions": [...]} sent
+        # before the next round
+        started = time.perf_counter()
+        parts = []
+        actions = []
+        messages = [
+            {"role": "system", "content": system_message},
+            *history,
+            {"role": "user", "content": request.message}
+        ]
+        try:
+            for round_no in range(chat_tools.MAX_TOOL_ROUNDS + 1):
+                tool_kwargs = {"tools": chat_tools.TOOLS} if use_tools and round_no < chat_tools.MAX_TOOL_ROUNDS else {}
+                stream = llm.stream(
+                    model=CHAT_MODEL,
+                    messages=messages,
+                    temperature=CHAT_TEMPERATURE,
+                    max_tokens=CHAT_MAX_TOKENS,
+                    **tool_kwargs
+                )
+                round_parts = []
+                tool_calls = chat_tools.StreamedToolCalls()
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta
+                    if delta.content:
+                        round_parts.append(delta.content)
+                        yield sse_event({"delta": delta.content})
+                    if getattr(delta, "tool_calls", None):
+                        tool_calls.add(delta.tool_calls)
+                parts.extend(round_parts)
+                if not tool_calls:
+                    break
+                message = tool_calls.message("".join(round_parts))
+                tool_messages, turn_actions = await run_in_threadpool(run_tools, message.tool_calls)
+                messages.append(chat_tools.assistant_message(message))
+                messages.extend(tool_messages)
+                actions.extend(turn_actions)
+                yield sse_event({"actions": turn_actions})
+            # Turns that changed data are not replayable, only cache pure answers
+            if cache_key is not None and parts and not actions:
+                await run_in_threadpool(response_cache.set, cache_key, "".join(parts), time.perf_counter() - started)
+            await run_in_threadpool(remember, "".join(parts))
+        except Exception as e:
+            yield sse_event({"delta": fallback_reply(e)})
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/chat/cache")
+def chat_cache_stats():
+    if response_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **response_cache.stats()}
+
+@router.post("/chat/sessions", status_code=201)
+def create_chat_session(db: Session = Depends(get_db), owner_id: int = Depends(current_owner)):
+    return {"session_id": chat_sessions.create_session(db, owner_id)}
+
+@router.get("/chat/sessions/{session_id}", response_model=schemas.ChatSessionDetail)
+def read_chat_session(session_id: str, db: Session = Depends(get_db), owner_id: int = Depends(current_owner)):
+    try:
+        session = chat_sessions.get_session(db, owner_id, session_id)
+    except chat_sessions.SessionNotFound:
+        raise HTTPException(status_code=404, detail="Chat session not found")
+    messages = chat_sessions.session_messages(db, session_id)
+    return {"session_id": session.id, "summary": session.summary, "messages": messages}
+
+@router.delete("/chat/sessions/{session_id}")
+def delete_chat_session(session_id: str, db: Session = Depends(get_db), owner_id: int = Depends(current_owner)):
+    try:
+        chat_sessions.delete_session(db, owner_id, session_id)
+    except chat_sessions.SessionNotFound:
+        raise HTTPException(status_code=404, detail="Chat session not found")
+    return {"message": "Chat session deleted"}
+
+@router.get("/chat/status")
+def chat_status():
+    llm = get_llm()
+    if llm is None:
+        return {"configured": False}
+    return {"configured": True, **llm.stats()}
+
+# =======================
+# BACKGROUND JOBS
+# =======================
+JOB_DELETE_CHUNK = 500
+JOB_POLL_INTERVAL = 0.5
+
+@jobs.register("chat", schemas.ChatRequest)
+def chat_job(db: Session, owner_id: int, request: schemas.ChatRequest, report):
+    # Same path as POST /chat, tools and sessions included
+    return chat_with_ai(request, db, owner_id)
+
+@jobs.register("bulk_delete", schemas.TodoDelete)
+def bulk_delete_job(db: Session, owner_id: int, todo_delete: schemas.TodoDelete, report):
+    # Commit per chunk so a huge delete never holds one long write lock
+    ids = todo_delete.ids
+    num_deleted = 0
+    for start in range(0, len(ids), JOB_DELETE_CHUNK):
+        num_deleted += changes.delete_ids(db, owner_id, ids[start:start + JOB_DELETE_CHUNK])
+        db.commit()
+        report(min(start + JOB_DELETE_CHUNK, len(ids)), len(ids))
+    return {"deleted": num_deleted}
+
+@jobs.register("import", schemas.TodoImport)
+def import_job(db: Session, owner_id: int, todo_import: schemas.TodoImport, report):
+    return transfer.import_file(db, owner_id, todo_import.upload, todo_import.format, report)
+
+@router.post("/jobs", status_code=202, response_model=schemas.JobStatus)
+def submit_job(job: schemas.JobSubmit, db: Session = Depends(get_db), owner_id: int = Depends(current_owner)):
+    try:
+        submitted = jobs.submit(db, owner_id, job.kind, job.payload)
+    except jobs.UnknownJobKind:
+        raise HTTPException(status_code=400, detail=f"Unknown job kind '{job.kind}', expected one of {sorted(jobs.HANDLERS)}")
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False))
+    return jobs.job_state(submitted)
+
+@router.get("/jobs/{job_id}", response_model=schemas.JobStatus)
+def read_job(job_id: str, db: Session = Depends(get_db), owner_id: int = Depends(current_owner)):
+    job = jobs.get_job(db, owner_id, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return jobs.job_state(job)
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, owner_id: int = Depends(current_owner)):
+    # SSE: one event per status/progress change, the last one carries the result
+    def poll():
+        with SessionLocal() as poll_db:
+            job = jobs.get_job(poll_db, owner_id, job_id)
+            return jobs.job_state(job) if job else None
+
+    state = await run_in_threadpool(poll)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def event_stream():
+        current = state
+        last = None
+        while True:
+            if (current["status"], current["progress"]) != last:
+                last = (current["status"], current["progress"])
+                yield sse_event(schemas.JobStatus(**current).model_dump(mode="json"))
+            if current["status"] in jobs.FINISHED:
+                break
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+            current = await run_in_threadpool(poll)
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# =======================
+# APP FACTORY
+# =======================
+def create_app() -> FastAPI:
+    """The API with routes and middleware; connecting happens in the lifespan.
+
+    `uvicorn main:app` serves the module-level instance; tests and tools can
+    build their own with `uvicorn --factory main:create_app`.
+    """
+    app = FastAPI(title="Todo App with AI Chat", version="1.0.0", lifespan=lifespan)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # dev only
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "X-Change-Version", "ETag", "Server-Timing"],
+    )
+    # Per-route latency, SQL counts and LLM time, exported on /metrics
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    if DB_MODE == "async":
+        import todos_async
+        app.include_router(todos_async.routes(router, current_owner))
+    else:
+        app.include_router(router)
+    return app
+
+app = create_app()
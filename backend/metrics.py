@@ -0,0 +1,213 @@
+# metrics.py
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+
+from sqlalchemy import event
+
+# =======================
+# METRIC TYPES
+# =======================
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _label_str(labels) -> str:
+    if not labels:
+        return ""
+    pairs = (
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+        for k, v in labels
+    )
+    return "{" + ",".join(pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_label_str(key)} {value}"
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for key, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket{_label_str(key + (('le', bound),))} {cumulative}"
+            yield f"{self.name}_bucket{_label_str(key + (('le', '+Inf'),))} {count}"
+            yield f"{self.name}_sum{_label_str(key)} {total}"
+            yield f"{self.name}_count{_label_str(key)} {count}"
+
+
+# =======================
+# REGISTRY
+# =======================
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route")
+db_queries_per_request = Histogram(
+    "db_queries_per_request", "SQL statements executed per HTTP request", COUNT_BUCKETS)
+db_time_per_request = Histogram(
+    "db_time_per_request_seconds", "Time spent in SQL per HTTP request")
+db_query_duration = Histogram(
+    "db_query_duration_seconds", "Latency of individual SQL statements")
+llm_request_duration = Histogram(
+    "llm_request_duration_seconds", "Latency of LLM completion calls")
+llm_requests = Counter(
+    "llm_requests_total", "LLM completion calls by outcome")
+llm_tokens = Counter(
+    "llm_tokens_total", "Tokens reported by the LLM provider")
+llm_retries = Counter(
+    "llm_retries_total", "LLM calls retried after a transient error")
+llm_circuit_opened = Counter(
+    "llm_circuit_opened_total", "Times the LLM circuit breaker opened")
+
+REGISTRY = [
+    http_request_duration,
+    db_queries_per_request,
+    db_time_per_request,
+    db_query_duration,
+    llm_request_duration,
+    llm_requests,
+    llm_tokens,
+    llm_retries,
+    llm_circuit_opened,
+]
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# =======================
+# PER-REQUEST ACCOUNTING
+# =======================
+class RequestStats:
+    __slots__ = ("db_queries", "db_time", "llm_time")
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.llm_time = 0.0
+
+
+# The stats object is shared by reference, so threadpool workers that copy
+# the context still add to the same request's totals
+_current = contextvars.ContextVar("request_stats", default=None)
+
+
+def instrument_engine(engine):
+    """Count statements and DB time; pass engine.sync_engine for async engines."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        db_query_duration.observe(elapsed)
+        stats = _current.get()
+        if stats is not None:
+            stats.db_queries += 1
+            stats.db_time += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        starts = context.connection.info.get("query_start") if context.connection else None
+        if starts:
+            starts.pop()
+
+
+def record_llm_call(model: str, elapsed: float, usage=None, outcome: str = "ok"):
+    llm_request_duration.observe(elapsed, model=model)
+    llm_requests.inc(model=model, outcome=outcome)
+    if usage is not None:
+        llm_tokens.inc(getattr(usage, "prompt_tokens", 0) or 0, model=model, type="prompt")
+        llm_tokens.inc(getattr(usage, "completion_tokens", 0) or 0, model=model, type="completion")
+    stats = _current.get()
+    if stats is not None:
+        stats.llm_time += elapsed
+
+
+class MetricsMiddleware:
+    """Records per-route latency and adds a Server-Timing header (db/llm/app)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                elapsed = time.perf_counter() - started
+                timing = (
+                    f"db;dur={stats.db_time * 1000:.1f};desc=\"{stats.db_queries} queries\", "
+                    f"llm;dur={stats.llm_time * 1000:.1f}, "
+                    f"app;dur={elapsed * 1000:.1f}"
+                )
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", timing.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            # Label by route template, not raw path, to keep cardinality bounded
+            path = getattr(route, "path", "unmatched")
+            http_request_duration.observe(
+                time.perf_counter() - started,
+                method=scope["method"], route=path, status=status["code"],
+            )
+            db_queries_per_request.observe(stats.db_queries, route=path)
+            db_time_per_request.observe(stats.db_time, route=path)
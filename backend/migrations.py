@@ -0,0 +1,265 @@
+# migrations.py
+import argparse
+import os
+
+from sqlalchemy import MetaData, text
+from sqlalchemy.schema import CreateTable
+
+import models
+import search
+import stats
+import todo_counts
+from database import add_missing_columns, create_index_online, drop_index_online
+
+# =======================
+# CONFIG
+# =======================
+# Versioned, forward-only schema changes, recorded in schema_migrations. The
+# app applies pending ones at startup unless DB_AUTO_MIGRATE is off; then it
+# refuses to start until `python migrations.py upgrade` has been run, which is
+# how changes get rolled out against a live Postgres database.
+AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "true").lower() in ("1", "true", "yes")
+
+# Arbitrary key for pg_advisory_lock: one migrator at a time per database
+LOCK_KEY = 7310451
+
+# [(version, description, apply(engine))], in order; see revision()
+REVISIONS = []
+
+
+def revision(version: str, description: str):
+    """Decorator: apply(engine) runs once per database, in version order.
+
+    Steps should be idempotent (IF NOT EXISTS etc.): a revision that fails
+    part-way is re-run from the top on the next upgrade. It is recorded only
+    once apply returns, so apply must raise rather than log a failure.
+    """
+    def wrap(apply):
+        REVISIONS.append((version, description, apply))
+        return apply
+    return wrap
+
+
+# =======================
+# REVISIONS
+# =======================
+@revision("0001", "Tables and columns")
+def baseline(engine):
+    # Databases from before migrations were created by create_all plus
+    # add_missing_columns; this brings any of them, or an empty one, to the
+    # same tables. Indexes on tables created here are built with them.
+    models.Base.metadata.create_all(bind=engine)
+    for table in models.Base.metadata.sorted_tables:
+        add_missing_columns(engine, table)
+
+
+# Owner-leading replacements for the single-tenant indexes, built online
+OWNER_INDEXES = [
+    ("ix_todos_owner_completed_id", "todos", "(owner_id, completed, id)"),
+    ("ix_todos_owner_title_id", "todos", "(owner_id, title, id)"),
+    ("ix_todos_owner_completed_title_id", "todos", "(owner_id, completed, title, id)"),
+    ("ix_todos_owner_version", "todos", "(owner_id, version)"),
+    ("ix_todo_tombstones_owner_version", "todo_tombstones", "(owner_id, version)"),
+    ("ix_chat_sessions_owner_id", "chat_sessions", "(owner_id)"),
+    ("ix_chat_messages_session_id", "chat_messages", "(session_id, id)"),
+    ("ix_jobs_owner_id", "jobs", "(owner_id)"),
+    ("ix_jobs_status", "jobs", "(status)"),
+]
+SUPERSEDED_INDEXES = [
+    "ix_todos_completed_id",
+    "ix_todos_title_id",
+    "ix_todos_completed_title_id",
+    "ix_todos_version",
+    "ix_todo_tombstones_version",
+]
+
+
+@revision("0002", "Owner-scoped query indexes")
+def owner_indexes(engine):
+    for name, table, columns in OWNER_INDEXES:
+        create_index_online(engine, name, table, columns)
+    # Dropped only once their replacements exist, so no query loses its index
+    for name in SUPERSEDED_INDEXES:
+        drop_index_online(engine, name)
+
+
+@revision("0003", "Full-text search index")
+def search_index(engine):
+    search.install_search_index(engine)
+
+
+@revision("0004", "Per-owner todo count triggers")
+def count_triggers(engine):
+    todo_counts.install_count_triggers(engine)
+
+
+@revision("0005", "Todo timestamps and daily stats triggers")
+def todo_stats(engine):
+    add_missing_columns(engine, models.Todo.__table__)
+    models.TodoDailyStat.__table__.create(bind=engine, checkfirst=True)
+    stats.install_stats_triggers(engine)
+
+
+@revision("0006", "Never reuse todo ids")
+def todo_autoincrement(engine):
+    # Postgres sequences never hand an id out twice; SQLite without
+    # AUTOINCREMENT reuses the highest id once its row is deleted, and the
+    # table has to be rebuilt to change that
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as conn:
+        ddl = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'todos'").scalar()
+        if "AUTOINCREMENT" not in ddl.upper():
+            # Indexes and triggers go with the old table; recreated as they were
+            dependents = conn.exec_driver_sql(
+                "SELECT sql FROM sqlite_master WHERE tbl_name = 'todos' "
+                "AND type IN ('index', 'trigger') AND sql IS NOT NULL"
+            ).scalars().all()
+            meta = MetaData()
+            models.User.__table__.to_metadata(meta)
+            rebuilt = models.Todo.__table__.to_metadata(meta, name="todos_rebuild")
+            columns = ", ".join(column.name for column in rebuilt.columns)
+            conn.exec_driver_sql("DROP TABLE IF EXISTS todos_rebuild")
+            conn.execute(CreateTable(rebuilt))
+            conn.exec_driver_sql(f"INSERT INTO todos_rebuild ({columns}) SELECT {columns} FROM todos")
+            conn.exec_driver_sql("DROP TABLE todos")
+            conn.exec_driver_sql("ALTER TABLE todos_rebuild RENAME TO todos")
+            for sql in dependents:
+                conn.exec_driver_sql(sql)
+        # A deleted id above every remaining row must not come back either
+        top = conn.exec_driver_sql(
+            "SELECT max(coalesce((SELECT max(id) FROM todos), 0), "
+            "coalesce((SELECT max(todo_id) FROM todo_tombstones), 0), "
+            "coalesce((SELECT seq FROM sqlite_sequence WHERE name = 'todos'), 0))"
+        ).scalar()
+        conn.exec_driver_sql("DELETE FROM sqlite_sequence WHERE name = 'todos'")
+        conn.exec_driver_sql(f"INSERT INTO sqlite_sequence (name, seq) VALUES ('todos', {int(top)})")
+
+
+@revision("0007", "Code point order title index for prefix filters")
+def title_prefix_index(engine):
+    # pagination.prefix_filter compares titles COLLATE "C" on Postgres, which
+    # the default-collation (owner_id, title, id) index can't serve. SQLite
+    # already compares in code point order.
+    if engine.dialect.name == "postgresql":
+        create_index_online(engine, "ix_todos_owner_title_c", "todos", '(owner_id, title COLLATE "C", id)')
+
+
+@revision("0008", "Stats triggers count imported completions on their own day")
+def stats_completion_day(engine):
+    # The trigger DDL drops and recreates, so this replaces the 0005 triggers
+    stats.install_stats_triggers(engine)
+
+
+@revision("0009", "UTC todo timestamps and stats days on Postgres")
+def utc_stats_days(engine):
+    # Postgres stamped todos in the session's TimeZone; SQLite was always UTC
+    if engine.dialect.name != "postgresql":
+        return
+    stats.install_stats_triggers(engine)
+    with engine.begin() as conn:
+        zone = conn.exec_driver_sql("SHOW TimeZone").scalar()
+        if zone.upper() not in ("UTC", "ETC/UTC", "GMT", "Z"):
+            # Earlier rollup days stay as they were counted
+            conn.execute(
+                text(
+                    "UPDATE todos SET created_at = (created_at AT TIME ZONE :zone) AT TIME ZONE 'UTC', "
+                    "completed_at = (completed_at AT TIME ZONE :zone) AT TIME ZONE 'UTC'"
+                ),
+                {"zone": zone},
+            )
+
+
+# =======================
+# RUNNER
+# =======================
+def _ensure_table(engine):
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            """CREATE TABLE IF NOT EXISTS schema_migrations (
+                version VARCHAR(32) PRIMARY KEY,
+                description VARCHAR(200) NOT NULL,
+                applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )"""
+        )
+
+
+def applied(engine) -> set:
+    with engine.connect() as conn:
+        exists = engine.dialect.has_table(conn, "schema_migrations")
+        if not exists:
+            return set()
+        return set(conn.exec_driver_sql("SELECT version FROM schema_migrations").scalars())
+
+
+def pending(engine) -> list:
+    """Revisions not yet applied, in order; one cheap query when up to date."""
+    done = applied(engine)
+    return [r for r in REVISIONS if r[0] not in done]
+
+
+def _record(engine, version: str, description: str):
+    with engine.begin() as conn:
+        conn.execute(
+            text("INSERT INTO schema_migrations (version, description) VALUES (:v, :d)"),
+            {"v": version, "d": description},
+        )
+
+
+def upgrade(engine, target: str = None) -> list:
+    """Apply pending revisions up to `target` (default: all); returns their versions."""
+    lock = None
+    if engine.dialect.name == "postgresql":
+        # Several app processes may start at once; the rest wait here and
+        # then find nothing left to do
+        lock = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        lock.execute(text("SELECT pg_advisory_lock(:key)"), {"key": LOCK_KEY})
+    try:
+        _ensure_table(engine)
+        ran = []
+        for version, description, apply in pending(engine):
+            if target is not None and version > target:
+                break
+            print(f"Migrating {version}: {description}")
+            apply(engine)
+            _record(engine, version, description)
+            ran.append(version)
+        return ran
+    finally:
+        if lock is not None:
+            lock.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": LOCK_KEY})
+            lock.close()
+
+
+def stamp(engine, target: str):
+    """Mark revisions up to `target` as applied without running them."""
+    _ensure_table(engine)
+    for version, description, _ in pending(engine):
+        if version > target:
+            break
+        _record(engine, version, description)
+
+
+# =======================
+# CLI
+# =======================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Database schema migrations")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="list applied and pending revisions")
+    up = sub.add_parser("upgrade", help="apply pending revisions")
+    up.add_argument("--to", dest="target", default=None, help="stop after this version")
+    st = sub.add_parser("stamp", help="mark revisions as applied without running them")
+    st.add_argument("target")
+    args = parser.parse_args()
+
+    from database import engine
+    if args.command == "status":
+        done = applied(engine)
+        for version, description, _ in REVISIONS:
+            print(f"  [{'x' if version in done else ' '}] {version} {description}")
+    elif args.command == "upgrade":
+        ran = upgrade(engine, args.target)
+        print(f"Applied {len(ran)} revision(s)" if ran else "Already up to date")
+    else:
+        stamp(engine, args.target)
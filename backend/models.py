@@ -1,10 +1,134 @@
-from sqlalchemy import Boolean, Column, Integer, String
+from sqlalchemy import Boolean, Column, Date, DateTime, Float, ForeignKey, Index, Integer, String, Text, func
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
 from database import Base
 
+
+class utcnow(FunctionElement):
+    """Current time as naive UTC on every dialect; todo timestamps and day rollups are UTC."""
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(utcnow)
+def _utcnow(element, compiler, **kw):
+    # SQLite's CURRENT_TIMESTAMP is already UTC
+    return "CURRENT_TIMESTAMP"
+
+
+@compiles(utcnow, "postgresql")
+def _utcnow_postgresql(element, compiler, **kw):
+    # now() into timestamp without time zone would be in the session's TimeZone
+    return "(now() AT TIME ZONE 'UTC')"
+
+
+class User(Base):
+    __tablename__ = "users"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False, unique=True)
+    # sha256 of the API token; the token itself is never stored
+    token_hash = Column(String, nullable=True, unique=True)
+    # Max todos this user may hold; NULL falls back to TODO_QUOTA
+    todo_quota = Column(Integer, nullable=True)
+
 class Todo(Base):
     __tablename__ = "todos"
 
     id = Column(Integer, primary_key=True, index=True)
+    # NULL only on rows from before multi-user support; claimed at startup
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     title = Column(String, nullable=False)
     description = Column(String, nullable=True)
     completed = Column(Boolean, default=False)
+    # Owner's change-feed version of the last write that touched this row
+    version = Column(Integer, nullable=False, default=0, server_default="0")
+    # NULL on rows from before timestamps; completed_at is stamped by the
+    # stats triggers (see stats.py) whenever completed flips
+    created_at = Column(DateTime, nullable=True, default=utcnow())
+    completed_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Every query is scoped to one owner, so owner_id leads each index.
+        # Keyset pagination: one index per (filter, sort) shape of GET /todos/
+        Index("ix_todos_owner_completed_id", "owner_id", "completed", "id"),
+        Index("ix_todos_owner_title_id", "owner_id", "title", "id"),
+        Index("ix_todos_owner_completed_title_id", "owner_id", "completed", "title", "id"),
+        # Change feed
+        Index("ix_todos_owner_version", "owner_id", "version"),
+        # Without AUTOINCREMENT SQLite hands a deleted max id out again, to any
+        # owner; tombstones and the chat index are keyed on ids staying unique
+        {"sqlite_autoincrement": True},
+    )
+
+class TodoTombstone(Base):
+    __tablename__ = "todo_tombstones"
+
+    todo_id = Column(Integer, primary_key=True)
+    owner_id = Column(Integer, nullable=True)
+    version = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("ix_todo_tombstones_owner_version", "owner_id", "version"),
+    )
+
+class TodoCount(Base):
+    # Per-owner row counts, maintained by triggers (see todo_counts.py)
+    __tablename__ = "todo_counts"
+
+    owner_id = Column(Integer, primary_key=True, autoincrement=False)
+    total = Column(Integer, nullable=False, default=0)
+    completed = Column(Integer, nullable=False, default=0)
+
+class TodoDailyStat(Base):
+    # Per-owner, per-UTC-day created/completed counts, maintained by triggers (see stats.py)
+    __tablename__ = "todo_daily_stats"
+
+    owner_id = Column(Integer, primary_key=True, autoincrement=False)
+    day = Column(Date, primary_key=True)
+    created = Column(Integer, nullable=False, default=0)
+    completed = Column(Integer, nullable=False, default=0)
+
+class ChangeCounter(Base):
+    __tablename__ = "change_counters"
+
+    name = Column(String, primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+class ChatSession(Base):
+    __tablename__ = "chat_sessions"
+
+    id = Column(String, primary_key=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+    # Rolling summary of every message up to and including summarized_through
+    summary = Column(Text, nullable=True)
+    summarized_through = Column(Integer, nullable=False, default=0)
+
+class ChatMessage(Base):
+    __tablename__ = "chat_messages"
+
+    id = Column(Integer, primary_key=True)
+    session_id = Column(String, ForeignKey("chat_sessions.id", ondelete="CASCADE"), nullable=False)
+    role = Column(String, nullable=False)
+    content = Column(Text, nullable=False)
+    tokens = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        # History is always read as "this session, oldest unsummarized first"
+        Index("ix_chat_messages_session_id", "session_id", "id"),
+    )
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(String, primary_key=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+    kind = Column(String, nullable=False)
+    # queued -> running -> succeeded | failed
+    status = Column(String, nullable=False, default="queued", index=True)
+    payload = Column(Text, nullable=False)
+    result = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    progress = Column(Float, nullable=False, default=0.0)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    updated_at = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,74 @@
+# pagination.py
+import base64
+import json
+
+from sqlalchemy import and_, or_
+
+import models
+
+# =======================
+# KEYSET PAGINATION
+# =======================
+# Sort keys the list endpoint accepts; every ordering ends on id so the
+# cursor always points at exactly one row.
+ORDERINGS = {
+    "id": (None, False),
+    "-id": (None, True),
+    "title": ("title", False),
+    "-title": ("title", True),
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(order_by: str, row) -> str:
+    column, _ = ORDERINGS[order_by]
+    payload = {"o": order_by, "id": row.id}
+    if column:
+        payload["k"] = getattr(row, column)
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, order_by: str) -> dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        int(payload["id"])
+    except Exception:
+        raise InvalidCursor("Malformed cursor")
+    if payload.get("o") != order_by:
+        raise InvalidCursor("Cursor was issued for a different ordering")
+    column, _ = ORDERINGS[order_by]
+    if column and not isinstance(payload.get("k"), str):
+        raise InvalidCursor("Malformed cursor")
+    return payload
+
+
+def prefix_filter(column, prefix: str, dialect: str):
+    # A range instead of LIKE so an index is usable on every dialect. It is a
+    # prefix match only in code point order: SQLite's default BINARY collation,
+    # or "C" on Postgres, backed there by ix_todos_owner_title_c (see migrations)
+    if dialect == "postgresql":
+        column = column.collate("C")
+    return and_(column >= prefix, column < prefix + "\U0010ffff")
+
+
+def apply_keyset(query, order_by: str, cursor: str = None):
+    column_name, descending = ORDERINGS[order_by]
+    id_col = models.Todo.id
+    column = getattr(models.Todo, column_name) if column_name else None
+
+    if cursor:
+        after = decode_cursor(cursor, order_by)
+        if column is None:
+            query = query.filter(id_col < after["id"] if descending else id_col > after["id"])
+        elif descending:
+            query = query.filter(or_(column < after["k"], and_(column == after["k"], id_col < after["id"])))
+        else:
+            query = query.filter(or_(column > after["k"], and_(column == after["k"], id_col > after["id"])))
+
+    keys = ([column] if column is not None else []) + [id_col]
+    return query.order_by(*[k.desc() if descending else k.asc() for k in keys])
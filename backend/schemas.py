@@ -1,5 +1,7 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field, field_validator, model_validator
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Literal, Optional, List
+from typing_extensions import TypedDict
 
 class TodoBase(BaseModel):
     title: str
@@ -11,6 +13,8 @@ class TodoCreate(TodoBase):
 class Todo(TodoBase):
     id: int
     completed: bool
+    created_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -25,3 +29,138 @@ class TodoDelete(BaseModel):
 
 class ChatRequest(BaseModel):
     message: str
+    # From POST /chat/sessions; without it every message stands alone
+    session_id: Optional[str] = None
+
+class TodoBatchCreate(BaseModel):
+    items: List[TodoCreate]
+
+class TodoBatchUpdateItem(TodoUpdate):
+    id: int
+
+class TodoBatchUpdate(BaseModel):
+    items: List[TodoBatchUpdateItem]
+
+class TodoBatchComplete(BaseModel):
+    ids: List[int]
+    completed: bool = True
+
+class BatchItemResult(BaseModel):
+    id: Optional[int] = None
+    status: str
+    todo: Optional[Todo] = None
+
+class BatchResult(BaseModel):
+    results: List[BatchItemResult]
+
+# Plain-dict twins of Todo/BatchItemResult for the list and batch endpoints:
+# validated as one list by a TypeAdapter and encoded with orjson, without a
+# model instance per row. Keys are optional because of ?fields= projection.
+class TodoRow(TypedDict, total=False):
+    id: int
+    title: str
+    description: Optional[str]
+    completed: bool
+    created_at: Optional[datetime]
+    completed_at: Optional[datetime]
+
+class BatchItemRow(TypedDict):
+    id: Optional[int]
+    status: str
+    todo: Optional[TodoRow]
+
+class TodoImportRow(TodoBase):
+    # One record of an NDJSON/CSV import; any id in the file is ignored.
+    # Exported timestamps are kept, so a round trip doesn't redate history
+    completed: bool = False
+    created_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+
+    @field_validator("created_at", "completed_at")
+    @classmethod
+    def as_naive_utc(cls, value):
+        # The columns hold naive UTC, like CURRENT_TIMESTAMP
+        if value is not None and value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+    @model_validator(mode="after")
+    def completed_at_needs_completed(self):
+        if not self.completed:
+            self.completed_at = None
+        return self
+
+class TodoImport(BaseModel):
+    # Job payload: an upload saved by POST /todos/import
+    upload: str = Field(pattern=r"^[0-9a-f]{32}$")
+    format: Literal["ndjson", "csv"] = "ndjson"
+
+class TodoChanges(BaseModel):
+    version: int
+    changed: List[Todo]
+    deleted: List[int]
+    has_more: bool
+
+class SearchHit(BaseModel):
+    id: int
+    title: str
+    description: Optional[str] = None
+    completed: bool
+    rank: float
+    title_highlight: str
+    snippet: str
+
+class SearchResults(BaseModel):
+    query: str
+    hits: List[SearchHit]
+    next_offset: Optional[int] = None
+
+class TodoCounts(BaseModel):
+    total: int
+    completed: int
+    pending: int
+
+class DailyStat(BaseModel):
+    day: date
+    created: int
+    completed: int
+
+class Velocity(BaseModel):
+    window_days: int
+    last: int
+    previous: int
+    per_day: float
+    trend: Literal["up", "down", "flat"]
+
+class TodoStats(TodoCounts):
+    completion_rate: float
+    created_today: int
+    completed_today: int
+    velocity: Velocity
+    daily: List[DailyStat]
+
+class ChatTurn(BaseModel):
+    role: str
+    content: str
+
+    class Config:
+        from_attributes = True
+
+class ChatSessionDetail(BaseModel):
+    session_id: str
+    summary: Optional[str] = None
+    messages: List[ChatTurn]
+
+class JobSubmit(BaseModel):
+    kind: str
+    payload: Dict[str, Any] = {}
+
+class JobStatus(BaseModel):
+    id: str
+    kind: str
+    status: str
+    progress: float
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
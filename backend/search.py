@@ -0,0 +1,187 @@
+# search.py
+import html
+import re
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from database import create_index_online
+
+# =======================
+# SEARCH INDEX
+# =======================
+# SQLite: an external-content FTS5 table over todos(title, description),
+# kept in sync by triggers so every write path (ORM, bulk, raw SQL) updates
+# it incrementally. Postgres: a GIN expression index over the tsvector.
+SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS todos_fts USING fts5(
+        title, description, content='todos', content_rowid='id',
+        tokenize='porter unicode61'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS todos_fts_ai AFTER INSERT ON todos BEGIN
+        INSERT INTO todos_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS todos_fts_ad AFTER DELETE ON todos BEGIN
+        INSERT INTO todos_fts(todos_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS todos_fts_au AFTER UPDATE OF title, description ON todos BEGIN
+        INSERT INTO todos_fts(todos_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO todos_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END""",
+]
+
+TSVECTOR = "to_tsvector('english', coalesce(title, '') || ' ' || coalesce(description, ''))"
+POSTGRES_INDEX = ("ix_todos_search", "todos", f"USING GIN ({TSVECTOR})")
+
+# The database marks matches with private-use characters; the text around
+# them is HTML-escaped before they become <mark> tags, so a title can't
+# inject markup into title_highlight or snippet
+HIGHLIGHT_START = "\ue000"
+HIGHLIGHT_END = "\ue001"
+
+# Set by install_search_index() or detect_search_index(); False means the LIKE fallback is used
+fts_enabled = False
+
+
+def sqlite_has_fts5(conn) -> bool:
+    try:
+        conn.exec_driver_sql("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+    except OperationalError as e:
+        if "no such module" in str(e):
+            return False
+        raise
+    conn.exec_driver_sql("DROP TABLE temp.fts5_probe")
+    return True
+
+
+def install_search_index(engine):
+    """Create the search index; run by migrations.py, not at every startup.
+
+    Errors propagate, so a failed build leaves the revision pending. The one
+    expected gap, SQLite built without FTS5, leaves search on LIKE.
+    """
+    global fts_enabled
+    dialect = engine.dialect.name
+    if dialect == "sqlite":
+        with engine.begin() as conn:
+            if not sqlite_has_fts5(conn):
+                print("Full-text search unavailable (SQLite without FTS5), falling back to LIKE")
+                fts_enabled = False
+                return
+            created = conn.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE name = 'todos_fts'"
+            ).first() is None
+            for ddl in SQLITE_DDL:
+                conn.exec_driver_sql(ddl)
+            if created:
+                # Index rows that existed before the FTS table did
+                conn.exec_driver_sql("INSERT INTO todos_fts(todos_fts) VALUES ('rebuild')")
+    elif dialect == "postgresql":
+        # Built CONCURRENTLY, so a live table keeps taking writes
+        create_index_online(engine, *POSTGRES_INDEX)
+    else:
+        return
+    fts_enabled = True
+
+
+def detect_search_index(engine) -> bool:
+    """Enable full-text search if a migration installed the index."""
+    global fts_enabled
+    dialect = engine.dialect.name
+    with engine.connect() as conn:
+        if dialect == "sqlite":
+            found = conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'todos_fts'").first()
+        elif dialect == "postgresql":
+            # An index left invalid by an interrupted build is never used
+            found = conn.exec_driver_sql(
+                "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE c.relname = 'ix_todos_search' AND i.indisvalid"
+            ).first()
+        else:
+            found = None
+    fts_enabled = found is not None
+    return fts_enabled
+
+
+# =======================
+# QUERIES
+# =======================
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def fts5_query(q: str) -> str:
+    # Quote every term so user input can't hit FTS5 syntax, and prefix-match
+    # the last one for search-as-you-type
+    terms = _TOKEN.findall(q)
+    if not terms:
+        return ""
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def highlight_html(value: str) -> str:
+    return html.escape(value).replace(HIGHLIGHT_START, "<mark>").replace(HIGHLIGHT_END, "</mark>")
+
+
+def _hit(row) -> dict:
+    return {
+        "id": row.id,
+        "title": row.title,
+        "description": row.description,
+        "completed": bool(row.completed),
+        "rank": float(row.rank or 0.0),
+        "title_highlight": highlight_html(row.title_highlight or row.title),
+        "snippet": highlight_html(row.snippet or ""),
+    }
+
+
+def search_todos(db: Session, owner_id: int, q: str, limit: int, offset: int) -> list:
+    dialect = db.get_bind().dialect.name
+    params = {"owner_id": owner_id, "limit": limit, "offset": offset}
+
+    if fts_enabled and dialect == "sqlite":
+        params["match"] = fts5_query(q)
+        if not params["match"]:
+            return []
+        # bm25 is "lower is better"; weight title matches above description
+        sql = f"""
+            SELECT t.id, t.title, t.description, t.completed,
+                   -bm25(todos_fts, 10.0, 1.0) AS rank,
+                   highlight(todos_fts, 0, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}') AS title_highlight,
+                   snippet(todos_fts, 1, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '…', 12) AS snippet
+            FROM todos_fts JOIN todos t ON t.id = todos_fts.rowid
+            WHERE todos_fts MATCH :match AND t.owner_id = :owner_id
+            ORDER BY bm25(todos_fts, 10.0, 1.0), t.id
+            LIMIT :limit OFFSET :offset
+        """
+    elif fts_enabled and dialect == "postgresql":
+        params["q"] = q
+        options = f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxWords=20, MinWords=5"
+        sql = f"""
+            SELECT t.id, t.title, t.description, t.completed,
+                   ts_rank({TSVECTOR}, query) AS rank,
+                   ts_headline('english', t.title, query, '{options}, HighlightAll=true') AS title_highlight,
+                   ts_headline('english', coalesce(t.description, ''), query, '{options}') AS snippet
+            FROM todos t, websearch_to_tsquery('english', :q) AS query
+            WHERE {TSVECTOR} @@ query AND t.owner_id = :owner_id
+            ORDER BY rank DESC, t.id
+            LIMIT :limit OFFSET :offset
+        """
+    else:
+        params["pattern"] = f"%{q}%"
+        sql = """
+            SELECT id, title, description, completed, 0.0 AS rank,
+                   NULL AS title_highlight, NULL AS snippet
+            FROM todos
+            WHERE owner_id = :owner_id AND (title LIKE :pattern OR description LIKE :pattern)
+            ORDER BY id
+            LIMIT :limit OFFSET :offset
+        """
+
+    return [_hit(row) for row in db.execute(text(sql), params)]
@@ -0,0 +1,77 @@
+# serialization.py
+from typing import List, Optional
+
+import orjson
+from fastapi import Response
+from pydantic import TypeAdapter
+
+import models
+import pagination
+import schemas
+
+# =======================
+# FIELD PROJECTION
+# =======================
+TODO_FIELDS = ("id", "title", "description", "completed", "created_at", "completed_at")
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+def parse_fields(fields: Optional[str]) -> tuple:
+    """?fields=title,completed -> ("id", "title", "completed"); id is always included."""
+    if not fields:
+        return TODO_FIELDS
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(TODO_FIELDS)
+    if unknown:
+        raise InvalidFields(f"Unknown field(s) {sorted(unknown)}, choose from {', '.join(TODO_FIELDS)}")
+    requested.add("id")
+    return tuple(name for name in TODO_FIELDS if name in requested)
+
+
+def todo_columns(fields: tuple = TODO_FIELDS) -> list:
+    return [getattr(models.Todo, name) for name in fields]
+
+
+def list_columns(fields: tuple, order_by: str) -> list:
+    # The keyset cursor needs the sort column even when it isn't returned;
+    # it goes last so todo_list_response() can drop it
+    column, _ = pagination.ORDERINGS[order_by]
+    extra = [column] if column and column not in fields else []
+    return todo_columns(fields + tuple(extra))
+
+
+def todo_dict(row, fields: tuple = TODO_FIELDS) -> dict:
+    # Row tuples and ORM objects both expose columns as attributes
+    return {name: getattr(row, name) for name in fields}
+
+
+# =======================
+# RESPONSES
+# =======================
+# One TypeAdapter pass validates a whole list, then orjson encodes the dicts;
+# for thousands of rows this replaces a model instance plus a jsonable_encoder
+# walk per row.
+_todo_rows = TypeAdapter(List[schemas.TodoRow])
+_batch_rows = TypeAdapter(List[schemas.BatchItemRow])
+
+
+def json_response(content, headers: dict = None, status_code: int = 200) -> Response:
+    return Response(orjson.dumps(content), status_code=status_code, media_type="application/json", headers=headers)
+
+
+def todo_list_response(rows, fields: tuple, headers: dict = None) -> Response:
+    """rows are tuples whose leading columns are `fields`; extra trailing columns are dropped."""
+    items = _todo_rows.validate_python([dict(zip(fields, row)) for row in rows])
+    return json_response(items, headers)
+
+
+def batch_response(results: list, fields: tuple = TODO_FIELDS) -> Response:
+    """results are batch.* dicts: {"id", "status", "todo"}."""
+    if fields != TODO_FIELDS:
+        for result in results:
+            if result["todo"] is not None:
+                result["todo"] = {name: result["todo"][name] for name in fields}
+    return json_response({"results": _batch_rows.validate_python(results)})
@@ -0,0 +1,60 @@
+# serve.py
+import argparse
+import os
+import tempfile
+
+import uvicorn
+
+# =======================
+# CONFIG
+# =======================
+# Production entry point: `python serve.py --workers 4`. Each worker is a
+# separate uvicorn process with its own pools and job threads; state that
+# has to agree across them goes through shared_state.py, so with more than
+# one worker SHARED_STATE_URL must name a shared backend (a SQLite file in
+# the temp dir is used when it isn't set).
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_WORKERS = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+
+def shared_state_url(workers: int, port: int) -> str:
+    url = os.getenv("SHARED_STATE_URL")
+    if workers > 1 and (not url or url.startswith("memory://")):
+        if url:
+            raise SystemExit("SHARED_STATE_URL=memory:// can't be shared by several workers")
+        return f"sqlite:///{os.path.join(tempfile.gettempdir(), f'todo-shared-state-{port}.db')}"
+    return url or "memory://"
+
+
+def migrate():
+    # Once, before the workers start, so they don't race to apply revisions;
+    # each worker then finds nothing pending
+    import migrations
+    from database import get_engine
+
+    engine = get_engine()
+    if migrations.AUTO_MIGRATE:
+        migrations.upgrade(engine)
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the API with one or more worker processes")
+    parser.add_argument("--host", default=os.getenv("HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="worker processes (WEB_CONCURRENCY)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    # Workers inherit the environment, so they all open the same shared state
+    os.environ["SHARED_STATE_URL"] = shared_state_url(args.workers, args.port)
+    print(f"Starting {args.workers} worker(s), shared state: {os.environ['SHARED_STATE_URL']}")
+    migrate()
+    uvicorn.run(
+        "main:app",
+        app_dir=BACKEND_DIR,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level=args.log_level,
+    )
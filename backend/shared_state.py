@@ -0,0 +1,170 @@
+# shared_state.py
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+# =======================
+# CONFIG
+# =======================
+# Small keyed values that every worker must agree on: cached LLM replies and
+# LLM rate-limit windows. memory:// lives in one
+# process and suits a single worker; sqlite:///path is a file that all
+# workers on the host open, and serve.py points SHARED_STATE_URL at one when
+# it starts more than one worker. Per-owner change versions don't live here:
+# they are rows in the app database (see changes.py) and already shared.
+SHARED_STATE_URL = os.getenv("SHARED_STATE_URL", "memory://")
+
+# Both backends sweep expired keys on every Nth write; a key that is never
+# read again (an old rate-limit window) would otherwise stay forever
+PURGE_EVERY = 1000
+
+
+# =======================
+# BACKENDS
+# =======================
+# Both offer the same four calls; values are strings (callers JSON-encode)
+# and ttl is in seconds, None for no expiry.
+class MemoryState:
+    """Per-process dict; correct only with a single worker."""
+
+    shared = False
+
+    def __init__(self):
+        self._values = {}  # key -> (expires_at or None, value)
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _live(self, key: str):
+        entry = self._values.get(key)
+        if entry is not None and entry[0] is not None and entry[0] <= time.time():
+            del self._values[key]
+            return None
+        return entry
+
+    def _wrote(self):
+        # Called with the lock held
+        self._writes += 1
+        if self._writes % PURGE_EVERY == 0:
+            now = time.time()
+            for key in [k for k, (expires_at, _) in self._values.items() if expires_at is not None and expires_at <= now]:
+                del self._values[key]
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._live(key)
+            return entry[1] if entry else None
+
+    def set(self, key: str, value: str, ttl: float = None):
+        with self._lock:
+            self._values[key] = (time.time() + ttl if ttl else None, value)
+            self._wrote()
+
+    def incr(self, key: str, amount: int = 1, ttl: float = None) -> int:
+        """Add to an integer value; a missing or expired key starts at 0 with `ttl`."""
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                entry = (time.time() + ttl if ttl else None, "0")
+            value = int(entry[1]) + amount
+            self._values[key] = (entry[0], str(value))
+            self._wrote()
+            return value
+
+    def count(self, prefix: str) -> int:
+        with self._lock:
+            return sum(1 for key in list(self._values) if key.startswith(prefix) and self._live(key))
+
+
+class SQLiteState:
+    """A WAL-mode SQLite file shared by every worker process on one host.
+
+    Each call is one short statement on a per-thread connection; incr is a
+    single UPSERT .. RETURNING, so concurrent workers never lose an update.
+    """
+
+    shared = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS shared_state ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit; every call is a single statement
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _wrote(self, conn):
+        self._writes += 1
+        if self._writes % PURGE_EVERY == 0:
+            conn.execute("DELETE FROM shared_state WHERE expires_at <= ?", (time.time(),))
+
+    def get(self, key: str) -> Optional[str]:
+        row = self._conn().execute(
+            "SELECT value FROM shared_state WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time()),
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str, ttl: float = None):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO shared_state (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, time.time() + ttl if ttl else None),
+        )
+        self._wrote(conn)
+
+    def incr(self, key: str, amount: int = 1, ttl: float = None) -> int:
+        now = time.time()
+        conn = self._conn()
+        value = conn.execute(
+            """INSERT INTO shared_state (key, value, expires_at) VALUES (:key, :amount, :expires)
+            ON CONFLICT(key) DO UPDATE SET
+                value = CASE WHEN expires_at <= :now THEN :amount ELSE CAST(value AS INTEGER) + :amount END,
+                expires_at = CASE WHEN expires_at <= :now THEN :expires ELSE expires_at END
+            RETURNING value""",
+            {"key": key, "amount": amount, "now": now, "expires": now + ttl if ttl else None},
+        ).fetchone()[0]
+        self._wrote(conn)
+        return int(value)
+
+    def count(self, prefix: str) -> int:
+        # Range scan on the primary key instead of LIKE
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM shared_state WHERE key >= ? AND key < ? AND (expires_at IS NULL OR expires_at > ?)",
+            (prefix, prefix + "\U0010ffff", time.time()),
+        ).fetchone()[0]
+
+
+def state_from_url(url: str):
+    if url.startswith("memory://"):
+        return MemoryState()
+    if url.startswith("sqlite:///"):
+        return SQLiteState(url[len("sqlite:///"):])
+    raise ValueError(f"Unsupported SHARED_STATE_URL '{url}', expected memory:// or sqlite:///path")
+
+
+_state = None
+_state_lock = threading.Lock()
+
+
+def get_state():
+    """The process's shared-state backend, built from SHARED_STATE_URL on first use."""
+    global _state
+    if _state is None:
+        with _state_lock:
+            if _state is None:
+                _state = state_from_url(SHARED_STATE_URL)
+    return _state
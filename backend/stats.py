@@ -0,0 +1,227 @@
+# stats.py
+import os
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+import models
+import todo_counts
+
+# =======================
+# STATS TRIGGERS
+# =======================
+# todo_daily_stats holds, per owner and UTC day, how many todos were created
+# and completed. Like todo_counts it is kept current by triggers, which also
+# stamp todos.completed_at, so every write path feeds it in the same
+# transaction. Un-completing a todo takes it back off the day it was
+# completed; deleting one does not, so history survives "clear completed".
+# A row inserted as completed (an import) counts on its completed_at day,
+# which need not be the day it was created.
+SQLITE_DDL = [
+    "DROP TRIGGER IF EXISTS todo_stats_ai",
+    "DROP TRIGGER IF EXISTS todo_stats_au",
+    """CREATE TRIGGER todo_stats_ai AFTER INSERT ON todos
+    WHEN new.owner_id IS NOT NULL BEGIN
+        UPDATE todos SET completed_at = CURRENT_TIMESTAMP
+        WHERE id = new.id AND new.completed AND new.completed_at IS NULL;
+        INSERT INTO todo_daily_stats(owner_id, day, created, completed)
+        VALUES (new.owner_id, date(coalesce(new.created_at, 'now')), 1, 0)
+        ON CONFLICT(owner_id, day) DO UPDATE SET created = created + 1;
+        INSERT INTO todo_daily_stats(owner_id, day, created, completed)
+        SELECT new.owner_id, date(coalesce(new.completed_at, 'now')), 0, 1 WHERE new.completed
+        ON CONFLICT(owner_id, day) DO UPDATE SET completed = completed + 1;
+    END""",
+    """CREATE TRIGGER todo_stats_au AFTER UPDATE OF completed ON todos
+    WHEN new.owner_id IS NOT NULL AND coalesce(new.completed, 0) != coalesce(old.completed, 0) BEGIN
+        UPDATE todos SET completed_at = CASE WHEN new.completed THEN CURRENT_TIMESTAMP END
+        WHERE id = new.id;
+        INSERT INTO todo_daily_stats(owner_id, day, created, completed)
+        SELECT new.owner_id, date('now'), 0, 1 WHERE new.completed
+        ON CONFLICT(owner_id, day) DO UPDATE SET completed = completed + 1;
+        UPDATE todo_daily_stats SET completed = completed - 1
+        WHERE NOT coalesce(new.completed, 0) AND owner_id = old.owner_id AND day = date(old.completed_at);
+    END""",
+]
+
+# Row-level BEFORE trigger for the timestamp, so no second UPDATE of the row;
+# statement-level AFTER triggers for the rollup, one upsert per (owner, day).
+# The columns are timestamp without time zone holding UTC, as on SQLite;
+# CURRENT_TIMESTAMP would follow the session's TimeZone instead.
+_PG_UPSERT = """INSERT INTO todo_daily_stats(owner_id, day, created, completed)
+    {select}
+    ON CONFLICT (owner_id, day) DO UPDATE
+    SET created = todo_daily_stats.created + excluded.created,
+        completed = todo_daily_stats.completed + excluded.completed"""
+POSTGRES_DDL = [
+    """CREATE OR REPLACE FUNCTION todo_stamp_completed() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            IF NEW.completed AND NEW.completed_at IS NULL THEN
+                NEW.completed_at := (now() AT TIME ZONE 'UTC');
+            END IF;
+        ELSIF NEW.completed IS DISTINCT FROM OLD.completed THEN
+            NEW.completed_at := CASE WHEN NEW.completed THEN (now() AT TIME ZONE 'UTC') END;
+        END IF;
+        RETURN NEW;
+    END $$""",
+    f"""CREATE OR REPLACE FUNCTION todo_stats_apply() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            {_PG_UPSERT.format(select='''SELECT owner_id, day, sum(created), sum(completed) FROM (
+                SELECT owner_id, coalesce(created_at, (now() AT TIME ZONE 'UTC'))::date AS day, 1 AS created, 0 AS completed
+                FROM new_rows
+                UNION ALL
+                SELECT owner_id, completed_at::date, 0, 1 FROM new_rows WHERE completed
+            ) d WHERE owner_id IS NOT NULL GROUP BY 1, 2''')};
+        ELSE
+            {_PG_UPSERT.format(select='''SELECT owner_id, day, 0, sum(delta) FROM (
+                SELECT n.owner_id, n.completed_at::date AS day, 1 AS delta
+                FROM new_rows n JOIN old_rows o ON o.id = n.id
+                WHERE n.completed AND NOT coalesce(o.completed, false)
+                UNION ALL
+                SELECT o.owner_id, o.completed_at::date, -1
+                FROM new_rows n JOIN old_rows o ON o.id = n.id
+                WHERE o.completed AND NOT coalesce(n.completed, false) AND o.completed_at IS NOT NULL
+            ) d WHERE owner_id IS NOT NULL GROUP BY 1, 2''')};
+        END IF;
+        RETURN NULL;
+    END $$""",
+    "DROP TRIGGER IF EXISTS todo_stamp_completed ON todos",
+    "DROP TRIGGER IF EXISTS todo_stats_ai ON todos",
+    "DROP TRIGGER IF EXISTS todo_stats_au ON todos",
+    """CREATE TRIGGER todo_stamp_completed BEFORE INSERT OR UPDATE OF completed ON todos
+    FOR EACH ROW EXECUTE FUNCTION todo_stamp_completed()""",
+    """CREATE TRIGGER todo_stats_ai AFTER INSERT ON todos REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION todo_stats_apply()""",
+    """CREATE TRIGGER todo_stats_au AFTER UPDATE ON todos REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION todo_stats_apply()""",
+]
+
+# Rollups for rows written before the triggers, where they have timestamps
+REBUILD = """
+    INSERT INTO todo_daily_stats(owner_id, day, created, completed)
+    SELECT owner_id, day, sum(created), sum(completed) FROM (
+        SELECT owner_id, date(created_at) AS day, 1 AS created, 0 AS completed
+        FROM todos WHERE owner_id IS NOT NULL AND created_at IS NOT NULL
+        UNION ALL
+        SELECT owner_id, date(completed_at), 0, 1
+        FROM todos WHERE owner_id IS NOT NULL AND completed AND completed_at IS NOT NULL
+    ) d GROUP BY owner_id, day
+"""
+
+# Set by install_stats_triggers() or detect_stats_triggers(); False means rollups are computed per query
+triggers_enabled = False
+
+
+def _trigger_exists(conn, dialect: str):
+    if dialect == "sqlite":
+        return conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'todo_stats_ai'"
+        ).first() is not None
+    if dialect == "postgresql":
+        return conn.exec_driver_sql("SELECT 1 FROM pg_trigger WHERE tgname = 'todo_stats_ai'").first() is not None
+    return False
+
+
+def install_stats_triggers(engine):
+    """Create the stats triggers; run by migrations.py, not at every startup.
+
+    Errors propagate, so a failed install leaves the revision pending. Other
+    dialects have no triggers and compute rollups per query.
+    """
+    global triggers_enabled
+    dialect = engine.dialect.name
+    ddl = {"sqlite": SQLITE_DDL, "postgresql": POSTGRES_DDL}.get(dialect)
+    if ddl is None:
+        return
+    with engine.begin() as conn:
+        created = not _trigger_exists(conn, dialect)
+        for statement in ddl:
+            conn.exec_driver_sql(statement)
+        if created:
+            conn.exec_driver_sql("DELETE FROM todo_daily_stats")
+            conn.exec_driver_sql(REBUILD)
+    triggers_enabled = True
+
+
+def detect_stats_triggers(engine) -> bool:
+    """Read rollups from todo_daily_stats if a migration installed the triggers."""
+    global triggers_enabled
+    with engine.connect() as conn:
+        triggers_enabled = _trigger_exists(conn, engine.dialect.name)
+    return triggers_enabled
+
+
+# =======================
+# READS
+# =======================
+STATS_DAYS = int(os.getenv("STATS_DAYS", "30"))
+VELOCITY_WINDOW = 7  # days per velocity window
+
+
+def today() -> date:
+    # Days are UTC, like the stored timestamps (see models.utcnow)
+    return datetime.now(timezone.utc).date()
+
+
+def _as_date(value) -> date:
+    # SQLite hands back 'YYYY-MM-DD' text from date()
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def daily_rollup(db: Session, owner_id: int, since: date) -> dict:
+    """day -> (created, completed) for days on or after `since` with any activity."""
+    if triggers_enabled:
+        # Primary-key range scan over at most one row per day
+        rows = db.execute(
+            select(models.TodoDailyStat.day, models.TodoDailyStat.created, models.TodoDailyStat.completed)
+            .where(models.TodoDailyStat.owner_id == owner_id, models.TodoDailyStat.day >= since)
+        ).all()
+        return {_as_date(day): (created, completed) for day, created, completed in rows}
+    # Fallback: aggregate the timestamps of current rows
+    rollup = {}
+    for column, index in ((models.Todo.created_at, 0), (models.Todo.completed_at, 1)):
+        day = func.date(column)
+        for value, count in db.execute(
+            select(day, func.count())
+            .where(models.Todo.owner_id == owner_id, column >= since)
+            .group_by(day)
+        ):
+            counts = list(rollup.get(_as_date(value), (0, 0)))
+            counts[index] = count
+            rollup[_as_date(value)] = tuple(counts)
+    return rollup
+
+
+def get_stats(db: Session, owner_id: int, days: int = STATS_DAYS) -> dict:
+    """Counts, today's activity, completion velocity and a per-day series of `days` days."""
+    total, completed = todo_counts.get_counts(db, owner_id)
+    end = today()
+    # Velocity compares the last two windows even when fewer days are shown
+    window = max(days, 2 * VELOCITY_WINDOW)
+    rollup = daily_rollup(db, owner_id, end - timedelta(days=window - 1))
+    series = []
+    for offset in range(window - 1, -1, -1):
+        day = end - timedelta(days=offset)
+        created, done = rollup.get(day, (0, 0))
+        series.append({"day": day, "created": created, "completed": done})
+
+    last = sum(d["completed"] for d in series[-VELOCITY_WINDOW:])
+    previous = sum(d["completed"] for d in series[-2 * VELOCITY_WINDOW:-VELOCITY_WINDOW])
+    return {
+        "total": total,
+        "completed": completed,
+        "pending": total - completed,
+        "completion_rate": round(completed / total, 4) if total else 0.0,
+        "created_today": series[-1]["created"],
+        "completed_today": series[-1]["completed"],
+        "velocity": {
+            "window_days": VELOCITY_WINDOW,
+            "last": last,
+            "previous": previous,
+            "per_day": round(last / VELOCITY_WINDOW, 2),
+            "trend": "up" if last > previous else "down" if last < previous else "flat",
+        },
+        "daily": series[-days:],
+    }
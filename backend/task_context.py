@@ -0,0 +1,135 @@
+# task_context.py
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+import models
+import changes
+import embeddings
+import stats
+
+# =======================
+# VERSIONED SNAPSHOT CACHE
+# =======================
+# Each owner's rendered context is reused for as long as their change
+# version (changes.py) is still the one it was built at. The version is a
+# row in the app database, so a write in any worker makes that owner's
+# snapshots stale everywhere, and no other owner's.
+SNAPSHOT_CACHE_SIZE = 1024
+_lock = threading.Lock()
+_cache = OrderedDict()  # (owner_id, limit) -> (version, snapshot), LRU
+
+
+# =======================
+# CONTEXT BUILDER
+# =======================
+def _pending_filter():
+    return or_(models.Todo.completed == False, models.Todo.completed.is_(None))  # noqa: E712
+
+
+def _render_counts(summary: dict) -> str:
+    velocity = summary["velocity"]
+    todos_context = "\n\nUSER'S CURRENT TASKS:\n"
+    todos_context += f"- Total tasks: {summary['total']}\n"
+    todos_context += f"- Pending tasks: {summary['pending']}\n"
+    todos_context += f"- Completed tasks: {summary['completed']}\n"
+    todos_context += f"- Completed today: {summary['completed_today']}\n"
+    todos_context += (
+        f"- Completed in the last {velocity['window_days']} days: {velocity['last']} "
+        f"(previous {velocity['window_days']} days: {velocity['previous']})\n"
+    )
+    return todos_context
+
+
+def _render(summary: dict, pending_titles, completed_titles) -> str:
+    if not summary["total"]:
+        return "\n\nUSER HAS NO TASKS YET."
+
+    todos_context = _render_counts(summary)
+
+    if pending_titles:
+        todos_context += "\nPENDING TASKS:\n"
+        for i, title in enumerate(pending_titles, 1):
+            todos_context += f"  {i}. {title}\n"
+
+    if completed_titles:
+        todos_context += "\nCOMPLETED TASKS:\n"
+        for i, title in enumerate(completed_titles, 1):
+            todos_context += f"  {i}. {title}\n"
+
+    return todos_context
+
+
+def _render_relevant(hits) -> str:
+    todos_context = "\nTASKS MOST RELEVANT TO THE USER'S MESSAGE:\n"
+    for i, hit in enumerate(hits, 1):
+        status = "done" if hit["completed"] else "pending"
+        todos_context += f"  {i}. [{status}] {hit['title']}"
+        if hit["description"]:
+            todos_context += f" - {hit['description']}"
+        todos_context += "\n"
+    return todos_context
+
+
+def _snapshot(db: Session, owner_id: int, limit: int):
+    version = changes.current_version(db, owner_id)
+    with _lock:
+        cached = _cache.get((owner_id, limit))
+        if cached is not None and cached[0] == version:
+            _cache.move_to_end((owner_id, limit))
+            return cached[1]
+
+    # Counts and completion velocity are maintained incrementally per owner,
+    # no aggregate query; the same numbers as GET /todos/stats
+    summary = stats.get_stats(db, owner_id, days=1)
+    pending, completed = summary["pending"], summary["completed"]
+
+    pending_titles = []
+    completed_titles = []
+    if pending:
+        pending_titles = [
+            row.title
+            for row in db.query(models.Todo.title)
+            .filter(models.Todo.owner_id == owner_id, _pending_filter())
+            .order_by(models.Todo.id)
+            .limit(limit)
+        ]
+    if completed:
+        completed_titles = [
+            row.title
+            for row in db.query(models.Todo.title)
+            .filter(models.Todo.owner_id == owner_id, models.Todo.completed == True)  # noqa: E712
+            .order_by(models.Todo.id)
+            .limit(limit)
+        ]
+
+    todos_context = _render(summary, pending_titles, completed_titles)
+    counts_context = _render_counts(summary) if summary["total"] else todos_context
+
+    snapshot = (todos_context, counts_context)
+    with _lock:
+        # Only replace a snapshot built at an older version: a slower
+        # reader mustn't overwrite a newer one
+        cached = _cache.get((owner_id, limit))
+        if cached is None or cached[0] <= version:
+            _cache[(owner_id, limit)] = (version, snapshot)
+            _cache.move_to_end((owner_id, limit))
+            while len(_cache) > SNAPSHOT_CACHE_SIZE:
+                _cache.popitem(last=False)
+    return snapshot
+
+
+def build_todos_context(db: Session, owner_id: int, limit: int = 5) -> str:
+    """Return the owner's task summary injected into the chat system prompt."""
+    return _snapshot(db, owner_id, limit)[0]
+
+
+def build_chat_context(db: Session, owner_id: int, message: str) -> str:
+    """Counts plus the todos most similar to the message, falling back to the default listing."""
+    todos_context, counts_context = _snapshot(db, owner_id, 5)
+    hits = embeddings.relevant_todos(db, owner_id, message)
+    if not hits:
+        return todos_context
+    return counts_context + _render_relevant(hits)
@@ -0,0 +1,163 @@
+# todo_counts.py
+import os
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+import models
+
+# =======================
+# COUNT TRIGGERS
+# =======================
+# todo_counts holds (total, completed) per owner. Like the FTS index, it is
+# kept current by triggers so every write path (ORM, bulk, raw SQL) adjusts
+# it in the same transaction and nothing ever needs COUNT(*) over todos.
+SQLITE_DDL = [
+    """CREATE TRIGGER IF NOT EXISTS todo_counts_ai AFTER INSERT ON todos
+    WHEN new.owner_id IS NOT NULL BEGIN
+        INSERT OR IGNORE INTO todo_counts(owner_id, total, completed) VALUES (new.owner_id, 0, 0);
+        UPDATE todo_counts SET total = total + 1, completed = completed + coalesce(new.completed, 0)
+        WHERE owner_id = new.owner_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS todo_counts_ad AFTER DELETE ON todos
+    WHEN old.owner_id IS NOT NULL BEGIN
+        UPDATE todo_counts SET total = total - 1, completed = completed - coalesce(old.completed, 0)
+        WHERE owner_id = old.owner_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS todo_counts_au AFTER UPDATE OF completed, owner_id ON todos BEGIN
+        UPDATE todo_counts SET total = total - 1, completed = completed - coalesce(old.completed, 0)
+        WHERE owner_id = old.owner_id;
+        INSERT OR IGNORE INTO todo_counts(owner_id, total, completed)
+        SELECT new.owner_id, 0, 0 WHERE new.owner_id IS NOT NULL;
+        UPDATE todo_counts SET total = total + 1, completed = completed + coalesce(new.completed, 0)
+        WHERE owner_id = new.owner_id;
+    END""",
+]
+
+# Statement-level triggers with transition tables: a 10k-row bulk delete
+# adjusts each owner's counts once instead of 10k times
+_PG_DELTA = """SELECT owner_id, count(*) AS total, count(*) FILTER (WHERE completed) AS completed
+               FROM {rows} WHERE owner_id IS NOT NULL GROUP BY owner_id"""
+POSTGRES_DDL = [
+    f"""CREATE OR REPLACE FUNCTION todo_counts_apply() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP IN ('DELETE', 'UPDATE') THEN
+            UPDATE todo_counts c SET total = c.total - d.total, completed = c.completed - d.completed
+            FROM ({_PG_DELTA.format(rows="old_rows")}) d
+            WHERE c.owner_id = d.owner_id;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO todo_counts(owner_id, total, completed)
+            {_PG_DELTA.format(rows="new_rows")}
+            ON CONFLICT (owner_id) DO UPDATE
+            SET total = todo_counts.total + excluded.total,
+                completed = todo_counts.completed + excluded.completed;
+        END IF;
+        RETURN NULL;
+    END $$""",
+    "DROP TRIGGER IF EXISTS todo_counts_ai ON todos",
+    "DROP TRIGGER IF EXISTS todo_counts_ad ON todos",
+    "DROP TRIGGER IF EXISTS todo_counts_au ON todos",
+    """CREATE TRIGGER todo_counts_ai AFTER INSERT ON todos REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION todo_counts_apply()""",
+    """CREATE TRIGGER todo_counts_ad AFTER DELETE ON todos REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION todo_counts_apply()""",
+    """CREATE TRIGGER todo_counts_au AFTER UPDATE ON todos REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION todo_counts_apply()""",
+]
+
+REBUILD = """
+    INSERT INTO todo_counts(owner_id, total, completed)
+    SELECT owner_id, count(*), sum(CASE WHEN completed THEN 1 ELSE 0 END)
+    FROM todos WHERE owner_id IS NOT NULL GROUP BY owner_id
+"""
+
+# Set by install_count_triggers() or detect_count_triggers(); False means counts are computed per query
+triggers_enabled = False
+
+
+def install_count_triggers(engine):
+    """Create the count triggers; run by migrations.py, not at every startup.
+
+    Errors propagate, so a failed install leaves the revision pending. Other
+    dialects have no triggers and count per query.
+    """
+    global triggers_enabled
+    dialect = engine.dialect.name
+    with engine.begin() as conn:
+        if dialect == "sqlite":
+            created = conn.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'todo_counts_ai'"
+            ).first() is None
+            ddl = SQLITE_DDL
+        elif dialect == "postgresql":
+            created = conn.exec_driver_sql(
+                "SELECT 1 FROM pg_trigger WHERE tgname = 'todo_counts_ai'"
+            ).first() is None
+            ddl = POSTGRES_DDL
+        else:
+            return
+        for statement in ddl:
+            conn.exec_driver_sql(statement)
+        if created:
+            # Count rows that existed before the triggers did
+            conn.exec_driver_sql("DELETE FROM todo_counts")
+            conn.exec_driver_sql(REBUILD)
+    triggers_enabled = True
+
+
+def detect_count_triggers(engine) -> bool:
+    """Read counts from todo_counts if a migration installed the triggers."""
+    global triggers_enabled
+    dialect = engine.dialect.name
+    with engine.connect() as conn:
+        if dialect == "sqlite":
+            found = conn.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'todo_counts_ai'"
+            ).first()
+        elif dialect == "postgresql":
+            found = conn.exec_driver_sql("SELECT 1 FROM pg_trigger WHERE tgname = 'todo_counts_ai'").first()
+        else:
+            found = None
+    triggers_enabled = found is not None
+    return triggers_enabled
+
+
+# =======================
+# READS / QUOTA
+# =======================
+TODO_QUOTA = int(os.getenv("TODO_QUOTA", "0"))  # 0 = unlimited
+
+
+class QuotaExceeded(Exception):
+    pass
+
+
+def get_counts(db: Session, owner_id: int) -> tuple:
+    """(total, completed) for one owner: a primary-key lookup when triggers are on."""
+    if triggers_enabled:
+        row = db.get(models.TodoCount, owner_id, populate_existing=True)
+        return (row.total, row.completed) if row else (0, 0)
+    # Fallback: index-only count over (owner_id, completed, id)
+    counts = dict(
+        db.execute(
+            select(models.Todo.completed, func.count(models.Todo.id))
+            .where(models.Todo.owner_id == owner_id)
+            .group_by(models.Todo.completed)
+        ).all()
+    )
+    return sum(counts.values()), counts.get(True, 0)
+
+
+def check_quota(db: Session, owner_id: int, adding: int):
+    """Raise QuotaExceeded if adding rows would pass the owner's quota.
+
+    A soft limit: two concurrent creates can both pass the check.
+    """
+    user = db.get(models.User, owner_id)
+    quota = user.todo_quota if user is not None and user.todo_quota is not None else TODO_QUOTA
+    if not quota:
+        return
+    total, _ = get_counts(db, owner_id)
+    if total + adding > quota:
+        raise QuotaExceeded(f"Todo quota exceeded: {total} of {quota} used, tried to add {adding}")
@@ -0,0 +1,174 @@
+# todos_async.py
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request, Response
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional
+
+import models
+import schemas
+import accounts
+import pagination
+import changes
+import todo_counts
+import serialization
+from database import AsyncSessionLocal
+
+# =======================
+# ASYNC TODO CRUD ROUTES
+# =======================
+# Same contract as the sync routes in main.py, served as coroutines so
+# concurrency is bounded by the connection pool instead of the threadpool.
+router = APIRouter()
+# Set by routes() to main.current_owner, so both route sets share one auth path
+current_owner = None
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def owner(authorization: Optional[str] = Header(None)) -> int:
+    # The default user and token-cache hits need no I/O; only a miss (or a
+    # bad header, for current_owner's 401) goes to the threadpool
+    try:
+        owner_id = accounts.resolve_owner(authorization, cached_only=True)
+    except accounts.AuthError:
+        owner_id = None
+    if owner_id is not None:
+        return owner_id
+    return await run_in_threadpool(current_owner, authorization)
+
+
+async def _get_or_404(db: AsyncSession, owner_id: int, todo_id: int) -> models.Todo:
+    todo = await db.get(models.Todo, todo_id)
+    if not todo or todo.owner_id != owner_id:
+        raise HTTPException(status_code=404, detail="Todo not found")
+    return todo
+
+
+@router.post("/todos/", response_model=schemas.Todo)
+async def create_todo(todo: schemas.TodoCreate, db: AsyncSession = Depends(get_async_db), owner_id: int = Depends(owner)):
+    try:
+        await db.run_sync(todo_counts.check_quota, owner_id, 1)
+        version = await db.run_sync(changes.next_version, owner_id)
+        db_todo = models.Todo(
+            owner_id=owner_id, title=todo.title, description=todo.description, completed=False, version=version
+        )
+        db.add(db_todo)
+        await db.commit()
+        # created_at comes from the database; load it here, not lazily
+        await db.refresh(db_todo)
+        return schemas.Todo.model_validate(db_todo)
+    except todo_counts.QuotaExceeded as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/todos/", response_model=List[schemas.Todo])
+async def read_todos(
+    request: Request,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    completed: Optional[bool] = None,
+    title_prefix: Optional[str] = None,
+    order_by: Literal["id", "-id", "title", "-title"] = "id",
+    fields: Optional[str] = Query(None, description="comma-separated subset of id,title,description,completed,created_at,completed_at"),
+    db: AsyncSession = Depends(get_async_db),
+    owner_id: int = Depends(owner),
+):
+    try:
+        projection = serialization.parse_fields(fields)
+    except serialization.InvalidFields as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    version = await db.run_sync(changes.current_version, owner_id)
+    etag = changes.list_etag(owner_id, version, str(request.query_params))
+    headers = changes.version_headers(etag, version)
+    if changes.etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    stmt = select(*serialization.list_columns(projection, order_by)).where(models.Todo.owner_id == owner_id)
+    if completed is not None:
+        stmt = stmt.where(models.Todo.completed == completed)
+    if title_prefix:
+        stmt = stmt.where(pagination.prefix_filter(models.Todo.title, title_prefix, db.get_bind().dialect.name))
+    try:
+        stmt = pagination.apply_keyset(stmt, order_by, cursor)
+    except pagination.InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if skip and not cursor:
+        stmt = stmt.offset(skip)
+
+    todos = (await db.execute(stmt.limit(limit + 1))).all()
+    if len(todos) > limit:
+        todos = todos[:limit]
+        headers["X-Next-Cursor"] = pagination.encode_cursor(order_by, todos[-1])
+    return serialization.todo_list_response(todos, projection, headers)
+
+
+@router.get("/todos/{todo_id}", response_model=schemas.Todo)
+async def read_todo(todo_id: int, db: AsyncSession = Depends(get_async_db), owner_id: int = Depends(owner)):
+    return await _get_or_404(db, owner_id, todo_id)
+
+
+@router.put("/todos/{todo_id}", response_model=schemas.Todo)
+async def update_todo(
+    todo_id: int, todo: schemas.TodoUpdate, db: AsyncSession = Depends(get_async_db), owner_id: int = Depends(owner)
+):
+    db_todo = await _get_or_404(db, owner_id, todo_id)
+    if todo.title is not None:
+        db_todo.title = todo.title
+    if todo.description is not None:
+        db_todo.description = todo.description
+    if todo.completed is not None:
+        db_todo.completed = todo.completed
+    db_todo.version = await db.run_sync(changes.next_version, owner_id)
+    await db.commit()
+    # Picks up completed_at, stamped by a trigger
+    await db.refresh(db_todo)
+    return db_todo
+
+
+@router.delete("/todos/{todo_id}", response_model=schemas.Todo)
+async def delete_todo(todo_id: int, db: AsyncSession = Depends(get_async_db), owner_id: int = Depends(owner)):
+    db_todo = await _get_or_404(db, owner_id, todo_id)
+    await db.delete(db_todo)
+    version = await db.run_sync(changes.next_version, owner_id)
+    await db.run_sync(changes.record_deletes, owner_id, [db_todo.id], version)
+    await db.commit()
+    return db_todo
+
+
+@router.post("/todos/delete")
+async def bulk_delete(
+    todo_delete: schemas.TodoDelete, db: AsyncSession = Depends(get_async_db), owner_id: int = Depends(owner)
+):
+    num_deleted = await db.run_sync(changes.delete_ids, owner_id, todo_delete.ids)
+    await db.commit()
+    return {"message": f"{num_deleted} todos deleted successfully"}
+
+
+def routes(sync_router: APIRouter, resolve_owner) -> APIRouter:
+    """A router with sync_router's routes, the CRUD ones swapped for their async twins.
+
+    Built before the app includes it: an included router is resolved lazily,
+    so routes patched into the app afterwards would never match. Each twin
+    takes its sync route's place, so matching precedence stays as declared
+    in main.py.
+    """
+    global current_owner
+    current_owner = resolve_owner
+    replacements = {(route.path, frozenset(route.methods)): route for route in router.routes}
+    combined = APIRouter()
+    combined.routes.extend(
+        replacements.pop((route.path, frozenset(route.methods)), route)
+        if isinstance(route, APIRoute) else route
+        for route in sync_router.routes
+    )
+    combined.routes.extend(replacements.values())
+    return combined
@@ -0,0 +1,214 @@
+# transfer.py
+import asyncio
+import csv
+import io
+import os
+import tempfile
+import uuid
+
+import orjson
+from pydantic import ValidationError
+from sqlalchemy import bindparam, func, insert, select
+from sqlalchemy.orm import Session
+
+import models
+import schemas
+import changes
+import todo_counts
+import serialization
+from database import SessionLocal
+
+# =======================
+# CONFIG
+# =======================
+# Export streams rows off a server-side cursor and import reads the upload a
+# line at a time, so memory stays flat however many todos move either way.
+EXPORT_CHUNK = int(os.getenv("EXPORT_CHUNK", "1000"))
+IMPORT_BATCH = int(os.getenv("IMPORT_BATCH", "1000"))
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(1024 ** 3)))
+# Body chunks are gathered to this size, then written from a worker thread
+UPLOAD_WRITE_BYTES = 1024 ** 2
+# Uploads are spooled here until the import job has read them
+IMPORT_DIR = os.getenv("TODO_IMPORT_DIR", os.path.join(tempfile.gettempdir(), "todo-imports"))
+MAX_REPORTED_ERRORS = 20
+
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+CSV_FIELDS = serialization.TODO_FIELDS
+# Cells exported as "" for a NULL
+CSV_OPTIONAL = ("description", "created_at", "completed_at")
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+# =======================
+# EXPORT
+# =======================
+def _ndjson(rows) -> bytes:
+    return b"".join(orjson.dumps(serialization.todo_dict(row)) + b"\n" for row in rows)
+
+
+def _csv(rows, header: bool = False) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(CSV_FIELDS)
+    for row in rows:
+        writer.writerow([
+            row.id, row.title, row.description or "", "true" if row.completed else "false",
+            row.created_at.isoformat() if row.created_at else "",
+            row.completed_at.isoformat() if row.completed_at else "",
+        ])
+    return buffer.getvalue().encode()
+
+
+def export_chunks(owner_id: int, fmt: str, completed: bool = None):
+    """Yield the owner's todos, oldest first, as NDJSON or CSV byte chunks of EXPORT_CHUNK rows.
+
+    Runs in its own session: the request's session is gone by the time a
+    streaming response is being sent.
+    """
+    query = (
+        select(*serialization.todo_columns())
+        .where(models.Todo.owner_id == owner_id)
+        .order_by(models.Todo.id)
+        # Server-side cursor on Postgres; rows are fetched EXPORT_CHUNK at a time
+        .execution_options(stream_results=True, yield_per=EXPORT_CHUNK)
+    )
+    if completed is not None:
+        query = query.where(models.Todo.completed == completed)
+    if fmt == "csv":
+        yield _csv([], header=True)
+    with SessionLocal() as db:
+        for rows in db.execute(query).partitions():
+            yield _ndjson(rows) if fmt == "ndjson" else _csv(rows)
+
+
+# =======================
+# IMPORT
+# =======================
+def upload_path(owner_id: int, upload: str, fmt: str) -> str:
+    # The owner is part of the name, so an upload id is useless to anyone else
+    return os.path.join(IMPORT_DIR, f"{owner_id}-{upload}.{fmt}")
+
+
+async def save_upload(chunks, owner_id: int, fmt: str) -> str:
+    """Spool an async iterator of body chunks to disk; returns the upload id.
+
+    Raises UploadTooLarge past IMPORT_MAX_BYTES.
+    """
+    os.makedirs(IMPORT_DIR, exist_ok=True)
+    upload = uuid.uuid4().hex
+    path = upload_path(owner_id, upload, fmt)
+    size = 0
+    buffer = []
+    buffered = 0
+    try:
+        with open(path, "wb") as f:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > IMPORT_MAX_BYTES:
+                    raise UploadTooLarge(f"Upload exceeds {IMPORT_MAX_BYTES} bytes")
+                buffer.append(chunk)
+                buffered += len(chunk)
+                if buffered >= UPLOAD_WRITE_BYTES:
+                    # Disk writes block; keep them off the event loop
+                    await asyncio.to_thread(f.write, b"".join(buffer))
+                    buffer.clear()
+                    buffered = 0
+            if buffer:
+                await asyncio.to_thread(f.write, b"".join(buffer))
+    except BaseException:
+        os.remove(path)
+        raise
+    return upload
+
+
+def _records(f, fmt: str, progress: list):
+    """(line number, dict or error) per record; progress[0] tracks bytes read."""
+    def lines():
+        encoding = "utf-8-sig"  # Tolerate a BOM on the first line only
+        for raw in f:
+            progress[0] += len(raw)
+            yield raw.decode(encoding)
+            encoding = "utf-8"
+
+    if fmt == "ndjson":
+        for number, line in enumerate(lines(), 1):
+            if not line.strip():
+                continue
+            try:
+                yield number, orjson.loads(line)
+            except orjson.JSONDecodeError as e:
+                yield number, e
+        return
+    # csv.reader pulls extra lines itself for quoted fields with newlines
+    reader = csv.DictReader(lines())
+    for record in reader:
+        # Exported CSV writes a missing value as an empty cell
+        for name in CSV_OPTIONAL:
+            if record.get(name) == "":
+                record[name] = None
+        yield reader.line_num, record
+
+
+def _insert(db: Session, owner_id: int, rows: list):
+    todo_counts.check_quota(db, owner_id, len(rows))
+    version = changes.next_version(db, owner_id)
+    # executemany without RETURNING: the ids aren't needed back. Every row
+    # binds the same keys, so one without created_at falls back in SQL
+    stmt = insert(models.Todo).values(
+        created_at=func.coalesce(bindparam("imported_created_at"), models.Todo.__table__.c.created_at.default.arg)
+    )
+    params = [{**row, "owner_id": owner_id, "version": version} for row in rows]
+    for row in params:
+        row["imported_created_at"] = row.pop("created_at")
+    db.execute(stmt, params)
+    db.commit()
+
+
+def import_file(db: Session, owner_id: int, upload: str, fmt: str, report) -> dict:
+    """Insert the records of a saved upload in IMPORT_BATCH-row transactions.
+
+    Ids in the file are ignored; every record becomes a new todo. Invalid
+    records are skipped and the first few reported. A quota error stops the
+    import with the earlier batches kept. The upload is removed afterwards.
+    """
+    path = upload_path(owner_id, upload, fmt)
+    try:
+        total = os.path.getsize(path)
+    except FileNotFoundError:
+        raise FileNotFoundError("Upload not found; it may already have been imported") from None
+    progress = [0]
+    imported = skipped = 0
+    errors = []
+    pending = []
+
+    def flush():
+        nonlocal imported
+        _insert(db, owner_id, pending)
+        imported += len(pending)
+        pending.clear()
+        report(progress[0], total)
+
+    try:
+        with open(path, "rb") as f:
+            for number, record in _records(f, fmt, progress):
+                try:
+                    if isinstance(record, Exception):
+                        raise record
+                    pending.append(schemas.TodoImportRow.model_validate(record).model_dump())
+                except (ValueError, TypeError) as e:
+                    skipped += 1
+                    if len(errors) < MAX_REPORTED_ERRORS:
+                        message = e.errors(include_url=False)[0]["msg"] if isinstance(e, ValidationError) else str(e)
+                        errors.append({"line": number, "error": message})
+                    continue
+                if len(pending) >= IMPORT_BATCH:
+                    flush()
+        if pending:
+            flush()
+    finally:
+        os.remove(path)
+    return {"imported": imported, "skipped": skipped, "errors": errors}
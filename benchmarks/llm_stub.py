@@ -0,0 +1,190 @@
+"""
+OpenAI-compatible chat completions stub with configurable latency and token rate.
+
+Tool calling: when the request offers tools and the last user message is
+"/tool <name> <json arguments>", the stub answers with that tool call; once
+the tool results come back it replies with a short summary of them.
+
+Run standalone:
+    python benchmarks/llm_stub.py --port 9100 --latency 0.2 --token-rate 200
+then point the backend at it with LLM_BASE_URL=http://127.0.0.1:9100/v1
+
+--failure-rate makes that share of calls fail with 429 + Retry-After, to
+exercise the backend's retries and circuit breaker.
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+def create_stub_app(
+    latency: float = 0.2,
+    token_rate: float = 200.0,
+    reply_tokens: int = 60,
+    failure_rate: float = 0.0,
+    retry_after: float = 1.0,
+) -> FastAPI:
+    """latency: seconds before the first token; token_rate: tokens per second after it."""
+    app = FastAPI(title="LLM stub")
+    app.state.calls = 0
+    app.state.failure_rate = failure_rate
+
+    def completion_id():
+        return f"chatcmpl-{uuid.uuid4().hex[:12]}"
+
+    def reply_words(max_tokens: int):
+        count = min(reply_tokens, max_tokens or reply_tokens)
+        return [f"tok{i} " for i in range(count)]
+
+    tool_command = re.compile(r"^/tool\s+(\w+)\s*(.*)$", re.DOTALL)
+
+    def scripted_tool_turn(body):
+        messages = body.get("messages", [])
+        if not body.get("tools") or not messages:
+            return None
+        last = messages[-1]
+        if last.get("role") == "tool":
+            results = [m["content"] for m in messages if m.get("role") == "tool"]
+            return {"role": "assistant", "content": "Done. Tool results: " + " | ".join(results)}
+        match = tool_command.match(str(last.get("content", "")).strip())
+        if last.get("role") != "user" or not match:
+            return None
+        return {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [{
+                "id": f"call_{uuid.uuid4().hex[:8]}",
+                "type": "function",
+                "function": {"name": match.group(1), "arguments": match.group(2) or "{}"},
+            }],
+        }
+
+    @app.get("/v1/models")
+    def models():
+        return {"object": "list", "data": [{"id": "stub", "object": "model"}]}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.calls += 1
+        if random.random() < app.state.failure_rate:
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded", "code": "rate_limit_exceeded"}},
+                status_code=429,
+                headers={"retry-after": str(retry_after)},
+            )
+        words = reply_words(body.get("max_tokens"))
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in body.get("messages", []))
+        model = body.get("model", "stub")
+        created = int(time.time())
+        cid = completion_id()
+
+        scripted = scripted_tool_turn(body)
+        if scripted is not None and not body.get("stream"):
+            await asyncio.sleep(latency)
+            return {
+                "id": cid,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": scripted,
+                    "finish_reason": "tool_calls" if scripted.get("tool_calls") else "stop",
+                }],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 10, "total_tokens": prompt_tokens + 10},
+            }
+
+        if not body.get("stream"):
+            await asyncio.sleep(latency + len(words) / token_rate)
+            return {
+                "id": cid,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(words)},
+                    "finish_reason": "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": len(words),
+                    "total_tokens": prompt_tokens + len(words),
+                },
+            }
+
+        async def events():
+            await asyncio.sleep(latency)
+            for word in words:
+                chunk = {
+                    "id": cid,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(1 / token_rate)
+            final = {
+                "id": cid,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+class BackgroundServer:
+    """Runs a uvicorn server on a daemon thread; used for the stub and in-process runs."""
+
+    def __init__(self, app, host: str = "127.0.0.1", port: int = 9100):
+        self.server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+        self.url = f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        deadline = time.time() + 10
+        while not self.server.started:
+            if time.time() > deadline:
+                raise RuntimeError(f"Server at {self.url} did not start")
+            time.sleep(0.05)
+        return self
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds to first token")
+    parser.add_argument("--token-rate", type=float, default=200.0, help="tokens per second")
+    parser.add_argument("--reply-tokens", type=int, default=60)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of calls answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with a 429")
+    args = parser.parse_args()
+    uvicorn.run(
+        create_stub_app(args.latency, args.token_rate, args.reply_tokens, args.failure_rate, args.retry_after),
+        host=args.host,
+        port=args.port,
+        log_level="warning",
+    )
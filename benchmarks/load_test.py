@@ -0,0 +1,299 @@
+"""
+Reproducible load test for the backend, with the LLM replaced by a local stub.
+
+Examples:
+    python benchmarks/load_test.py --requests 2000 --concurrency 32
+    python benchmarks/load_test.py --mode uvicorn --workers 2 --mix read_todos=6,chat=4
+    python benchmarks/load_test.py --output after.json --baseline before.json
+
+Starts the OpenAI-compatible stub from llm_stub.py, starts the backend (in this
+process or as `backend/serve.py --workers N`) against a throwaway SQLite
+database, seeds it, drives a weighted mix of CRUD and chat requests and prints
+a JSON report with p50/p95/p99 latency, throughput and error rate per endpoint.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from llm_stub import BackgroundServer, create_stub_app
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(ROOT, "backend")
+
+DEFAULT_MIX = "read_todos=40,read_todo=10,create_todo=15,update_todo=15,bulk_delete=5,chat=15"
+CHAT_MESSAGES = [
+    "What's pending?",
+    "Plan my day",
+    "Which tasks did I finish?",
+    "Give me a productivity tip",
+    "What should I do first?",
+]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in OPERATIONS:
+            raise SystemExit(f"Unknown operation '{name}'. Choose from: {', '.join(OPERATIONS)}")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+def percentile(sorted_values, pct: float) -> float:
+    # Nearest-rank percentile
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+# =======================
+# WORKLOAD
+# =======================
+class Workload:
+    def __init__(self, client: httpx.AsyncClient, rng: random.Random):
+        self.client = client
+        self.rng = rng
+        # Reads/updates target seeded rows, bulk deletes only rows created
+        # during the run, so 404s mean a real failure rather than a race
+        self.ids = []
+        self.created = []
+
+    def pick_id(self):
+        return self.rng.choice(self.ids) if self.ids else 1
+
+    async def seed(self, count: int):
+        for start in range(0, count, 500):
+            items = [{"title": f"Seed task {i}", "description": "seeded"} for i in range(start, min(count, start + 500))]
+            res = await self.client.post("/todos/batch/create", json={"items": items})
+            res.raise_for_status()
+            self.ids.extend(r["id"] for r in res.json()["results"])
+
+    async def read_todos(self):
+        return await self.client.get("/todos/", params={"limit": 50})
+
+    async def read_todo(self):
+        return await self.client.get(f"/todos/{self.pick_id()}")
+
+    async def create_todo(self):
+        res = await self.client.post("/todos/", json={"title": f"Load task {self.rng.randrange(10**6)}"})
+        if res.status_code == 200:
+            self.created.append(res.json()["id"])
+        return res
+
+    async def update_todo(self):
+        return await self.client.put(f"/todos/{self.pick_id()}", json={"completed": self.rng.random() < 0.5})
+
+    async def bulk_delete(self):
+        batch = [self.created.pop(self.rng.randrange(len(self.created))) for _ in range(min(10, len(self.created)))]
+        return await self.client.post("/todos/delete", json={"ids": batch})
+
+    async def chat(self):
+        return await self.client.post("/chat", json={"message": self.rng.choice(CHAT_MESSAGES)})
+
+
+OPERATIONS = ["read_todos", "read_todo", "create_todo", "update_todo", "bulk_delete", "chat"]
+
+
+async def drive(base_url: str, args) -> dict:
+    rng = random.Random(args.seed)
+    weights = parse_mix(args.mix)
+    names = list(weights)
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    statuses = {name: {} for name in names}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        workload = Workload(client, rng)
+        await workload.seed(args.seed_todos)
+        plan = rng.choices(names, weights=[weights[n] for n in names], k=args.requests)
+        queue = iter(plan)
+
+        async def worker():
+            for name in queue:
+                started = time.perf_counter()
+                try:
+                    res = await getattr(workload, name)()
+                    status = str(res.status_code)
+                    ok = res.status_code < 400
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                    ok = False
+                statuses[name][status] = statuses[name].get(status, 0) + 1
+                samples[name].append(time.perf_counter() - started)
+                if not ok:
+                    errors[name] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    def summarize(latencies, error_count, status_counts=None):
+        ordered = sorted(latencies)
+        count = len(ordered)
+        summary = {
+            "count": count,
+            "errors": error_count,
+            "error_rate": round(error_count / count, 4) if count else 0.0,
+            "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+            "mean_ms": round(sum(ordered) / count * 1000, 2) if count else 0.0,
+            "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+            "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+            "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+            "max_ms": round(ordered[-1] * 1000, 2) if count else 0.0,
+        }
+        if status_counts is not None:
+            summary["status_codes"] = status_counts
+        return summary
+
+    all_latencies = [v for values in samples.values() for v in values]
+    return {
+        "duration_s": round(elapsed, 3),
+        "total": summarize(all_latencies, sum(errors.values())),
+        "endpoints": {
+            name: summarize(samples[name], errors[name], statuses[name])
+            for name in names if samples[name]
+        },
+    }
+
+
+# =======================
+# SERVERS
+# =======================
+def backend_env(args, stub_url: str, db_path: str) -> dict:
+    env = {
+        "GROQ_API_KEY": "stub-key",
+        "LLM_BASE_URL": f"{stub_url}/v1",
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "LLM_CACHE_ENABLED": "true" if args.llm_cache else "false",
+        "DB_MODE": args.db_mode,
+        # A fresh shared cache/rate-limit file per run (serve.py, uvicorn mode)
+        "SHARED_STATE_URL": f"sqlite:///{db_path}.state" if args.mode == "uvicorn" and args.workers > 1 else "memory://",
+    }
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    return env
+
+
+def start_backend(args, env: dict):
+    port = free_port()
+    if args.mode == "inprocess":
+        os.environ.update(env)
+        sys.path.insert(0, BACKEND_DIR)
+        # Keep the backend's startup prints out of the JSON report on stdout
+        with contextlib.redirect_stdout(sys.stderr):
+            import main
+            server = BackgroundServer(main.app, port=port).start()
+        return server, f"http://127.0.0.1:{port}"
+
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(BACKEND_DIR, "serve.py"),
+         "--port", str(port), "--workers", str(args.workers), "--log-level", "warning"],
+        env={**os.environ, **env},
+        stdout=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{base_url}/test", timeout=1).status_code == 200:
+                return proc, base_url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("uvicorn backend did not become ready")
+
+
+def stop_backend(server):
+    if isinstance(server, subprocess.Popen):
+        server.terminate()
+        server.wait(timeout=10)
+    else:
+        server.stop()
+
+
+def compare(report: dict, baseline_path: str, max_regression: float) -> list:
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = []
+    for name, stats in report["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(name)
+        if before and before["p95_ms"] and stats["p95_ms"] > before["p95_ms"] * (1 + max_regression):
+            regressions.append(f"{name}: p95 {before['p95_ms']}ms -> {stats['p95_ms']}ms")
+        if before and stats["error_rate"] > before["error_rate"] + 0.01:
+            regressions.append(f"{name}: error rate {before['error_rate']} -> {stats['error_rate']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers (uvicorn mode)")
+    parser.add_argument("--db-mode", choices=["sync", "async"], default="sync")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="comma-separated op=weight list")
+    parser.add_argument("--seed", type=int, default=1234, help="RNG seed for the request plan")
+    parser.add_argument("--seed-todos", type=int, default=1000, help="todos created before the run")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--stub-latency", type=float, default=0.2, help="LLM seconds to first token")
+    parser.add_argument("--stub-token-rate", type=float, default=200.0, help="LLM tokens per second")
+    parser.add_argument("--stub-reply-tokens", type=int, default=60)
+    parser.add_argument("--stub-failure-rate", type=float, default=0.0, help="share of LLM calls answered with 429")
+    parser.add_argument("--llm-cache", action="store_true", help="leave the chat reply cache enabled")
+    parser.add_argument("--env", action="append", default=[], help="extra KEY=VALUE for the backend")
+    parser.add_argument("--output", help="also write the JSON report here")
+    parser.add_argument("--baseline", help="previous report; exit 1 on regressions")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed p95 slowdown vs baseline")
+    args = parser.parse_args()
+
+    stub = BackgroundServer(
+        create_stub_app(args.stub_latency, args.stub_token_rate, args.stub_reply_tokens, args.stub_failure_rate),
+        port=free_port(),
+    ).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        server, base_url = start_backend(args, backend_env(args, stub.url, os.path.join(tmp, "bench.db")))
+        try:
+            report = asyncio.run(drive(base_url, args))
+        finally:
+            stop_backend(server)
+            stub.stop()
+
+    report["config"] = {
+        key: value for key, value in vars(args).items() if key not in ("output", "baseline")
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+    if args.baseline:
+        regressions = compare(report, args.baseline, args.max_regression)
+        if regressions:
+            print("Regressions vs baseline:\n  " + "\n  ".join(regressions), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Worker scaling benchmark: the same load test against `backend/serve.py` with
+an increasing number of worker processes.
+
+Examples:
+    python benchmarks/scaling.py --workers 1,2,4 --requests 2000 --concurrency 64
+    python benchmarks/scaling.py --workers 1,4 --min-speedup 2.5 --output scaling.json
+    python benchmarks/scaling.py --mix read_todos=6,chat=4 -- --llm-cache
+
+Each worker count is a separate load_test.py run in uvicorn mode, with its own
+database, LLM stub and shared-state file. The report lists total throughput,
+p50/p95 latency and error rate per worker count, and the speedup over the
+first (smallest) count. Throughput can't scale past the host's CPU count,
+which is reported alongside.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_load_test(workers: int, args, extra: list) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, "report.json")
+        subprocess.run(
+            [sys.executable, os.path.join(BENCH_DIR, "load_test.py"), "--mode", "uvicorn",
+             "--workers", str(workers), "--requests", str(args.requests),
+             "--concurrency", str(args.concurrency), "--mix", args.mix, "--output", output, *extra],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        with open(output) as f:
+            return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--mix", default="read_todos=50,read_todo=20,create_todo=15,update_todo=15")
+    parser.add_argument("--output", help="also write the JSON report here")
+    parser.add_argument("--min-speedup", type=float, help="exit 1 if the largest count is slower than this")
+    # Anything after `--` goes to load_test.py as is
+    argv = sys.argv[1:]
+    extra = argv[argv.index("--") + 1:] if "--" in argv else []
+    args = parser.parse_args(argv[:argv.index("--")] if "--" in argv else argv)
+
+    counts = sorted({int(n) for n in args.workers.split(",")})
+    runs = []
+    for workers in counts:
+        print(f"{workers} worker(s)...", file=sys.stderr)
+        total = run_load_test(workers, args, extra)["total"]
+        runs.append({
+            "workers": workers,
+            "throughput_rps": total["throughput_rps"],
+            "p50_ms": total["p50_ms"],
+            "p95_ms": total["p95_ms"],
+            "error_rate": total["error_rate"],
+        })
+    base = runs[0]["throughput_rps"]
+    for run in runs:
+        run["speedup"] = round(run["throughput_rps"] / base, 2) if base else 0.0
+
+    report = {
+        "cpu_count": os.cpu_count(),
+        "config": {"requests": args.requests, "concurrency": args.concurrency, "mix": args.mix, "extra": extra},
+        "runs": runs,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+    if args.min_speedup is not None and runs[-1]["speedup"] < args.min_speedup:
+        print(
+            f"Speedup with {runs[-1]['workers']} workers is {runs[-1]['speedup']}x, "
+            f"below {args.min_speedup}x",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Cold-start benchmark: how long a fresh worker process takes to import the
+backend and to finish its startup (lifespan), measured in new interpreters.
+
+Examples:
+    python benchmarks/startup_time.py --runs 5
+    python benchmarks/startup_time.py --max-import 0.8 --output startup.json
+    python benchmarks/startup_time.py --env GROQ_API_KEY= --top 15
+
+Every run uses a throwaway SQLite database that has already been migrated,
+so startup measures what a worker pays on an up-to-date schema. The report
+lists median/max import and startup seconds, plus the slowest modules from
+`python -X importtime` for the first run.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(ROOT, "backend")
+
+# Runs in the child interpreter; prints one JSON line
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app):
+    ready = time.perf_counter()
+print(json.dumps({
+    "import_s": imported - started,
+    "startup_s": ready - imported,
+    "openai_loaded": "openai" in sys.modules,
+}))
+"""
+
+
+def run_probe(env: dict, importtime: bool = False):
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", PROBE]
+    proc = subprocess.run(cmd, cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=120)
+    if proc.returncode != 0:
+        raise SystemExit(f"Backend failed to start:\n{proc.stderr[-2000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    return result, proc.stderr
+
+
+def slowest_modules(importtime_log: str, top: int) -> list:
+    # "import time: self [us] | cumulative | imported package"
+    rows = []
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.strip()))
+    rows.sort(reverse=True)
+    return [{"module": name, "cumulative_ms": round(us / 1000, 1)} for us, name in rows[:top]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    parser.add_argument("--env", action="append", default=[], help="extra KEY=VALUE for the backend")
+    parser.add_argument("--max-import", type=float, help="exit 1 if median import seconds exceed this")
+    parser.add_argument("--max-startup", type=float, help="exit 1 if median startup seconds exceed this")
+    parser.add_argument("--output", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            **os.environ,
+            "GROQ_API_KEY": "benchmark",
+            "DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'startup.db')}",
+        }
+        for item in args.env:
+            key, _, value = item.partition("=")
+            env[key] = value
+
+        # Migrate once, untimed, so every measured run sees an up-to-date schema
+        run_probe(env)
+        first, log = run_probe(env, importtime=True)
+        runs = [first] + [run_probe(env)[0] for _ in range(args.runs - 1)]
+
+    imports = [r["import_s"] for r in runs]
+    startups = [r["startup_s"] for r in runs]
+    report = {
+        "runs": len(runs),
+        "import_s": {"median": round(statistics.median(imports), 4), "max": round(max(imports), 4)},
+        "startup_s": {"median": round(statistics.median(startups), 4), "max": round(max(startups), 4)},
+        "openai_loaded_at_startup": any(r["openai_loaded"] for r in runs),
+        "slowest_imports": slowest_modules(log, args.top),
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+    failures = []
+    if args.max_import is not None and report["import_s"]["median"] > args.max_import:
+        failures.append(f"import {report['import_s']['median']}s > {args.max_import}s")
+    if args.max_startup is not None and report["startup_s"]["median"] > args.max_startup:
+        failures.append(f"startup {report['startup_s']['median']}s > {args.max_startup}s")
+    if failures:
+        print("Startup budget exceeded:\n  " + "\n  ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+# api_client.py
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# =======================
+# CONFIG
+# =======================
+API_URL = os.getenv("TODO_API_URL", "http://127.0.0.1:8000")
+# Token from `python backend/accounts.py add-user NAME`; unset = the default user
+API_TOKEN = os.getenv("TODO_API_TOKEN")
+TIMEOUT = 5
+CHAT_TIMEOUT = 30  # Increased timeout for AI processing
+POOL_SIZE = 8
+# Revalidatable GET responses kept per client, least recently used dropped first
+CACHE_SIZE = 256
+PAGE_SIZE = 200
+WRITE_BATCH_SIZE = 500
+# Edits made within this window go out as one batch request
+WRITE_FLUSH_DELAY = float(os.getenv("TODO_WRITE_FLUSH_DELAY", "0.3"))
+# A write queue's sender thread exits after this long with nothing to send
+WRITE_IDLE_EXIT = 60.0
+
+
+class APIError(Exception):
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+# =======================
+# CLIENT
+# =======================
+class TodoAPI:
+    """All backend calls from the frontend, over one keep-alive connection pool.
+
+    GETs are cached with the backend's ETag and revalidated with If-None-Match,
+    so an unchanged list costs a 304 with no body; any write through the client
+    drops the cache.
+    """
+
+    def __init__(self, base_url: str = API_URL, token: Optional[str] = API_TOKEN):
+        self.base_url = base_url
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if token:
+            self.session.headers["Authorization"] = f"Bearer {token}"
+        # (endpoint, params) -> (etag, body, headers), LRU
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.last_server_timing = None
+
+    def invalidate(self):
+        with self._cache_lock:
+            self._cache.clear()
+
+    def request(self, method: str, endpoint: str, payload=None, params=None) -> Tuple[object, Dict]:
+        """(body, headers); raises APIError."""
+        key = (endpoint, tuple(sorted((params or {}).items())))
+        headers = {}
+        cached = None
+        if method == "GET":
+            with self._cache_lock:
+                cached = self._cache.get(key)
+                if cached:
+                    self._cache.move_to_end(key)
+            if cached:
+                headers["If-None-Match"] = cached[0]
+        try:
+            response = self.session.request(
+                method, f"{self.base_url}{endpoint}", json=payload, params=params,
+                headers=headers, timeout=TIMEOUT,
+            )
+        except requests.exceptions.ConnectionError:
+            raise APIError("❌ Backend is not running. Start FastAPI backend first!")
+        except requests.exceptions.Timeout:
+            raise APIError("⏱ Backend took too long to respond!")
+        # Backend reports its db/llm/app split in the Server-Timing header
+        self.last_server_timing = (f"{method} {endpoint}", response.headers.get("Server-Timing"))
+
+        if response.status_code == 304 and cached:
+            return cached[1], cached[2]
+        if response.status_code >= 400:
+            raise APIError(f"API Error {response.status_code}: {response.text}", response.status_code)
+        body = response.json() if response.content else True
+        if method != "GET":
+            self.invalidate()
+        elif response.headers.get("ETag"):
+            with self._cache_lock:
+                self._cache[key] = (response.headers["ETag"], body, response.headers)
+                self._cache.move_to_end(key)
+                while len(self._cache) > CACHE_SIZE:
+                    self._cache.popitem(last=False)
+        return body, response.headers
+
+    def call(self, method: str, endpoint: str, payload=None, params=None):
+        return self.request(method, endpoint, payload, params)[0]
+
+    # ---- todos ----
+    def todos_page(self, completed: Optional[bool] = None, cursor: Optional[str] = None,
+                   limit: int = PAGE_SIZE, order_by: str = "id") -> Tuple[List[Dict], Optional[str], int]:
+        # One page; pass the returned cursor back in for the next page. Also
+        # returns the backend's change version the page was read at.
+        params = {"limit": limit, "order_by": order_by}
+        if completed is not None:
+            params["completed"] = str(completed).lower()
+        if cursor:
+            params["cursor"] = cursor
+        items, headers = self.request("GET", "/todos/", params=params)
+        return items, headers.get("X-Next-Cursor"), int(headers.get("X-Change-Version", 0))
+
+    def all_todos(self) -> Tuple[List[Dict], int]:
+        todos, cursor, version = self.todos_page()
+        while cursor:
+            page, cursor, _ = self.todos_page(cursor=cursor)
+            todos.extend(page)
+        return todos, version
+
+    def all_ids(self) -> List[int]:
+        ids, cursor = [], None
+        while True:
+            params = {"limit": 1000, "fields": "id", **({"cursor": cursor} if cursor else {})}
+            page, headers = self.request("GET", "/todos/", params=params)
+            ids.extend(todo["id"] for todo in page)
+            cursor = headers.get("X-Next-Cursor")
+            if not cursor:
+                return ids
+
+    def counts(self) -> Dict:
+        return self.call("GET", "/todos/counts")
+
+    def stats(self, days: int = 14) -> Dict:
+        return self.call("GET", "/todos/stats", params={"days": days})
+
+    def changes(self, since: int) -> Dict:
+        return self.call("GET", "/todos/changes", params={"since": since})
+
+    def create_todo(self, title: str, description: str = "") -> Dict:
+        return self.call("POST", "/todos/", {"title": title, "description": description})
+
+    def update_many(self, items: List[Dict]) -> List[Dict]:
+        # Only the ids are needed back; the local copy already has the values
+        return self.call("POST", "/todos/batch/update", {"items": items}, params={"fields": "id"})["results"]
+
+    def delete_many(self, ids: List[int]):
+        return self.call("POST", "/todos/delete", {"ids": ids})
+
+    # ---- jobs ----
+    def submit_job(self, kind: str, payload: Dict) -> Dict:
+        return self.call("POST", "/jobs", {"kind": kind, "payload": payload})
+
+    def get_job(self, job_id: str) -> Dict:
+        return self.call("GET", f"/jobs/{job_id}")
+
+    # ---- chat ----
+    def create_chat_session(self) -> str:
+        return self.call("POST", "/chat/sessions")["session_id"]
+
+    def delete_chat_session(self, session_id: str):
+        return self.call("DELETE", f"/chat/sessions/{session_id}")
+
+    def stream_chat(self, message: str, session_id: Optional[str] = None):
+        # Yields reply tokens from the /chat/stream Server-Sent Events endpoint;
+        # raises requests exceptions so the caller can tell the failures apart
+        changed = False
+        with self.session.post(
+            f"{self.base_url}/chat/stream",
+            json={"message": message, "session_id": session_id},
+            stream=True,
+            timeout=CHAT_TIMEOUT,
+        ) as res:
+            res.raise_for_status()
+            for line in res.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data: "):
+                    continue
+                data = line[len("data: "):]
+                if data == "[DONE]":
+                    break
+                event = json.loads(data)
+                if event.get("actions"):
+                    changed = True
+                yield event.get("delta", "")
+        if changed:
+            # The assistant changed todos through its tools
+            self.invalidate()
+
+
+# =======================
+# WRITE QUEUE
+# =======================
+class WriteQueue:
+    """Coalesces todo edits and deletes into batch requests, sent off the UI thread.
+
+    The UI enqueues each change here and draws the pages it fetches through
+    overlay(), so unsent changes show at once; repeated edits to one todo
+    collapse into a single item. A background
+    thread waits WRITE_FLUSH_DELAY after the first change, then sends one
+    /todos/batch/update and one /todos/delete. Failures are kept in `errors`
+    for the UI to show, after which it should resync from the backend.
+
+    The thread exits after WRITE_IDLE_EXIT seconds with nothing to send and
+    the next change starts a new one, so closed sessions leave none behind.
+    """
+
+    def __init__(self, api: TodoAPI, delay: float = WRITE_FLUSH_DELAY):
+        self.api = api
+        self.delay = delay
+        self.errors = []
+        self._updates = {}
+        self._deletes = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._thread = None
+
+    def _start(self):
+        # Called with the lock held, after queueing a change
+        self._idle.clear()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name="todo-writes")
+            self._thread.start()
+
+    def update(self, todo_id: int, **fields):
+        with self._lock:
+            if todo_id in self._deletes:
+                return
+            self._updates.setdefault(todo_id, {}).update(fields)
+            self._start()
+        self._wake.set()
+
+    def delete(self, todo_id: int):
+        with self._lock:
+            self._updates.pop(todo_id, None)
+            self._deletes.add(todo_id)
+            self._start()
+        self._wake.set()
+
+    def overlay(self, todos: List[Dict]) -> List[Dict]:
+        """Apply unsent changes on top of rows fetched from the backend."""
+        with self._lock:
+            updates, deletes = dict(self._updates), set(self._deletes)
+        if not updates and not deletes:
+            return todos
+        return [
+            {**todo, **updates.get(todo["id"], {})}
+            for todo in todos if todo["id"] not in deletes
+        ]
+
+    def drain_errors(self) -> List[str]:
+        with self._lock:
+            errors, self.errors = self.errors, []
+        return errors
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until everything enqueued so far has been sent."""
+        self._wake.set()
+        return self._idle.wait(timeout)
+
+    def flush(self):
+        with self._lock:
+            updates, self._updates = self._updates, {}
+            deletes, self._deletes = self._deletes, set()
+        try:
+            items = [{"id": todo_id, **fields} for todo_id, fields in updates.items()]
+            for start in range(0, len(items), WRITE_BATCH_SIZE):
+                self.api.update_many(items[start:start + WRITE_BATCH_SIZE])
+            if deletes:
+                self.api.delete_many(sorted(deletes))
+        except APIError as e:
+            with self._lock:
+                self.errors.append(str(e))
+        finally:
+            with self._lock:
+                if not self._updates and not self._deletes:
+                    self._idle.set()
+
+    def _run(self):
+        while True:
+            if not self._wake.wait(WRITE_IDLE_EXIT):
+                with self._lock:
+                    if not self._updates and not self._deletes:
+                        self._thread = None
+                        return
+                continue
+            # Let a burst of clicks accumulate before sending
+            if self.delay and not self._idle.is_set():
+                time.sleep(self.delay)
+            self._wake.clear()
+            self.flush()
@@ -1,12 +1,23 @@
 import streamlit as st
 import requests
-from typing import List, Dict
+import os
+import time
+from typing import List, Dict, Optional
+
+import api_client
+from api_client import APIError
 
 # =======================
 # CONFIG
 # =======================
-API_URL = "http://127.0.0.1:8000"
-TIMEOUT = 5
+BULK_JOB_THRESHOLD = 1000  # Larger bulk deletes run as background jobs
+JOB_POLL_INTERVAL = 0.5
+# Only one page of the selected view is fetched and drawn per rerun, so the
+# widget count is bounded by the page size, not by the number of tasks
+PAGE_SIZES = [10, 25, 50, 100]
+DEFAULT_PAGE_SIZE = int(os.getenv("TODO_PAGE_SIZE", "25"))
+VIEWS = {"all": None, "pending": False, "completed": True}
+CHAT_VIEW = "chat"
 
 st.set_page_config(
     page_title="Pro To-Do",
@@ -29,49 +40,104 @@ load_css("style.css")
 # =======================
 # API FUNCTIONS
 # =======================
-def api_request(method: str, endpoint: str, payload=None):
+@st.cache_resource
+def get_api() -> api_client.TodoAPI:
+    # One client, so one keep-alive connection pool, per Streamlit server
+    return api_client.TodoAPI()
+
+api = get_api()
+
+def api_request(method: str, endpoint: str, payload=None, params=None):
     try:
-        response = requests.request(
-            method,
-            f"{API_URL}{endpoint}",
-            json=payload,
-            timeout=TIMEOUT
-        )
-        response.raise_for_status()
-        return response.json() if response.content else True
-    except requests.exceptions.ConnectionError:
-        st.error("❌ Backend is not running. Start FastAPI backend first!")
-    except requests.exceptions.Timeout:
-        st.error("⏱ Backend took too long to respond!")
-    except requests.HTTPError:
-        st.error(f"API Error {response.status_code}: {response.text}")
+        return api.call(method, endpoint, payload, params)
+    except APIError as e:
+        st.error(str(e))
     return None
 
-def get_todos() -> List[Dict]:
-    return api_request("GET", "/todos/") or []
+def writes() -> api_client.WriteQueue:
+    # Per browser session: edits are applied locally at once and sent in batches
+    if "write_queue" not in st.session_state:
+        st.session_state.write_queue = api_client.WriteQueue(api)
+    return st.session_state.write_queue
 
 def add_todo(title: str):
-    return api_request("POST", "/todos/", {"title": title, "description": "", "completed": False})
+    return api_request("POST", "/todos/", {"title": title, "description": ""})
+
+def set_completed(todo_id: int, key: str):
+    # Checkbox callback: queue the write, no blocking PUT. The page is drawn
+    # with queued writes overlaid, so the change shows on this rerun.
+    writes().update(todo_id, completed=st.session_state[key])
 
-def update_todo(todo_id: int, title: str = None, description: str = None, completed: bool = None):
-    payload = {}
-    if title is not None: payload["title"] = title
-    if description is not None: payload["description"] = description
-    if completed is not None: payload["completed"] = completed
-    return api_request("PUT", f"/todos/{todo_id}", payload)
+def edit_todo(todo_id: int, title: str, description: str):
+    writes().update(todo_id, title=title, description=description)
 
 def delete_todo(todo_id: int):
-    return api_request("DELETE", f"/todos/{todo_id}")
+    writes().delete(todo_id)
+
+def load_page(view: str, cursor: Optional[str], limit: int):
+    """(todos, next cursor) for one page of a view, newest first, with unsent writes applied."""
+    completed = VIEWS[view]
+    try:
+        items, next_cursor, _ = api.todos_page(completed, cursor, limit, order_by="-id")
+    except APIError as e:
+        st.error(str(e))
+        return [], None
+    items = writes().overlay(items)
+    if completed is not None:
+        # A task toggled on this page has left this view
+        items = [t for t in items if t["completed"] == completed]
+    return items, next_cursor
+
+def load_stats() -> Optional[Dict]:
+    # Counts for the view labels plus the sidebar dashboard, in one ETag-cached call
+    try:
+        return api.stats()
+    except APIError as e:
+        st.error(str(e))
+        return None
+
+def wait_for_job(job: Dict, label: str):
+    # Polls a background job, showing its progress; returns the finished job
+    bar = st.progress(0.0, text=label)
+    while job and job["status"] not in ("succeeded", "failed"):
+        time.sleep(JOB_POLL_INTERVAL)
+        job = api_request("GET", f"/jobs/{job['id']}")
+        if job:
+            bar.progress(job["progress"], text=label)
+    bar.empty()
+    if job and job["status"] == "failed":
+        st.error(f"{label} failed: {job['error']}")
+    return job
 
 def bulk_delete(ids: List[int]):
-    return api_request("POST", "/todos/delete", {"ids": ids})
+    # Queued edits to rows about to disappear must land (or fail) first
+    writes().wait(api_client.TIMEOUT)
+    if len(ids) <= BULK_JOB_THRESHOLD:
+        return api_request("POST", "/todos/delete", {"ids": ids})
+    # Too big for one request timeout: hand it to the backend's job queue
+    job = api_request("POST", "/jobs", {"kind": "bulk_delete", "payload": {"ids": ids}})
+    job = wait_for_job(job, f"Deleting {len(ids)} tasks")
+    return job if job and job["status"] == "succeeded" else None
+
+def chat_session_id() -> Optional[str]:
+    # The backend keeps the conversation; the frontend only holds its id
+    if not st.session_state.get("chat_session_id"):
+        created = api_request("POST", "/chat/sessions")
+        st.session_state.chat_session_id = created["session_id"] if created else None
+    return st.session_state.chat_session_id
+
+def reset_chat():
+    if st.session_state.get("chat_session_id"):
+        api_request("DELETE", f"/chat/sessions/{st.session_state.chat_session_id}")
+    st.session_state.chat_session_id = None
+    st.session_state.chat_history = []
 
 # =======================
 # STATE MANAGEMENT
 # =======================
-if "todos" not in st.session_state:
-    with st.spinner("Loading tasks..."):
-        st.session_state.todos = get_todos()
+for message in writes().drain_errors():
+    # A queued write was rejected; the page below is re-read from the backend
+    st.error(message)
 
 if "editing" not in st.session_state:
     st.session_state.editing = None
@@ -79,7 +145,18 @@ if "editing" not in st.session_state:
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
 
-todos = st.session_state.todos
+if "cursors" not in st.session_state:
+    # view -> cursors of the pages before the current one, for Prev/Next
+    st.session_state.cursors = {view: [None] for view in VIEWS}
+
+if "editor_generation" not in st.session_state:
+    st.session_state.editor_generation = 0
+
+def reset_paging():
+    st.session_state.cursors = {view: [None] for view in VIEWS}
+
+stats = load_stats()
+counts = stats or {"total": 0, "completed": 0, "pending": 0}
 
 # =======================
 # SIDEBAR
@@ -90,20 +167,36 @@ with st.sidebar:
         title = st.text_input("", placeholder="Enter task title...")
         if st.form_submit_button("Add Task"):
             if title.strip():
-                new_todo = add_todo(title.strip())
-                if new_todo:
-                    st.session_state.todos.append(new_todo)
+                if add_todo(title.strip()):
+                    # Newest first: the new task is at the top of page one
+                    reset_paging()
                     st.rerun()
             else:
                 st.warning("Title cannot be empty")
 
-    if todos:
+    if counts["total"]:
         st.divider()
         if st.button("🧹 Clear All Tasks", type="primary"):
-            if bulk_delete([t["id"] for t in todos]):
-                st.session_state.todos = []
+            if bulk_delete(api.all_ids()):
+                reset_paging()
                 st.rerun()
 
+    if stats and stats["total"]:
+        st.divider()
+        velocity = stats["velocity"]
+        col_today, col_week = st.columns(2)
+        col_today.metric("Done today", stats["completed_today"])
+        col_week.metric(
+            f"Done, last {velocity['window_days']} days", velocity["last"],
+            delta=velocity["last"] - velocity["previous"],
+        )
+        st.progress(stats["completion_rate"], text=f"{stats['completion_rate']:.0%} of tasks complete")
+
+    last_timing = api.last_server_timing
+    if last_timing and last_timing[1]:
+        st.divider()
+        st.caption(f"⏱ {last_timing[0]}: {last_timing[1]}")
+
 # =======================
 # TASK CARD
 # =======================
@@ -113,7 +206,11 @@ def task_card(todo: Dict, prefix: str):
     col1, col2, col3, col4 = st.columns([0.05, 0.6, 0.15, 0.15])
 
     with col1:
-        checked = st.checkbox("", value=todo["completed"], key=f"{prefix}_check_{todo['id']}")
+        # The value is part of the key: a keyed checkbox ignores `value` once
+        # created, so a change from elsewhere gets a fresh widget
+        key = f"{prefix}_check_{todo['id']}_{int(todo['completed'])}"
+        st.checkbox("Done", value=todo["completed"], key=key, on_change=set_completed,
+                    args=(todo["id"], key), label_visibility="collapsed")
 
     with col2:
         if todo["completed"]:
@@ -129,10 +226,9 @@ def task_card(todo: Dict, prefix: str):
 
     with col4:
         if st.button("🗑️", key=f"{prefix}_del_{todo['id']}"):
-            if delete_todo(todo["id"]):
-                st.session_state.todos = [t for t in todos if t["id"] != todo["id"]]
-                st.session_state.editing = None
-                st.rerun()
+            delete_todo(todo["id"])
+            st.session_state.editing = None
+            st.rerun()
 
     if st.session_state.editing == todo["id"]:
         with st.expander("Edit Task", expanded=True):
@@ -143,21 +239,14 @@ def task_card(todo: Dict, prefix: str):
                 col_a, col_b = st.columns(2)
                 with col_a:
                     if st.form_submit_button("Save"):
-                        if update_todo(todo["id"], new_title.strip(), new_desc.strip()):
-                            todo["title"] = new_title.strip()
-                            todo["description"] = new_desc.strip()
-                            st.session_state.editing = None
-                            st.rerun()
+                        edit_todo(todo["id"], new_title.strip(), new_desc.strip())
+                        st.session_state.editing = None
+                        st.rerun()
                 with col_b:
                     if st.form_submit_button("Cancel"):
                         st.session_state.editing = None
                         st.rerun()
 
-    if checked != todo["completed"]:
-        if update_todo(todo["id"], completed=checked):
-            todo["completed"] = checked
-            st.rerun()
-
     st.markdown("</div>", unsafe_allow_html=True)
 
 # =======================
@@ -166,75 +255,136 @@ def task_card(todo: Dict, prefix: str):
 st.title("✅ Pro To-Do App")
 st.caption("Organize your tasks efficiently and stay productive 💡")
 
-pending = [t for t in todos if not t["completed"]]
-completed = [t for t in todos if t["completed"]]
-
-tab1, tab2, tab3, tab4 = st.tabs([
-    f"📋 All ({len(todos)})",
-    f"⏳ Pending ({len(pending)})",
-    f"✔ Completed ({len(completed)})",
-    "🤖 AI Assistant"
-])
-
-with tab1:
-    if not todos:
-        st.info("No tasks yet.")
-    for t in todos:
-        task_card(t, "all")
+view = st.segmented_control(
+    "View",
+    options=["all", "pending", "completed", CHAT_VIEW],
+    format_func=lambda v: {
+        "all": f"📋 All ({counts['total']})",
+        "pending": f"⏳ Pending ({counts['pending']})",
+        "completed": f"✔ Completed ({counts['completed']})",
+        CHAT_VIEW: "🤖 AI Assistant",
+    }[v],
+    default="all",
+    key="view",
+    label_visibility="collapsed",
+) or "all"
+
+def table_edited(key: str, rows: List[Dict]):
+    # data_editor callback: queue every edited row, then start a fresh editor
+    # over the updated page (row indexes in the old edit state would go stale)
+    for index, changes in st.session_state[key]["edited_rows"].items():
+        todo_id = rows[int(index)]["id"]
+        if changes.get("delete"):
+            writes().delete(todo_id)
+            continue
+        fields = {name: changes[name] for name in ("completed", "title", "description") if name in changes}
+        if fields:
+            writes().update(todo_id, **fields)
+    st.session_state.editor_generation += 1
+
+def task_table(items: List[Dict], prefix: str):
+    rows = [
+        {"id": t["id"], "completed": t["completed"], "title": t["title"],
+         "description": t.get("description") or "", "delete": False}
+        for t in items
+    ]
+    key = f"{prefix}_editor_{st.session_state.editor_generation}"
+    st.data_editor(
+        rows,
+        key=key,
+        hide_index=True,
+        width="stretch",
+        disabled=["id"],
+        column_config={
+            "id": st.column_config.NumberColumn("ID", width="small"),
+            "completed": st.column_config.CheckboxColumn("Done", width="small"),
+            "title": st.column_config.TextColumn("Title", required=True),
+            "description": st.column_config.TextColumn("Description"),
+            "delete": st.column_config.CheckboxColumn("🗑️", width="small"),
+        },
+        on_change=table_edited,
+        args=(key, rows),
+    )
+
+def task_list(view: str):
+    cursors = st.session_state.cursors[view]
+    col_layout, col_size = st.columns([0.6, 0.4])
+    with col_layout:
+        layout = st.radio("Layout", ["Cards", "Table"], horizontal=True, key="layout", label_visibility="collapsed")
+    with col_size:
+        limit = st.selectbox(
+            "Per page", PAGE_SIZES, index=PAGE_SIZES.index(DEFAULT_PAGE_SIZE) if DEFAULT_PAGE_SIZE in PAGE_SIZES else 1,
+            key="page_size", on_change=reset_paging,
+        )
 
-with tab2:
-    if not pending:
-        st.success("Nothing pending 🎉")
-    for t in pending:
-        task_card(t, "pending")
+    items, next_cursor = load_page(view, cursors[-1], limit)
+    if not items and len(cursors) == 1:
+        st.info({"all": "No tasks yet.", "pending": "Nothing pending 🎉", "completed": "No completed tasks."}[view])
+    elif layout == "Table":
+        task_table(items, view)
+    else:
+        for t in items:
+            task_card(t, view)
+
+    col_prev, col_page, col_next = st.columns([0.2, 0.6, 0.2])
+    with col_prev:
+        if st.button("← Prev", key=f"{view}_prev", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+    with col_page:
+        st.caption(f"Page {len(cursors)}")
+    with col_next:
+        if st.button("Next →", key=f"{view}_next", disabled=not next_cursor):
+            cursors.append(next_cursor)
+            st.rerun()
 
-with tab3:
-    if not completed:
-        st.info("No completed tasks.")
-    for t in completed:
-        task_card(t, "completed")
+if view != CHAT_VIEW:
+    task_list(view)
 
 # =======================
 # AI CHAT TAB
 # =======================
-with tab4:
+if view == CHAT_VIEW:
     st.subheader("🤖 AI Todo Assistant")
     st.caption("Ask anything about productivity or tasks")
 
     user_msg = st.text_input("Your message", key="chat_input")
 
-    if st.button("Send", key="chat_send") and user_msg:
-        with st.spinner("AI is thinking..."):
-            try:
-                res = requests.post(
-                    f"{API_URL}/chat",
-                    json={"message": user_msg},
-                    timeout=30  # Increased timeout for AI processing
-                )
-                if res.status_code == 200:
-                    reply = res.json()["reply"]
-                    st.session_state.chat_history.append(("You", user_msg))
-                    st.session_state.chat_history.append(("AI", reply))
-                    st.rerun()
-                elif res.status_code == 401:
-                    st.error("❌ Authentication error: Invalid GROQ API key. Please check your backend configuration.")
-                elif res.status_code == 429:
-                    st.error("Rate limit exceeded. Please try again later.")
-                else:
-                    error_detail = res.json().get("detail", "Unknown error") if res.content else "No response from server"
-                    st.error(f"AI service error ({res.status_code}): {error_detail}")
-            except requests.exceptions.Timeout:
-                st.error("⏰ Request timed out. The AI service may be slow to respond.")
-            except requests.exceptions.ConnectionError:
-                st.error("🔌 Connection error. Make sure the backend server is running.")
-            except requests.exceptions.RequestException as e:
-                st.error(f"Network error: {str(e)}")
-            except Exception as e:
-                st.error(f"Unexpected error: {str(e)}")
+    if st.session_state.chat_history and st.button("New conversation", key="chat_reset"):
+        reset_chat()
+        st.rerun()
 
     for role, msg in st.session_state.chat_history:
         st.markdown(f"**{role}:** {msg}")
 
+    if st.button("Send", key="chat_send") and user_msg:
+        st.markdown(f"**You:** {user_msg}")
+        try:
+            # Render tokens as they arrive instead of waiting for the full reply
+            reply = st.write_stream(api.stream_chat(user_msg, chat_session_id()))
+            st.session_state.chat_history.append(("You", user_msg))
+            st.session_state.chat_history.append(("AI", reply))
+            st.rerun()
+        except requests.HTTPError as e:
+            if e.response.status_code == 404:
+                # Session is gone on the backend (e.g. database reset)
+                st.session_state.chat_session_id = None
+                st.warning("Chat session expired, a new one will be started. Please send your message again.")
+            elif e.response.status_code == 401:
+                st.error("❌ Authentication error: Invalid GROQ API key. Please check your backend configuration.")
+            elif e.response.status_code == 429:
+                st.error("Rate limit exceeded. Please try again later.")
+            else:
+                st.error(f"AI service error ({e.response.status_code}): {e.response.text}")
+        except requests.exceptions.Timeout:
+            st.error("⏰ Request timed out. The AI service may be slow to respond.")
+        except requests.exceptions.ConnectionError:
+            st.error("🔌 Connection error. Make sure the backend server is running.")
+        except requests.exceptions.RequestException as e:
+            st.error(f"Network error: {str(e)}")
+        except Exception as e:
+            st.error(f"Unexpected error: {str(e)}")
+
 # =======================
 # FOOTER
 # =======================
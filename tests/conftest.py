@@ -0,0 +1,64 @@
+# conftest.py
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+import pytest
+
+# =======================
+# ENV
+# =======================
+# Settings are read at import, so the environment is fixed before any
+# backend module loads: a throwaway SQLite database, no LLM, no reply cache.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(ROOT, "backend")
+DB_DIR = tempfile.mkdtemp(prefix="todo-tests-")
+
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(DB_DIR, 'test.db')}",
+    "DB_MODE": "sync",
+    "GROQ_API_KEY": "",
+    "LLM_CACHE_ENABLED": "false",
+    "SHARED_STATE_URL": "memory://",
+    "TODO_IMPORT_DIR": os.path.join(DB_DIR, "imports"),
+})
+sys.path.insert(0, BACKEND_DIR)
+
+
+# =======================
+# FIXTURES
+# =======================
+@pytest.fixture(scope="session")
+def client():
+    import main
+    from fastapi.testclient import TestClient
+
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def db(client):
+    from database import SessionLocal
+
+    with SessionLocal() as session:
+        yield session
+
+
+def new_user(db):
+    import accounts
+
+    created, token = accounts.create_user(db, f"test-{os.urandom(6).hex()}")
+    return SimpleNamespace(id=created.id, headers={"Authorization": f"Bearer {token}"})
+
+
+@pytest.fixture
+def user(db):
+    """A fresh user (id, headers), so each test starts with an empty todo list."""
+    return new_user(db)
+
+
+@pytest.fixture
+def other_user(db):
+    return new_user(db)
@@ -0,0 +1,74 @@
+# test_api_client.py
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from conftest import ROOT
+
+sys.path.insert(0, os.path.join(ROOT, "frontend"))
+import api_client  # noqa: E402
+
+
+class RecordingAPI:
+    """Stands in for TodoAPI; keeps the batches the queue sends."""
+
+    def __init__(self):
+        self.sent = []
+
+    def update_many(self, items):
+        self.sent.append(("update", items))
+        return items
+
+    def delete_many(self, ids):
+        self.sent.append(("delete", ids))
+
+
+def test_write_queue_thread_exits_when_idle_and_restarts(monkeypatch):
+    monkeypatch.setattr(api_client, "WRITE_IDLE_EXIT", 0.05)
+    api = RecordingAPI()
+    queue = api_client.WriteQueue(api, delay=0)
+    assert queue._thread is None
+
+    queue.update(1, completed=True)
+    queue.update(1, title="Renamed")
+    assert queue.wait(2)
+    first = queue._thread
+    deadline = time.monotonic() + 2
+    while queue._thread is not None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert queue._thread is None and not first.is_alive()
+
+    queue.delete(1)
+    assert queue.wait(2)
+    assert api.sent == [("update", [{"id": 1, "completed": True, "title": "Renamed"}]), ("delete", [1])]
+
+
+class ETagHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = b"[]"
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", 'W/"1"')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_response_cache_keeps_the_most_recent_pages(monkeypatch):
+    monkeypatch.setattr(api_client, "CACHE_SIZE", 2)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ETagHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        api = api_client.TodoAPI(f"http://127.0.0.1:{server.server_port}")
+        for page in ("a", "b", "c"):
+            api.call("GET", "/todos/", params={"cursor": page})
+        api.call("GET", "/todos/", params={"cursor": "b"})  # a hit moves it to the back
+        api.call("GET", "/todos/", params={"cursor": "d"})
+    finally:
+        server.shutdown()
+    assert [dict(params)["cursor"] for _, params in api._cache] == ["b", "d"]
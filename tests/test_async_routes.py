@@ -0,0 +1,75 @@
+# test_async_routes.py
+import json
+import os
+import subprocess
+import sys
+
+from conftest import BACKEND_DIR
+
+# DB_MODE is read at import, so async mode runs in its own interpreter. The
+# probe records which handler served each request from the scope routing fills in.
+PROBE = """
+import json
+import main
+from fastapi.testclient import TestClient
+
+served = []
+
+async def probe(scope, receive, send):
+    await main.app(scope, receive, send)
+    if scope["type"] == "http":
+        endpoint = scope.get("endpoint")
+        served.append(f"{endpoint.__module__}.{endpoint.__name__}")
+
+with TestClient(probe) as client:
+    todo = client.post("/todos/", json={"title": "async"}).json()
+    client.get("/todos/")
+    client.get(f"/todos/{todo['id']}")
+    client.put(f"/todos/{todo['id']}", json={"completed": True})
+    client.get("/todos/counts")
+    client.delete(f"/todos/{todo['id']}")
+    client.post("/todos/delete", json={"ids": [todo["id"]]})
+print(json.dumps(served))
+"""
+
+
+def test_async_mode_serves_todo_crud_from_todos_async(tmp_path):
+    env = {**os.environ, "DB_MODE": "async", "DATABASE_URL": f"sqlite:///{tmp_path / 'async.db'}"}
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    served = json.loads(result.stdout.strip().splitlines()[-1])
+    assert served == [
+        "todos_async.create_todo",
+        "todos_async.read_todos",
+        "todos_async.read_todo",
+        "todos_async.update_todo",
+        # Declared before /todos/{todo_id} in main.py, and still matched first
+        "main.read_counts",
+        "todos_async.delete_todo",
+        "todos_async.bulk_delete",
+    ]
+
+
+def test_owner_goes_to_the_threadpool_only_on_a_token_cache_miss(client, user, monkeypatch):
+    import asyncio
+
+    import accounts
+    import main
+    import todos_async
+
+    offloaded = []
+
+    async def run_in_threadpool(func, *args):
+        offloaded.append(func)
+        return func(*args)
+
+    monkeypatch.setattr(todos_async, "run_in_threadpool", run_in_threadpool)
+    monkeypatch.setattr(todos_async, "current_owner", main.current_owner)
+    monkeypatch.setattr(accounts, "_token_cache", {})
+
+    authorization = user.headers["Authorization"]
+    assert asyncio.run(todos_async.owner(authorization)) == user.id
+    assert asyncio.run(todos_async.owner(authorization)) == user.id
+    assert asyncio.run(todos_async.owner(None)) == accounts.default_owner_id
+    assert offloaded == [main.current_owner]
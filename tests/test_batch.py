@@ -0,0 +1,15 @@
+# test_batch.py
+
+
+def test_batch_create_returns_todos_in_request_order(client, user):
+    titles = [f"task {n}" for n in (3, 1, 4, 1, 5, 9, 2, 6)]
+    response = client.post(
+        "/todos/batch/create", json={"items": [{"title": title} for title in titles]}, headers=user.headers
+    )
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["todo"]["title"] for result in results] == titles
+    for result in results:
+        stored = client.get(f"/todos/{result['id']}", headers=user.headers).json()
+        assert stored["title"] == result["todo"]["title"]
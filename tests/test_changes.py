@@ -0,0 +1,75 @@
+# test_changes.py
+
+
+def create(client, user, title):
+    return client.post("/todos/", json={"title": title}, headers=user.headers).json()
+
+
+def feed(client, user, since=0, limit=1000):
+    return client.get("/todos/changes", params={"since": since, "limit": limit}, headers=user.headers).json()
+
+
+def test_deleted_ids_are_not_handed_out_again(client, user):
+    first = create(client, user, "dentist")
+    client.delete(f"/todos/{first['id']}", headers=user.headers)
+    second = create(client, user, "dentist again")
+    assert second["id"] != first["id"]
+
+    changes = feed(client, user)
+    assert [todo["id"] for todo in changes["changed"]] == [second["id"]]
+    assert changes["deleted"] == [first["id"]]
+
+
+def test_another_owners_create_keeps_my_tombstone(client, user, other_user):
+    mine = create(client, user, "dentist appointment")
+    since = feed(client, user)["version"]
+    client.delete(f"/todos/{mine['id']}", headers=user.headers)
+    theirs = create(client, other_user, "groceries")
+
+    assert theirs["id"] != mine["id"]
+    changes = feed(client, user, since=since)
+    assert changes["deleted"] == [mine["id"]] and changes["changed"] == []
+    assert feed(client, other_user)["deleted"] == []
+
+
+def test_page_is_cut_on_a_version_boundary(client, user):
+    singles = [create(client, user, f"single {n}")["id"] for n in range(3)]
+    batch = client.post(
+        "/todos/batch/create", json={"items": [{"title": f"batch {n}"} for n in range(4)]}, headers=user.headers
+    ).json()
+    batch_ids = [result["id"] for result in batch["results"]]
+    last = create(client, user, "last")["id"]
+
+    # The 4-row write would straddle the limit, so the page stops before it
+    page = feed(client, user, limit=4)
+    assert [todo["id"] for todo in page["changed"]] == singles
+    assert page["version"] == 3 and page["has_more"]
+
+    # A write bigger than the page is still sent whole
+    page = feed(client, user, since=page["version"], limit=2)
+    assert sorted(todo["id"] for todo in page["changed"]) == sorted(batch_ids)
+    assert page["version"] == 4 and page["has_more"]
+
+    page = feed(client, user, since=page["version"], limit=2)
+    assert [todo["id"] for todo in page["changed"]] == [last]
+    assert page["version"] == 5 and not page["has_more"]
+
+
+def test_resuming_from_a_page_version_sees_every_event_once(client, user):
+    ids = [create(client, user, f"task {n}")["id"] for n in range(5)]
+    for todo_id in ids[:2]:
+        client.delete(f"/todos/{todo_id}", headers=user.headers)
+    client.put(f"/todos/{ids[2]}", json={"completed": True}, headers=user.headers)
+
+    changed, deleted, since = [], [], 0
+    while True:
+        page = feed(client, user, since=since, limit=2)
+        changed += [todo["id"] for todo in page["changed"]]
+        deleted += page["deleted"]
+        since = page["version"]
+        if not page["has_more"]:
+            break
+
+    assert sorted(changed) == sorted(ids[2:])
+    assert sorted(deleted) == sorted(ids[:2])
+    assert feed(client, user, since=since) == {"version": since, "changed": [], "deleted": [], "has_more": False}
@@ -0,0 +1,83 @@
+# test_chat_tools.py
+import json
+import os
+from types import SimpleNamespace
+
+import accounts
+import chat_tools
+import models
+
+
+def tool_call(call_id, name, **arguments):
+    return SimpleNamespace(id=call_id, function=SimpleNamespace(name=name, arguments=json.dumps(arguments)))
+
+
+def test_failed_mutation_rolls_back_the_whole_turn(client, db):
+    owner, token = accounts.create_user(db, f"test-{os.urandom(6).hex()}", quota=2)
+    headers = {"Authorization": f"Bearer {token}"}
+    keep = client.post("/todos/", json={"title": "Keep me"}, headers=headers).json()
+
+    messages, actions = chat_tools.run_tool_calls(db, owner.id, [
+        tool_call("1", "delete_todos", ids=[keep["id"]]),
+        tool_call("2", "create_todos", items=[{"title": "a"}, {"title": "b"}, {"title": "c"}]),
+        tool_call("3", "complete_todos", ids=[keep["id"]]),
+        tool_call("4", "list_todos"),
+    ])
+
+    assert db.get(models.Todo, keep["id"]) is not None
+    assert actions[0]["result"]["error"].startswith("Rolled back")
+    assert actions[1]["result"]["error"].startswith("QuotaExceeded")
+    assert actions[2]["result"]["error"].startswith("Skipped")
+    # Reads still run, and see the rolled-back state
+    assert [todo["id"] for todo in actions[3]["result"]] == [keep["id"]]
+    assert [m["tool_call_id"] for m in messages] == ["1", "2", "3", "4"]
+
+
+def test_chat_always_returns_actions(client, user):
+    body = client.post("/chat", json={"message": "hi"}, headers=user.headers).json()
+    assert body["actions"] == []
+
+
+def chunk(content=None, tool_calls=None):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content, tool_calls=tool_calls))])
+
+
+def tool_delta(index, call_id=None, name=None, arguments=None):
+    return SimpleNamespace(index=index, id=call_id, function=SimpleNamespace(name=name, arguments=arguments))
+
+
+def test_chat_stream_runs_tool_calls(client, user, monkeypatch):
+    import llm_gateway
+    import main
+
+    shopping = client.post("/todos/", json={"title": "Buy milk"}, headers=user.headers).json()
+    # Round one streams a complete_todos call in fragments, round two the answer
+    rounds = [
+        [chunk(tool_calls=[tool_delta(0, "call-1", "complete_todos", '{"ids": [')]),
+         chunk(tool_calls=[tool_delta(0, arguments=f'{shopping["id"]}]}}')])],
+        [chunk("Done, "), chunk("marked it complete.")],
+    ]
+    requests = []
+
+    async def create(**kwargs):
+        requests.append(kwargs)
+
+        async def chunks():
+            for item in rounds[len(requests) - 1]:
+                yield item
+        return chunks()
+
+    gateway = llm_gateway.LLMGateway("key", "http://llm.invalid")
+    gateway.async_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(main, "_llm", gateway)
+
+    response = client.post("/chat/stream", json={"message": "mark my shopping done"}, headers=user.headers)
+
+    events = [json.loads(line[len("data: "):]) for line in response.text.splitlines()
+              if line.startswith("data: ") and line != "data: [DONE]"]
+    assert "".join(event.get("delta", "") for event in events) == "Done, marked it complete."
+    assert [event["actions"][0]["tool"] for event in events if "actions" in event] == ["complete_todos"]
+    assert client.get(f"/todos/{shopping['id']}", headers=user.headers).json()["completed"] is True
+    # The tool result went back to the model, which was offered the tools
+    assert "tools" in requests[0]
+    assert requests[1]["messages"][-1]["role"] == "tool"
@@ -0,0 +1,18 @@
+# test_embeddings.py
+import changes
+import embeddings
+import models
+
+
+def test_sync_keeps_a_row_that_is_both_changed_and_deleted(client, db, user):
+    todo = client.post("/todos/", json={"title": "Book the dentist"}, headers=user.headers).json()
+    assert [hit["id"] for hit in embeddings.relevant_todos(db, user.id, "dentist")] == [todo["id"]]
+
+    # A feed page carrying the id in both lists, as left by a delete and a re-create
+    client.put(f"/todos/{todo['id']}", json={"title": "Book the dentist again"}, headers=user.headers)
+    db.add(models.TodoTombstone(
+        todo_id=todo["id"], owner_id=user.id, version=changes.current_version(db, user.id)
+    ))
+    db.commit()
+
+    assert [hit["id"] for hit in embeddings.relevant_todos(db, user.id, "dentist")] == [todo["id"]]
@@ -0,0 +1,23 @@
+# test_etags.py
+import os
+
+import accounts
+
+
+def test_list_etag_is_per_owner(client, db, user):
+    other, token = accounts.create_user(db, f"test-{os.urandom(6).hex()}")
+    other_headers = {"Authorization": f"Bearer {token}"}
+    # Both owners at change version 1, asking the same query
+    client.post("/todos/", json={"title": "mine"}, headers=user.headers)
+    client.post("/todos/", json={"title": "theirs"}, headers=other_headers)
+
+    mine = client.get("/todos/", headers=user.headers)
+    assert mine.headers["X-Change-Version"] == "1"
+    assert "Authorization" in mine.headers["Vary"]
+
+    theirs = client.get("/todos/", headers={**other_headers, "If-None-Match": mine.headers["ETag"]})
+    assert theirs.status_code == 200
+    assert [todo["title"] for todo in theirs.json()] == ["theirs"]
+
+    again = client.get("/todos/", headers={**user.headers, "If-None-Match": mine.headers["ETag"]})
+    assert again.status_code == 304
@@ -0,0 +1,31 @@
+# test_jobs.py
+import uuid
+
+from sqlalchemy import text
+
+import jobs
+import models
+
+
+def add_job(db, owner_id, status, age_seconds):
+    job_id = uuid.uuid4().hex
+    db.add(models.Job(id=job_id, owner_id=owner_id, kind="bulk_delete", status=status, payload='{"ids": []}'))
+    db.flush()
+    # Stamped like the heartbeat: by the database clock
+    db.execute(
+        text("UPDATE jobs SET updated_at = datetime('now', :age) WHERE id = :id"),
+        {"age": f"-{age_seconds} seconds", "id": job_id},
+    )
+    db.commit()
+    return job_id
+
+
+def test_only_jobs_past_the_lease_are_requeued(db, user):
+    stale = add_job(db, user.id, "running", jobs.JOB_LEASE_SECONDS + 30)
+    live = add_job(db, user.id, "running", 1)
+
+    requeued = jobs._requeue_abandoned(db)
+
+    assert stale in requeued and live not in requeued
+    assert db.get(models.Job, stale).status == "queued"
+    assert db.get(models.Job, live).status == "running"
@@ -0,0 +1,30 @@
+# test_llm_cache.py
+import llm_cache
+
+
+def fill(tier, count, start=0):
+    for n in range(start, start + count):
+        tier.set(f"key-{n}", {"reply": str(n), "tokens": 0})
+
+
+def test_sqlite_tier_evicts_past_max_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache.SQLiteTier, "PURGE_EVERY", 10)
+    tier = llm_cache.SQLiteTier(str(tmp_path / "cache.db"), ttl=60, max_entries=4)
+
+    fill(tier, 10)
+
+    assert len(tier) == 4 and tier.evictions == 6
+    # The newest entries are the ones kept
+    assert tier.get("key-9") == {"reply": "9", "tokens": 0}
+    assert tier.get("key-0") is None
+
+
+def test_sqlite_tier_sweeps_expired_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache.SQLiteTier, "PURGE_EVERY", 10)
+    tier = llm_cache.SQLiteTier(str(tmp_path / "cache.db"), ttl=-1, max_entries=100)
+
+    fill(tier, 10)
+
+    assert len(tier) == 0 and tier.expirations == 10 and tier.evictions == 0
+    stats = llm_cache.LLMResponseCache([tier]).stats()
+    assert stats["expirations"] == 10
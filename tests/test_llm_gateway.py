@@ -0,0 +1,170 @@
+# test_llm_gateway.py
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+import llm_gateway
+
+
+def on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+def chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+class RecordingState:
+    """Shared state whose incr notes whether it ran on the event loop."""
+
+    def __init__(self):
+        self.calls = []
+
+    def incr(self, key, ttl=None):
+        self.calls.append(on_event_loop())
+        return 1
+
+
+def fake_async_client(*texts):
+    async def create(**kwargs):
+        async def chunks():
+            for text in texts:
+                yield chunk(text)
+        return chunks()
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+async def collect(stream):
+    return [c.choices[0].delta.content async for c in stream]
+
+
+def test_stream_takes_the_rate_limit_off_the_event_loop():
+    state = RecordingState()
+    gateway = llm_gateway.LLMGateway("key", "http://llm.invalid", rate_limit=llm_gateway.SharedRateLimit(state, 10))
+    gateway.async_client = fake_async_client("Hello", " there")
+
+    assert asyncio.run(collect(gateway.stream(model="m", messages=[]))) == ["Hello", " there"]
+    assert state.calls == [False]
+
+
+class RecordingCache:
+    def __init__(self):
+        self.calls = []
+
+    def get(self, key):
+        self.calls.append(("get", on_event_loop()))
+        return None
+
+    def set(self, key, reply, seconds, tokens=None):
+        self.calls.append(("set", on_event_loop()))
+
+
+def test_chat_stream_keeps_the_reply_cache_off_the_event_loop(client, user, monkeypatch):
+    import main
+
+    cache = RecordingCache()
+    gateway = llm_gateway.LLMGateway("key", "http://llm.invalid")
+    gateway.async_client = fake_async_client("Hi")
+    monkeypatch.setattr(main, "_llm", gateway)
+    monkeypatch.setattr(main, "response_cache", cache)
+
+    response = client.post("/chat/stream", json={"message": "hello"}, headers=user.headers)
+
+    assert response.status_code == 200
+    assert '"delta": "Hi"' in response.text
+    assert cache.calls == [("get", False), ("set", False)]
+
+
+# =======================
+# BREAKER AND RETRIES
+# =======================
+REQUEST = httpx.Request("POST", "http://llm.invalid/chat/completions")
+
+
+def status_error(code, headers=None):
+    return openai.APIStatusError("error", response=httpx.Response(code, headers=headers, request=REQUEST), body=None)
+
+
+def sync_gateway(create, **kwargs):
+    gateway = llm_gateway.LLMGateway("key", "http://llm.invalid", backoff_base=0.0, **kwargs)
+    gateway.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    return gateway
+
+
+def scripted(*outcomes):
+    """A create() that raises or returns each outcome in turn, counting calls."""
+    outcomes = list(outcomes)
+
+    def create(**kwargs):
+        create.calls += 1
+        outcome = outcomes.pop(0) if len(outcomes) > 1 else outcomes[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    create.calls = 0
+    return create
+
+
+def test_transient_errors_are_retried_and_bad_requests_are_not():
+    create = scripted(openai.APIConnectionError(request=REQUEST), status_error(503), "ok")
+    gateway = sync_gateway(create)
+    assert gateway.complete(model="m", messages=[]) == "ok"
+    assert create.calls == 3
+    assert gateway.breaker.state == "closed"
+
+    create = scripted(status_error(400))
+    gateway = sync_gateway(create)
+    with pytest.raises(openai.APIStatusError):
+        gateway.complete(model="m", messages=[])
+    assert create.calls == 1
+    # A bad request says nothing about the provider's health
+    assert gateway.breaker.failures == 0
+
+
+def test_retry_after_header_sets_the_delay():
+    assert llm_gateway.retry_after(status_error(429, {"retry-after": "2"})) == 2.0
+    assert llm_gateway.retry_after(status_error(429, {"retry-after-ms": "250"})) == 0.25
+    assert llm_gateway.retry_after(status_error(429)) is None
+
+
+def test_breaker_opens_after_consecutive_failures_and_allows_one_probe():
+    gateway = sync_gateway(scripted(status_error(500)),
+                           max_retries=0, breaker=llm_gateway.CircuitBreaker(threshold=2, cooldown=30))
+    for _ in range(2):
+        with pytest.raises(openai.APIStatusError):
+            gateway.complete(model="m", messages=[])
+    assert gateway.breaker.state == "open"
+    with pytest.raises(llm_gateway.CircuitOpenError):
+        gateway.complete(model="m", messages=[])
+
+    gateway.breaker.opened_at -= 30
+    assert gateway.breaker.before_call() is True
+    with pytest.raises(llm_gateway.CircuitOpenError):
+        gateway.breaker.before_call()
+
+
+def test_only_the_probing_call_releases_the_probe():
+    breaker = llm_gateway.CircuitBreaker(threshold=1, cooldown=30)
+
+    def create(**kwargs):
+        # While this call is in flight the breaker trips and, after the
+        # cooldown, another request takes the half-open probe
+        breaker.record_failure()
+        breaker.opened_at -= 30
+        assert breaker.before_call() is True
+        raise status_error(400)
+
+    gateway = sync_gateway(create, breaker=breaker)
+    with pytest.raises(openai.APIStatusError):
+        gateway.complete(model="m", messages=[])
+
+    # The probe is still out, so everyone else is still refused
+    with pytest.raises(llm_gateway.CircuitOpenError):
+        breaker.before_call()
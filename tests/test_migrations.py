@@ -0,0 +1,46 @@
+# test_migrations.py
+import pytest
+
+import migrations
+import stats
+from database import create_db_engine
+
+
+def test_failed_revision_stays_pending(tmp_path, monkeypatch):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'migrate.db'}")
+    monkeypatch.setattr(stats, "SQLITE_DDL", stats.SQLITE_DDL + ["CREATE TRIGGER broken"])
+    with pytest.raises(Exception):
+        migrations.upgrade(engine)
+    assert migrations.pending(engine)[0][0] == "0005"
+
+    # Retried, and recorded, on the next upgrade
+    monkeypatch.undo()
+    assert migrations.upgrade(engine)[0] == "0005"
+    assert migrations.pending(engine) == []
+    assert stats.detect_stats_triggers(engine)
+    engine.dispose()
+
+
+def test_todos_table_is_rebuilt_so_ids_are_never_reused(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        # As created before todos had AUTOINCREMENT
+        conn.exec_driver_sql(
+            "CREATE TABLE todos (id INTEGER NOT NULL PRIMARY KEY, owner_id INTEGER, "
+            "title VARCHAR NOT NULL, description VARCHAR, completed BOOLEAN)"
+        )
+    migrations.upgrade(engine, "0005")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO users (id, name) VALUES (1, 'legacy')")
+        conn.exec_driver_sql("INSERT INTO todos (id, owner_id, title, completed) VALUES (1, 1, 'a', 0), (2, 1, 'b', 0)")
+        conn.exec_driver_sql("DELETE FROM todos WHERE id = 2")
+        conn.exec_driver_sql("INSERT INTO todo_tombstones (todo_id, owner_id, version) VALUES (2, 1, 1)")
+
+    assert migrations.upgrade(engine, "0006") == ["0006"]
+    with engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO todos (owner_id, title, completed) VALUES (1, 'dentist', 0)")
+        assert conn.exec_driver_sql("SELECT id FROM todos ORDER BY id").scalars().all() == [1, 3]
+        # Triggers came back with the table
+        assert conn.exec_driver_sql("SELECT total FROM todo_counts WHERE owner_id = 1").scalar() == 2
+        assert conn.exec_driver_sql("SELECT rowid FROM todos_fts WHERE todos_fts MATCH 'dentist'").scalar() == 3
+    engine.dispose()
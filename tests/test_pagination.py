@@ -0,0 +1,53 @@
+# test_pagination.py
+import pytest
+
+
+def page_through(client, user, order_by, limit):
+    ids, cursor = [], None
+    while True:
+        params = {"order_by": order_by, "limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/todos/", params=params, headers=user.headers)
+        assert response.status_code == 200
+        ids += [todo["id"] for todo in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize("order_by", ["id", "-id", "title", "-title"])
+def test_cursor_pages_cover_the_list_without_gaps_or_duplicates(client, user, order_by):
+    # Repeated titles make the id tie-breaker matter
+    for title in ["pear", "apple", "fig", "apple", "kiwi", "pear", "apple"]:
+        client.post("/todos/", json={"title": title}, headers=user.headers)
+    everything = [
+        todo["id"] for todo in client.get("/todos/", params={"order_by": order_by}, headers=user.headers).json()
+    ]
+
+    assert len(everything) == 7
+    assert page_through(client, user, order_by, limit=2) == everything
+
+
+def test_cursor_for_another_ordering_is_rejected(client, user):
+    for n in range(3):
+        client.post("/todos/", json={"title": f"task {n}"}, headers=user.headers)
+    cursor = client.get("/todos/", params={"limit": 1}, headers=user.headers).headers["X-Next-Cursor"]
+
+    response = client.get("/todos/", params={"order_by": "title", "cursor": cursor}, headers=user.headers)
+    assert response.status_code == 400
+
+
+def test_title_cursor_without_a_sort_key_is_rejected(client, user):
+    client.post("/todos/", json={"title": "task"}, headers=user.headers)
+    # {"o":"title","id":1}: well formed, but no "k"
+    response = client.get(
+        "/todos/", params={"order_by": "title", "cursor": "eyJvIjoidGl0bGUiLCJpZCI6MX0"}, headers=user.headers
+    )
+    assert response.status_code == 400
+
+
+def test_title_prefix_matches_characters_outside_the_bmp(client, user):
+    for title in ["Buy bread", "Buy 🛒 milk", "Buyer call", "buy lowercase"]:
+        client.post("/todos/", json={"title": title}, headers=user.headers)
+
+    response = client.get("/todos/", params={"title_prefix": "Buy ", "order_by": "title"}, headers=user.headers)
+    assert [todo["title"] for todo in response.json()] == ["Buy bread", "Buy 🛒 milk"]
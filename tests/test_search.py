@@ -0,0 +1,19 @@
+# test_search.py
+
+
+def search(client, user, q):
+    return client.get("/todos/search", params={"q": q}, headers=user.headers).json()["hits"]
+
+
+def test_highlights_escape_todo_text(client, user):
+    client.post(
+        "/todos/",
+        json={"title": "<img src=x onerror=alert(1)> milk", "description": "buy <b>oat</b> milk"},
+        headers=user.headers,
+    )
+    [hit] = search(client, user, "milk")
+    assert hit["title_highlight"] == "&lt;img src=x onerror=alert(1)&gt; <mark>milk</mark>"
+    assert "<b>" not in hit["snippet"]
+    assert "<mark>milk</mark>" in hit["snippet"]
+    # The plain fields stay as written
+    assert hit["title"] == "<img src=x onerror=alert(1)> milk"
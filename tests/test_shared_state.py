@@ -0,0 +1,19 @@
+# test_shared_state.py
+from types import SimpleNamespace
+
+import shared_state
+
+
+def test_memory_state_sweeps_keys_nobody_reads_again(monkeypatch):
+    monkeypatch.setattr(shared_state, "PURGE_EVERY", 10)
+    state = shared_state.MemoryState()
+    clock = [1000.0]
+    monkeypatch.setattr(shared_state, "time", SimpleNamespace(time=lambda: clock[0]))
+
+    # One rate-limit window per minute, each written and then abandoned
+    for window in range(10):
+        state.incr(f"llm_rate:{window}", ttl=120)
+        clock[0] += 60
+    state.set("forever", "1")
+
+    assert set(state._values) == {"llm_rate:8", "llm_rate:9", "forever"}
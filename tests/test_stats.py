@@ -0,0 +1,34 @@
+# test_stats.py
+
+
+def stats(client, user):
+    return client.get("/todos/stats", headers=user.headers).json()
+
+
+def test_today_counters_follow_completion(client, user):
+    ids = [client.post("/todos/", json={"title": f"task {n}"}, headers=user.headers).json()["id"] for n in range(3)]
+    client.put(f"/todos/{ids[0]}", json={"completed": True}, headers=user.headers)
+    client.put(f"/todos/{ids[1]}", json={"completed": True}, headers=user.headers)
+
+    today = stats(client, user)
+    assert (today["created_today"], today["completed_today"]) == (3, 2)
+    assert (today["total"], today["completed"]) == (3, 2)
+
+    # Un-completing takes the completion back out of today's rollup
+    client.put(f"/todos/{ids[1]}", json={"completed": False}, headers=user.headers)
+    today = stats(client, user)
+    assert today["completed_today"] == 1
+    assert today["daily"][-1]["completed"] == 1 and today["daily"][-1]["created"] == 3
+
+
+def test_timestamps_are_utc_on_postgres_too():
+    from sqlalchemy import insert
+    from sqlalchemy.dialects import postgresql
+
+    import models
+    import stats
+
+    # Postgres' now() into timestamp without time zone follows the session TimeZone
+    sql = str(insert(models.Todo).values(title="x").compile(dialect=postgresql.dialect()))
+    assert "now() AT TIME ZONE 'UTC'" in sql
+    assert not any("CURRENT_TIMESTAMP" in statement for statement in stats.POSTGRES_DDL)
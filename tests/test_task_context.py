@@ -0,0 +1,25 @@
+# test_task_context.py
+import os
+
+import accounts
+import main
+import task_context
+
+
+def test_snapshots_follow_their_owners_version(client, db, user):
+    other, token = accounts.create_user(db, f"test-{os.urandom(6).hex()}")
+    client.post("/todos/", json={"title": "Write report"}, headers=user.headers)
+    first = task_context.build_todos_context(db, user.id)
+    scope = main.reply_scope(db, user.id)
+
+    # Another owner's write leaves this owner's snapshot and reply keys alone
+    client.post("/todos/", json={"title": "Other task"}, headers={"Authorization": f"Bearer {token}"})
+    db.rollback()
+    assert task_context.build_todos_context(db, user.id) is first
+    assert main.reply_scope(db, user.id) == scope
+
+    # Their own write retires both
+    client.post("/todos/", json={"title": "Call the bank"}, headers=user.headers)
+    db.rollback()
+    assert "Call the bank" in task_context.build_todos_context(db, user.id)
+    assert main.reply_scope(db, user.id) != scope
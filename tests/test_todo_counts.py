@@ -0,0 +1,23 @@
+# test_todo_counts.py
+
+
+def counts(client, user):
+    return client.get("/todos/counts", headers=user.headers).json()
+
+
+def test_counts_follow_creates_completes_and_deletes(client, user):
+    assert counts(client, user) == {"total": 0, "completed": 0, "pending": 0}
+
+    ids = [client.post("/todos/", json={"title": f"task {n}"}, headers=user.headers).json()["id"] for n in range(3)]
+    assert counts(client, user) == {"total": 3, "completed": 0, "pending": 3}
+
+    client.put(f"/todos/{ids[0]}", json={"completed": True}, headers=user.headers)
+    client.post("/todos/batch/complete", json={"ids": ids[1:], "completed": True}, headers=user.headers)
+    assert counts(client, user) == {"total": 3, "completed": 3, "pending": 0}
+
+    client.put(f"/todos/{ids[1]}", json={"completed": False}, headers=user.headers)
+    client.delete(f"/todos/{ids[0]}", headers=user.headers)
+    assert counts(client, user) == {"total": 2, "completed": 1, "pending": 1}
+
+    client.post("/todos/delete", json={"ids": ids[1:]}, headers=user.headers)
+    assert counts(client, user) == {"total": 0, "completed": 0, "pending": 0}
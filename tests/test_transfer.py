@@ -0,0 +1,99 @@
+# test_transfer.py
+import os
+import time
+
+import pytest
+from sqlalchemy import text
+
+import jobs
+
+
+def import_body(client, user, body: bytes, fmt: str) -> dict:
+    job = client.post(f"/todos/import?format={fmt}", content=body, headers=user.headers).json()
+    for _ in range(200):
+        job = client.get(f"/jobs/{job['id']}", headers=user.headers).json()
+        if job["status"] in jobs.FINISHED:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"import job still {job['status']}")
+
+
+def todos(client, user):
+    return sorted(client.get("/todos/", headers=user.headers).json(), key=lambda todo: todo["title"])
+
+
+@pytest.mark.parametrize("fmt", ["ndjson", "csv"])
+def test_export_import_round_trip_keeps_timestamps(client, db, user, other_user, fmt):
+    ids = [client.post("/todos/", json={"title": title}, headers=user.headers).json()["id"] for title in ("a", "b")]
+    client.put(f"/todos/{ids[0]}", json={"completed": True}, headers=user.headers)
+    # History from last week
+    db.execute(
+        text("UPDATE todos SET created_at = datetime('now', '-10 days'), "
+             "completed_at = CASE WHEN completed THEN datetime('now', '-5 days') END WHERE owner_id = :owner"),
+        {"owner": user.id},
+    )
+    db.commit()
+
+    exported = client.get(f"/todos/export?format={fmt}", headers=user.headers).content
+    job = import_body(client, other_user, exported, fmt)
+    assert job["status"] == "succeeded" and job["result"]["imported"] == 2
+
+    fields = ("title", "description", "completed", "created_at", "completed_at")
+    assert [{k: t[k] for k in fields} for t in todos(client, other_user)] == \
+        [{k: t[k] for k in fields} for t in todos(client, user)]
+    stats = client.get("/todos/stats", headers=other_user.headers).json()
+    assert (stats["created_today"], stats["completed_today"]) == (0, 0)
+    by_day = {day["day"]: day for day in stats["daily"] if day["created"] or day["completed"]}
+    assert [(d["created"], d["completed"]) for _, d in sorted(by_day.items())] == [(2, 0), (0, 1)]
+
+
+def test_import_without_timestamps_dates_rows_now(client, other_user):
+    job = import_body(client, other_user, b'{"title": "new", "completed": true}\n{"title": "newer"}\n', "ndjson")
+    assert job["result"]["imported"] == 2
+
+    assert all(todo["created_at"] for todo in todos(client, other_user))
+    stats = client.get("/todos/stats", headers=other_user.headers).json()
+    assert (stats["created_today"], stats["completed_today"]) == (2, 1)
+
+
+def test_save_upload_writes_off_the_event_loop(monkeypatch):
+    import asyncio
+    import builtins
+
+    import transfer
+
+    writes = []
+
+    class RecordingFile:
+        def __init__(self, f):
+            self.f = f
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            self.f.close()
+
+        def write(self, data):
+            try:
+                asyncio.get_running_loop()
+                writes.append(("loop", len(data)))
+            except RuntimeError:
+                writes.append(("thread", len(data)))
+            return self.f.write(data)
+
+    monkeypatch.setattr(transfer, "open", lambda *args: RecordingFile(builtins.open(*args)), raising=False)
+    monkeypatch.setattr(transfer, "UPLOAD_WRITE_BYTES", 10)
+
+    async def chunks():
+        for _ in range(5):
+            yield b"1234"
+
+    upload = asyncio.run(transfer.save_upload(chunks(), 1, "ndjson"))
+
+    path = transfer.upload_path(1, upload, "ndjson")
+    with builtins.open(path, "rb") as f:
+        assert f.read() == b"1234" * 5
+    os.remove(path)
+    # Batched to UPLOAD_WRITE_BYTES, none of them on the loop
+    assert writes == [("thread", 12), ("thread", 8)]